@@ -0,0 +1,27 @@
+import argparse
+import json
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the median times of two benchmark runs.')
+    parser.add_argument('baseline', help='JSON file of the baseline run')
+    parser.add_argument('candidate', help='JSON file of the run compared to the baseline')
+    args = parser.parse_args()
+
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    with open(args.candidate, 'r') as f:
+        candidate = json.load(f)
+
+    if baseline['config'] != candidate['config']:
+        print('Warning: the runs used different configurations')
+
+    print('{:<55} {:>12} {:>12} {:>8}'.format('benchmark', 'baseline ms', 'candidate ms', 'ratio'))
+    for name, result in candidate['results'].items():
+        if name not in baseline['results']:
+            continue
+        base_time = baseline['results'][name]['median']
+        time = result['median']
+        print('{:<55} {:>12.2f} {:>12.2f} {:>8.2f}'.format(name, base_time * 1e3, time * 1e3, time / base_time if base_time > 0 else float('nan')))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import argparse
+import datetime
+import functools
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# the benchmarks run without a display
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+from PyQt5.QtWidgets import QApplication
+
+from benchmarks.synthetic import make_nc_file, make_wrfout_folder
+
+SCALING_MODES = ['Auto (image)', 'Auto (timestep)', 'Auto (layer)', 'Auto (all data)']
+
+def measure(function, repeat, setup = None):
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return {'times': times, 'min': min(times), 'median': statistics.median(times)}
+
+def wait_for_scan(app, scanner):
+    app.processEvents()
+    while scanner.worker is not None:
+        time.sleep(0.001)
+        app.processEvents()
+
+def copy_data(source, work_folder, name):
+    # every cold measurement gets a fresh copy without any index files
+    target = os.path.join(work_folder, name)
+    if os.path.isdir(source):
+        shutil.copytree(source, target, ignore=shutil.ignore_patterns('.wrfviewer'))
+    else:
+        shutil.copy(source, target)
+    return target
+
+def bench_data_utils(results, wrfout_files, layer, repeat):
+    from src.data_utils import get_layer_data, get_sample_data, read_layer_data
+    from src.dataset_pool import dataset_pool
+    from src.cache_manager import cache_manager
+    from src.frame_cache import frame_cache
+    from src.height_utils import read_height_level
+    from src.probe_utils import read_file_points
+    from src.section_utils import SectionIndex, read_section
+    from src.worker_pool import get_io_pool
+
+    file_name = wrfout_files[len(wrfout_files) // 2]
+    for property in ['T', 'U', 'S']:
+        results['get_layer_data(' + property + ')/cold'] = measure(lambda: get_layer_data(file_name, property, layer), repeat, dataset_pool.clear)
+        results['get_layer_data(' + property + ')/warm'] = measure(lambda: get_layer_data(file_name, property, layer), repeat)
+    results['get_sample_data(S)'] = measure(lambda: get_sample_data(file_name, 'S'), repeat)
+
+    # diagonal section across the whole domain
+    shape = get_layer_data(file_name, 'T', layer).shape
+    section_index = SectionIndex((0.5, 0.5), (shape[1] - 0.5, shape[0] - 0.5), shape)
+    results['read_section(S)/cold'] = measure(lambda: read_section(file_name, 'S', section_index), repeat, dataset_pool.clear)
+    results['read_section(S)/warm'] = measure(lambda: read_section(file_name, 'S', section_index), repeat)
+
+    # time series of the center point of all files, read serially
+    results['read_file_points(T)'] = measure(lambda: read_file_points(wrfout_files, 'T', shape[0] // 2, shape[1] // 2, layer), repeat)
+    results['read_file_points(T, column)'] = measure(lambda: read_file_points(wrfout_files, 'T', shape[0] // 2, shape[1] // 2), repeat)
+
+    # the cold level reads the geopotential, the warm level only the enclosing model levels
+    results['read_height_level(T, 120)/cold'] = measure(lambda: read_height_level(file_name, 'T', 120), repeat, cache_manager.clear)
+    results['read_height_level(T, 120)/warm'] = measure(lambda: read_height_level(file_name, 'T', 120), repeat)
+
+    # the frames of four comparison panels, read one after the other or at once by the I/O pool
+    requests = [((f, 'T', layer), functools.partial(read_layer_data, f, 'T', layer)) for f in wrfout_files[:4]]
+    def clear():
+        cache_manager.clear()
+        dataset_pool.clear()
+    results['frame_cache.get(T, 4 panels)/cold'] = measure(lambda: [frame_cache.get(*request) for request in requests], repeat, clear)
+    results['frame_cache.getMany(T, 4 panels)/cold'] = measure(lambda: frame_cache.getMany(requests, get_io_pool()), repeat, clear)
+
+def bench_wrfout_folder(results, app, folder_name, work_folder, repeat):
+    from src.WrfoutFolderInterface import WrfoutFolderInterface
+
+    counter = iter(range(sys.maxsize))
+    interfaces = []
+
+    def open_folder():
+        interface = WrfoutFolderInterface('Custom')
+        interface.setFolderName(copy_data(folder_name, work_folder, 'wrfout_' + str(next(counter))))
+        interfaces.append(interface)
+
+    results['WrfoutFolderInterface.setFolderName'] = measure(open_folder, repeat)
+
+    for mode in SCALING_MODES:
+        def setup():
+            open_folder()
+            interfaces[-1].setScalingMode(mode)
+
+        def update_limits():
+            interfaces[-1].updateLimits()
+            wait_for_scan(app, interfaces[-1].limits_scanner)
+
+        results['WrfoutFolderInterface.updateLimits(' + mode + ')/cold'] = measure(update_limits, repeat, setup)
+        results['WrfoutFolderInterface.updateLimits(' + mode + ')/warm'] = measure(update_limits, repeat)
+
+        # the percentiles are merged from the quantiles stored with the statistics
+        interfaces[-1].setScalingRange('p1-p99')
+        results['WrfoutFolderInterface.updateLimits(' + mode + ', p1-p99)/warm'] = measure(update_limits, repeat)
+
+def bench_nc_file(results, app, file_name, work_folder, repeat):
+    from src.NcFileInterface import NcFileInterface
+
+    counter = iter(range(sys.maxsize))
+    interfaces = []
+
+    def open_file():
+        interface = NcFileInterface('Custom')
+        interface.setFileName(copy_data(file_name, work_folder, 'data_' + str(next(counter)) + '.nc'))
+        interfaces.append(interface)
+
+    results['NcFileInterface.setFileName'] = measure(open_file, repeat)
+
+    for mode in SCALING_MODES:
+        def setup():
+            open_file()
+            interfaces[-1].setScalingMode(mode)
+
+        def update_limits():
+            interfaces[-1].updateLimits()
+            wait_for_scan(app, interfaces[-1].limits_scanner)
+
+        results['NcFileInterface.updateLimits(' + mode + ')/cold'] = measure(update_limits, repeat, setup)
+        results['NcFileInterface.updateLimits(' + mode + ')/warm'] = measure(update_limits, repeat)
+
+        # the percentiles are merged from the quantiles stored with the statistics
+        interfaces[-1].setScalingRange('p1-p99')
+        results['NcFileInterface.updateLimits(' + mode + ', p1-p99)/warm'] = measure(update_limits, repeat)
+
+def bench_plot(results, app, nx, ny, repeat):
+    from src.LayerImageViewWidget import LayerImageViewWidget
+
+    widget = LayerImageViewWidget()
+    widget.resize(800, 600)
+    rng = np.random.default_rng(0)
+    frames = [rng.standard_normal((ny, nx), dtype=np.float32) for _ in range(4)]
+    masked_frames = [np.ma.masked_array(frame, mask=np.zeros(frame.shape, dtype=bool)) for frame in frames]
+    index = iter(range(sys.maxsize))
+
+    def plot(frames):
+        widget.plot(frames[next(index) % len(frames)], '')
+        app.processEvents()
+
+    plot(frames)
+    results['LayerImageViewWidget.plot(float32)'] = measure(lambda: plot(frames), repeat)
+    results['LayerImageViewWidget.plot(masked)'] = measure(lambda: plot(masked_frames), repeat)
+
+def run(args):
+    app = QApplication([])
+
+    from src import worker_pool
+    if args.workers is not None:
+        worker_pool.set_num_workers(args.workers)
+
+    work_folder = tempfile.mkdtemp(prefix='wrfviewer_bench_', dir=args.tmp)
+    results = {}
+    try:
+        folder_name = os.path.join(work_folder, 'source_wrfout')
+        wrfout_files = make_wrfout_folder(folder_name, args.nx, args.ny, args.nz, args.nt, not args.unstaggered)
+        nc_file = make_nc_file(os.path.join(work_folder, 'source.nc'), args.nx, args.ny, args.nz, args.nt)
+
+        # start the worker processes before measuring
+        worker_pool.get_process_pool().submit(int).result()
+        worker_pool.get_io_pool().submit(int).result()
+
+        bench_data_utils(results, wrfout_files, args.nz // 2, args.repeat)
+        bench_wrfout_folder(results, app, folder_name, work_folder, args.repeat)
+        bench_nc_file(results, app, nc_file, work_folder, args.repeat)
+        bench_plot(results, app, args.nx, args.ny, args.repeat)
+    finally:
+        worker_pool.shutdown_process_pool()
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    return {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'config': {'nx': args.nx, 'ny': args.ny, 'nz': args.nz, 'nt': args.nt, 'staggered': not args.unstaggered,
+                   'repeat': args.repeat, 'workers': worker_pool.num_workers},
+        'results': results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the read, scaling and plot paths on synthetic data.')
+    parser.add_argument('-o', '--output', default='benchmark.json', help='JSON file the results are written to')
+    parser.add_argument('--nx', type=int, default=200, help='number of grid points in west-east direction')
+    parser.add_argument('--ny', type=int, default=200, help='number of grid points in south-north direction')
+    parser.add_argument('--nz', type=int, default=20, help='number of vertical levels')
+    parser.add_argument('--nt', type=int, default=12, help='number of timesteps')
+    parser.add_argument('--unstaggered', action='store_true', help='write the wind components on the mass grid')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='number of repetitions of every measurement')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes, all cores by default')
+    parser.add_argument('--tmp', default=None, help='folder the synthetic data is written to')
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in report['results'].items():
+        print('{:<55} {:>10.2f} ms'.format(name, result['median'] * 1e3))
+    print('Wrote ' + args.output)
+
+if __name__ == "__main__":
+    main()
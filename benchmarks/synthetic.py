@@ -0,0 +1,84 @@
+import datetime
+import os
+
+import numpy as np
+from netCDF4 import Dataset
+
+START_TIME = datetime.datetime(2020, 1, 1)
+TIME_STEP = datetime.timedelta(hours=1)
+
+def get_field(rng, shape, offset):
+    # smooth field with some noise so the compression behaves similar to real data
+    y = np.linspace(0.0, 2.0 * np.pi, shape[-2], dtype=np.float32)[:, np.newaxis]
+    x = np.linspace(0.0, 2.0 * np.pi, shape[-1], dtype=np.float32)[np.newaxis, :]
+    field = np.sin(x + offset) * np.cos(y - offset)
+    return (np.broadcast_to(field, shape) + 0.1 * rng.standard_normal(shape, dtype=np.float32) + offset).astype(np.float32)
+
+def make_wrfout_folder(folder_name, nx = 100, ny = 100, nz = 10, nt = 8, staggered = True, domain = 'd01', seed = 0):
+    # wrfout files with the wind components, 3D and 2D mass variables and the geopotential
+    os.makedirs(folder_name, exist_ok=True)
+    stag = 1 if staggered else 0
+
+    files = []
+    for t in range(nt):
+        time = START_TIME + t * TIME_STEP
+        file_name = os.path.join(folder_name, 'wrfout_' + domain + '_' + time.strftime('%Y-%m-%d_%H:%M:%S'))
+        rng = np.random.default_rng(seed + t)
+
+        with Dataset(file_name, 'w', format='NETCDF4') as nc_file:
+            nc_file.createDimension('Time', None)
+            for name, size in [('bottom_top', nz), ('south_north', ny), ('west_east', nx)]:
+                nc_file.createDimension(name, size)
+                nc_file.createDimension(name + '_stag', size + stag)
+
+            def add_variable(name, dims, stagger = ''):
+                shape = [len(nc_file.dimensions[dim]) for dim in dims[1:]]
+                variable = nc_file.createVariable(name, 'f4', dims)
+                variable[0] = get_field(rng, shape, t * 0.1)
+                variable.stagger = stagger if staggered else ''
+
+            add_variable('U', ('Time', 'bottom_top', 'south_north', 'west_east_stag'), 'X')
+            add_variable('V', ('Time', 'bottom_top', 'south_north_stag', 'west_east'), 'Y')
+            add_variable('W', ('Time', 'bottom_top_stag', 'south_north', 'west_east'), 'Z')
+            add_variable('T', ('Time', 'bottom_top', 'south_north', 'west_east'))
+            add_variable('PH', ('Time', 'bottom_top_stag', 'south_north', 'west_east'), 'Z')
+            add_variable('HGT', ('Time', 'south_north', 'west_east'))
+
+            # 3D variable with fill values, it is read as a masked array
+            qrain = nc_file.createVariable('QRAIN', 'f4', ('Time', 'bottom_top', 'south_north', 'west_east'), fill_value=np.float32(9.96921e36))
+            field = get_field(rng, (nz, ny, nx), t * 0.1)
+            qrain[0] = np.ma.masked_less(field, t * 0.1)
+
+            # base state geopotential of levels 200 m apart above a terrain between 0 and 1000 m
+            terrain = 500.0 * (1.0 + get_field(np.random.default_rng(seed), (ny, nx), 0.0) / 1.2)
+            heights = terrain[np.newaxis] + 200.0 * np.arange(nz + stag, dtype=np.float32)[:, np.newaxis, np.newaxis]
+            nc_file.variables['HGT'][0] = terrain
+            phb = nc_file.createVariable('PHB', 'f4', ('Time', 'bottom_top_stag', 'south_north', 'west_east'))
+            phb[0] = 9.81 * heights
+            phb.stagger = 'Z' if staggered else ''
+
+        files.append(file_name)
+    return files
+
+def make_nc_file(file_name, nx = 100, ny = 100, nz = 10, nt = 8, case = 'case', model = 'model', chunked = True, seed = 0):
+    # nc dataset file with the case/model group layout
+    rng = np.random.default_rng(seed)
+
+    with Dataset(file_name, 'w', format='NETCDF4') as nc_file:
+        group = nc_file.createGroup(case).createGroup(model)
+        group.createDimension('time', nt)
+        for name, size in [('z', nz), ('y', ny), ('x', nx)]:
+            group.createDimension(name, size)
+
+        time = group.createVariable('time', 'f8', ('time',))
+        time[:] = [(START_TIME + t * TIME_STEP).replace(tzinfo=datetime.timezone.utc).timestamp() for t in range(nt)]
+
+        for name, dims in [('U', ('time', 'z', 'y', 'x')), ('V', ('time', 'z', 'y', 'x')), ('W', ('time', 'z', 'y', 'x')),
+                           ('T', ('time', 'z', 'y', 'x')), ('HGT', ('time', 'y', 'x'))]:
+            shape = [len(group.dimensions[dim]) for dim in dims[1:]]
+            chunksizes = [1] * (len(dims) - 2) + shape[-2:] if chunked else None
+            variable = group.createVariable(name, 'f4', dims, chunksizes=chunksizes, contiguous=not chunked)
+            for t in range(nt):
+                variable[t] = get_field(rng, shape, t * 0.1)
+
+    return file_name
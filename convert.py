@@ -0,0 +1,41 @@
+import argparse
+import os
+import sys
+
+from src.converter import convert_folder
+from src.worker_pool import set_num_workers, shutdown_process_pool
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a wrfout folder into a single nc dataset file with one layer per chunk.')
+    parser.add_argument('folder', help='wrfout folder')
+    parser.add_argument('-o', '--output', default=None, help='output nc file, <folder>.nc by default')
+    parser.add_argument('-p', '--properties', nargs='+', default=None, help='properties to convert, all raw variables and S by default')
+    parser.add_argument('--domains', nargs='+', default=None, help='domains to convert, all by default')
+    parser.add_argument('--case', default=None, help='name of the case group, the folder name by default')
+    parser.add_argument('-c', '--complevel', type=int, default=4, choices=range(10), help='zlib compression level, 0 disables the compression')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes, all cores by default')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.folder):
+        parser.error('no such folder: ' + args.folder)
+
+    output = args.output or os.path.normpath(args.folder) + '.nc'
+
+    if args.workers is not None:
+        set_num_workers(args.workers)
+
+    def progress(done, total):
+        sys.stdout.write('\rConverted {}/{} fields'.format(done, total))
+        sys.stdout.flush()
+
+    try:
+        convert_folder(args.folder, output, args.domains, args.case, args.properties, args.complevel, progress)
+    except ValueError as e:
+        parser.error(str(e))
+    finally:
+        shutdown_process_pool()
+
+    print('\nWrote ' + output)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,37 @@
-from src.WRFViewerApp import WRFViewerApp
+import time
+start_time = time.perf_counter()
+
+import argparse
+import os
+import sys
+
+from src import profiling
 
 def main():
-    app = WRFViewerApp()
+    parser = argparse.ArgumentParser(description='Viewer for WRF output.')
+    parser.add_argument('path', nargs='?', default=None, help='wrfout folder or nc dataset file that is opened at startup')
+    parser.add_argument('-p', '--property', default=None, help='property shown after opening the data')
+    parser.add_argument('-l', '--layer', type=int, default=None, help='layer shown after opening the data')
+    parser.add_argument('-t', '--time', default=None, help='time label as shown in the Time box or index of the timestep shown after opening the data')
+    parser.add_argument('--timing', action='store_true', help='show the latencies of the loading and plotting stages in the status bar')
+    parser.add_argument('--trace', default=None, help='write a chrome trace of the timed stages to this file when closing')
+    parser.add_argument('--profile', default=None, help='write cProfile statistics of the session to this file when closing')
+    args, qt_args = parser.parse_known_args()
+
+    if args.path is not None and not os.path.exists(args.path):
+        parser.error('no such file or folder: ' + args.path)
+
+    if args.timing or args.trace or args.profile:
+        profiling.enable(args.trace, args.profile)
+
+    # the remaining arguments are passed on to Qt
+    sys.argv = sys.argv[:1] + qt_args
+
+    selection = {key: value for key, value in [('property', args.property), ('layer', args.layer), ('time', args.time)] if value is not None}
+
+    from src.WRFViewerApp import WRFViewerApp
+    app = WRFViewerApp(args.path, selection, start_time)
     app.run()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
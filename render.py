@@ -0,0 +1,51 @@
+import argparse
+import os
+import sys
+
+from src.batch_render import SCALING_MODES, render_frames
+from src.stats_index import SCALING_RANGES
+from src.worker_pool import set_num_workers, shutdown_process_pool
+
+def main():
+    parser = argparse.ArgumentParser(description='Render the frames of a time animation to PNG files without a display.')
+    parser.add_argument('path', help='wrfout folder or nc dataset file')
+    parser.add_argument('-p', '--property', required=True, help='property to render')
+    parser.add_argument('-l', '--layer', type=int, default=0, help='layer to render')
+    parser.add_argument('-o', '--output', default='frames', help='output folder of the PNG files')
+    parser.add_argument('--start', type=int, default=0, help='index of the first timestep')
+    parser.add_argument('--stop', type=int, default=None, help='index after the last timestep')
+    parser.add_argument('--step', type=int, default=1, help='step between two rendered timesteps')
+    parser.add_argument('--cbar', default='jet', help='colormap')
+    parser.add_argument('--scaling', default='Auto (layer)', choices=SCALING_MODES, help='scaling mode')
+    parser.add_argument('--range', default='Min/max', choices=list(SCALING_RANGES.keys()), help='limits of the auto scaling modes')
+    parser.add_argument('--min', type=float, default=None, help='minimum of the custom scaling')
+    parser.add_argument('--max', type=float, default=None, help='maximum of the custom scaling')
+    parser.add_argument('--domain', default=None, help='domain of a wrfout folder, the first one by default')
+    parser.add_argument('--case', default=None, help='case of a nc dataset file, the first one by default')
+    parser.add_argument('--model', default=None, help='model of a nc dataset file, the first one by default')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of worker processes, all cores by default')
+    args = parser.parse_args()
+
+    if args.scaling == 'Custom' and (args.min is None or args.max is None):
+        parser.error('the custom scaling requires --min and --max')
+
+    if not os.path.exists(args.path):
+        parser.error('no such file or folder: ' + args.path)
+
+    if args.workers is not None:
+        set_num_workers(args.workers)
+
+    def progress(done, total):
+        sys.stdout.write('\rRendered {}/{} frames'.format(done, total))
+        sys.stdout.flush()
+
+    try:
+        written = render_frames(args.path, args.property, args.layer, args.output, args.start, args.stop, args.step,
+                                args.cbar, args.scaling, args.min, args.max, args.domain, args.case, args.model, progress, args.range)
+    finally:
+        shutdown_process_pool()
+
+    print('\nWrote {} frames to {}'.format(len(written), args.output))
+
+if __name__ == "__main__":
+    main()
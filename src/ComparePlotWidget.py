@@ -0,0 +1,468 @@
+from PyQt5.QtWidgets import *
+from PyQt5.QtCore import QTimer, pyqtSignal
+
+from contextlib import ExitStack
+import functools
+import numpy as np
+import os
+import sip
+
+from .custom_widgets import CustomComboBox, CustomLineEdit, ErrorBox
+from .folder_index import get_folder_index
+from .frame_cache import frame_cache, prefetch_depth
+from .LayerImageViewWidget import LayerImageViewWidget
+from .NcFileInterface import NcFileInterface
+from .profiling import span
+from .stats_index import SCALING_RANGES
+from .WrfoutFolderInterface import WrfoutFolderInterface
+from .wind_utils import as_float_array
+from .worker_pool import get_io_pool
+
+PANEL_NAMES = ['A', 'B', 'C', 'D']
+
+# colormap of the difference of the first two panels, its limits are symmetric around zero
+DIFFERENCE_CBAR = 'RdBu_r'
+
+class ComparePanel(QGroupBox):
+    # data source of a panel, the domain, case and model are selected per panel while the property, level,
+    # layer and time follow the first panel
+    source_changed = pyqtSignal()
+    limits_changed = pyqtSignal()
+    data_changed = pyqtSignal()
+
+    def __init__(self, name, parent = None):
+        super(ComparePanel, self).__init__(name, parent)
+
+        self.name = name
+        self.data_interface = None
+        self.limits = None
+        self.title = ''
+
+        self.folder_button = QPushButton('Folder', self)
+        self.file_button = QPushButton('File', self)
+
+        # the plot of the panel is placed in the grid of the comparison
+        self.view = LayerImageViewWidget()
+        self.title_label = QLabel(name)
+        self.plot_box = QWidget()
+        plot_box_layout = QVBoxLayout()
+        plot_box_layout.setContentsMargins(0, 0, 0, 0)
+        plot_box_layout.addWidget(self.title_label)
+        plot_box_layout.addWidget(self.view, stretch=10)
+        self.plot_box.setLayout(plot_box_layout)
+
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(self.folder_button)
+        button_layout.addWidget(self.file_button)
+        self.main_layout = QVBoxLayout()
+        self.main_layout.addLayout(button_layout)
+        self.setLayout(self.main_layout)
+
+        self.folder_button.clicked.connect(self.onFolderPressed)
+        self.file_button.clicked.connect(self.onFilePressed)
+
+    def onFolderPressed(self):
+        folder_name = QFileDialog.getExistingDirectory(None, "Select data folder", '.')
+        if folder_name:
+            self.setSource(folder_name)
+
+    def onFilePressed(self):
+        file_name, _ = QFileDialog.getOpenFileName(None, "Select dataset file", '.', "(*.nc)")
+        if file_name:
+            self.setSource(file_name)
+
+    def setSource(self, path, scaling_mode = 'Auto (image)', scaling_range = 'Min/max'):
+        if os.path.isdir(path):
+            if len(get_folder_index(path).getDomains()) == 0:
+                self.error_box = ErrorBox('Invalid Folder', 'No wrfout files present in the selected folder')
+                self.error_box.show()
+                return
+            interface_type = WrfoutFolderInterface
+        else:
+            interface_type = NcFileInterface
+
+        if not isinstance(self.data_interface, interface_type):
+            self.removeDataInterface()
+            self.data_interface = interface_type(scaling_mode, self)
+            self.data_interface.setScalingRange(scaling_range)
+            self.data_interface.data_changed.connect(self.onDataChanged)
+            self.data_interface.limits_changed.connect(self.onLimitsChanged)
+            self.main_layout.addWidget(self.data_interface)
+
+        self.limits = None
+        if interface_type is WrfoutFolderInterface:
+            self.data_interface.setFolderName(path)
+        else:
+            self.data_interface.setFileName(path)
+        self.source_changed.emit()
+
+    def removeDataInterface(self):
+        if self.data_interface is None:
+            return
+
+        self.data_interface.limits_scanner.cancel()
+        self.data_interface.probe_loader.cancel()
+        self.main_layout.removeWidget(self.data_interface)
+        sip.delete(self.data_interface)
+        self.data_interface = None
+
+    def setFollower(self, follower):
+        # the selections shared by all panels are only changed in the first panel
+        if self.data_interface is not None:
+            for box in [self.data_interface.property_box, self.data_interface.level_box, self.data_interface.layer_box, self.data_interface.time_box]:
+                box.setEnabled(not follower)
+
+    def onDataChanged(self, data_tuple):
+        self.title = data_tuple[1]
+        self.title_label.setText(self.name + ': ' + self.title)
+        self.view.plot(data_tuple[0], data_tuple[1])
+        self.data_changed.emit()
+
+    def onLimitsChanged(self, limits):
+        self.limits = limits
+        self.limits_changed.emit()
+
+class ComparePlotWidget(QWidget):
+    def __init__(self, parent = None):
+        super(ComparePlotWidget, self).__init__(parent)
+
+        self.loading = False
+        self.difference_buffer = None
+
+        self.panels = [ComparePanel(name, self) for name in PANEL_NAMES]
+        self.difference_view = LayerImageViewWidget()
+        self.difference_view.setCbar(DIFFERENCE_CBAR)
+        self.difference_label = QLabel('A - B')
+        self.difference_box = QWidget()
+        difference_box_layout = QVBoxLayout()
+        difference_box_layout.setContentsMargins(0, 0, 0, 0)
+        difference_box_layout.addWidget(self.difference_label)
+        difference_box_layout.addWidget(self.difference_view, stretch=10)
+        self.difference_box.setLayout(difference_box_layout)
+
+        self.num_panels_box = CustomComboBox(['2', '3', '4'])
+        self.difference_button = QCheckBox()
+        self.cbar_box = CustomComboBox(['jet', 'viridis', 'turbo', 'rainbow', 'gray', 'ocean', 'terrain'])
+        self.scalingmode_box = CustomComboBox(['Auto (image)', 'Auto (timestep)', 'Auto (layer)', 'Auto (all data)', 'Custom'])
+        self.scalingrange_box = CustomComboBox(list(SCALING_RANGES.keys()))
+        self.minlimit_box = CustomLineEdit('0.0', True, self)
+        self.maxlimit_box = CustomLineEdit('1.0', True, self)
+
+        self.animation_mode_box = CustomComboBox(['Time', 'Layer'])
+        self.animation_dt_box = CustomLineEdit('0.1', False, self)
+        self.animation_play_button = QPushButton()
+        self.animation_play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
+        self.animation_stop_button = QPushButton()
+        self.animation_stop_button.setIcon(self.style().standardIcon(QStyle.SP_MediaStop))
+        self.animation_cache_label = QLabel()
+
+        # panels
+        bar_layout = QVBoxLayout()
+        panels_box = QGroupBox("Panels")
+        form_layout_panels = QFormLayout()
+        form_layout_panels.addRow(QLabel("Panels:"), self.num_panels_box)
+        form_layout_panels.addRow(QLabel("A - B:"), self.difference_button)
+        panels_box.setLayout(form_layout_panels)
+        bar_layout.addWidget(panels_box)
+
+        sources_widget = QWidget()
+        sources_layout = QVBoxLayout()
+        for panel in self.panels:
+            sources_layout.addWidget(panel)
+        sources_layout.addStretch()
+        sources_widget.setLayout(sources_layout)
+        sources_area = QScrollArea()
+        sources_area.setWidgetResizable(True)
+        sources_area.setWidget(sources_widget)
+        bar_layout.addWidget(sources_area, stretch=10)
+
+        # plotting, the views of all panels show the same region
+        self.plot_layout = QGridLayout()
+        for panel in self.panels[1:]:
+            panel.view.view.setXLink(self.panels[0].view.view)
+            panel.view.view.setYLink(self.panels[0].view.view)
+        self.difference_view.view.setXLink(self.panels[0].view.view)
+        self.difference_view.view.setYLink(self.panels[0].view.view)
+
+        # display options
+        display_layout = QVBoxLayout()
+        display_box = QGroupBox("Display options")
+        form_layout_display = QFormLayout()
+        form_layout_display.addRow(QLabel("C-bar:"), self.cbar_box)
+        display_box.setLayout(form_layout_display)
+        display_layout.addWidget(display_box)
+
+        limits_box = QGroupBox("Scaling options")
+        form_layout_limits = QFormLayout()
+        form_layout_limits.addRow(QLabel("Mode:"), self.scalingmode_box)
+        form_layout_limits.addRow(QLabel("Range:"), self.scalingrange_box)
+        form_layout_limits.addRow(QLabel("Min:"), self.minlimit_box)
+        form_layout_limits.addRow(QLabel("Max:"), self.maxlimit_box)
+        limits_box.setLayout(form_layout_limits)
+        display_layout.addWidget(limits_box)
+
+        animation_box = QGroupBox("Animation Options")
+        animation_box_layout = QVBoxLayout()
+        play_layout = QHBoxLayout()
+        play_layout.addWidget(self.animation_play_button)
+        play_layout.addWidget(self.animation_stop_button)
+        animation_box_layout.addLayout(play_layout)
+        form_layout_animation = QFormLayout()
+        form_layout_animation.addRow(QLabel("Mode:"), self.animation_mode_box)
+        form_layout_animation.addRow(QLabel("dt [s]:"), self.animation_dt_box)
+        form_layout_animation.addRow(QLabel("Cache:"), self.animation_cache_label)
+        animation_box_layout.addLayout(form_layout_animation)
+        animation_box.setLayout(animation_box_layout)
+        display_layout.addWidget(animation_box)
+        display_layout.addStretch()
+
+        # layout
+        main_layout = QHBoxLayout()
+        main_layout.addLayout(bar_layout)
+        main_layout.addLayout(self.plot_layout, stretch=10)
+        main_layout.addLayout(display_layout)
+        self.setLayout(main_layout)
+
+        # animation
+        self.animation_timer = QTimer(self)
+        self.animation_timer.timeout.connect(self.animationStep)
+
+        # connect signals
+        for panel in self.panels:
+            panel.source_changed.connect(functools.partial(self.onSourceChanged, panel))
+            panel.limits_changed.connect(self.onPanelLimitsChanged)
+            panel.data_changed.connect(self.onPanelDataChanged)
+        self.num_panels_box.currentTextChanged.connect(self.updateLayout)
+        self.difference_button.toggled.connect(self.updateLayout)
+        self.cbar_box.currentTextChanged.connect(self.onCbarChanged)
+        self.scalingmode_box.currentTextChanged.connect(self.onScalingmodeChanged)
+        self.scalingrange_box.currentTextChanged.connect(self.onScalingRangeChanged)
+        self.minlimit_box.editingFinished.connect(self.onCustomLimitsChanged)
+        self.maxlimit_box.editingFinished.connect(self.onCustomLimitsChanged)
+        self.animation_play_button.clicked.connect(self.onAnimationPlayPressed)
+        self.animation_stop_button.clicked.connect(self.onAnimationStopPressed)
+        self.animation_dt_box.editingFinished.connect(self.onAnimationDtChanged)
+
+        self.updateLayout()
+
+    def getPanels(self):
+        # the shown panels with a data source
+        num_panels = int(self.num_panels_box.currentText())
+        return [panel for panel in self.panels[:num_panels] if panel.data_interface is not None]
+
+    def getLeader(self):
+        return self.panels[0].data_interface
+
+    def setDefaultSource(self, path):
+        # the first two panels start with the data of the layer plot, e.g. to pick another case in the second
+        if path is None:
+            return
+        for panel in self.panels[:2]:
+            if panel.data_interface is None:
+                panel.setSource(path, self.scalingmode_box.currentText(), self.scalingrange_box.currentText())
+
+    def onSourceChanged(self, panel):
+        panel.data_interface.setLoadHandler(functools.partial(self.onPanelLoad, panel))
+        panel.setFollower(panel is not self.panels[0])
+        panel.view.setCbar(self.cbar_box.currentText())
+        self.loadPanels()
+
+    def updateLayout(self):
+        num_panels = int(self.num_panels_box.currentText())
+        while self.plot_layout.count():
+            self.plot_layout.takeAt(0)
+
+        # two columns, the difference takes the next free cell
+        plot_boxes = [panel.plot_box for panel in self.panels[:num_panels]]
+        if self.difference_button.isChecked():
+            plot_boxes.append(self.difference_box)
+        for i, plot_box in enumerate(plot_boxes):
+            self.plot_layout.addWidget(plot_box, i // 2, i % 2)
+
+        for i, panel in enumerate(self.panels):
+            panel.setVisible(i < num_panels)
+            panel.plot_box.setVisible(i < num_panels)
+        self.difference_box.setVisible(self.difference_button.isChecked())
+
+        self.loadPanels()
+
+    def onPanelLoad(self, panel):
+        # a change of the selection of a panel loads all panels with the selection of the first one
+        if self.loading or self.getLeader() is None:
+            panel.data_interface.getData()
+        else:
+            self.loadPanels()
+
+    def followSelection(self, data_interface):
+        # apply the shared selection of the first panel, called within a selection transaction of the follower
+        leader = self.getLeader()
+
+        level = leader.level_box.currentText()
+        if data_interface.level_box.currentText() != level:
+            data_interface.level_box.setCurrentText(level)
+            data_interface.updateProperty()
+
+        property = leader.property_box.combo_box.currentText()
+        if data_interface.property_box.combo_box.currentText() == property or data_interface.property_box.combo_box.findText(property) < 0:
+            property = None
+
+        time = leader.time_box.combo_box.currentText()
+        if data_interface.time_box.combo_box.findText(time) < 0:
+            # runs of another period follow the index of the timestep
+            time = str(leader.time_box.combo_box.currentIndex())
+
+        data_interface.applySelection(property, leader.layer_box.combo_box.currentText(), time)
+
+    def loadPanels(self):
+        leader = self.getLeader()
+        panels = self.getPanels()
+        if leader is None or self.loading:
+            return
+
+        self.loading = True
+        try:
+            with ExitStack() as stack:
+                for panel in panels[1:]:
+                    stack.enter_context(panel.data_interface.selection)
+                    self.followSelection(panel.data_interface)
+
+                # the slices of all panels are read at once, the panels are shown from the cache afterwards
+                requests = [request for request in (panel.data_interface.currentFrameRequest() for panel in panels) if request is not None]
+                with span('compare'):
+                    frame_cache.getMany(requests, get_io_pool())
+
+                leader.getData()
+        finally:
+            self.loading = False
+
+        self.updateDifference()
+
+    def onPanelDataChanged(self):
+        if not self.loading:
+            self.updateDifference()
+
+    def updateDifference(self):
+        if not self.difference_button.isChecked():
+            return
+
+        data_a = self.panels[0].view.slice_data
+        data_b = self.panels[1].view.slice_data
+        if data_a is None or data_b is None:
+            return
+        if data_a.shape != data_b.shape:
+            self.difference_label.setText('A - B: the grids of the panels differ')
+            return
+
+        with span('difference'):
+            if self.difference_buffer is None or self.difference_buffer.shape != data_a.shape:
+                self.difference_buffer = np.empty(data_a.shape, dtype=np.float32)
+            np.subtract(as_float_array(data_a), as_float_array(data_b), out=self.difference_buffer, casting='unsafe')
+
+            val_min = np.nanmin(self.difference_buffer)
+            val_max = np.nanmax(self.difference_buffer)
+
+        self.difference_label.setText('A - B: ' + self.panels[0].title)
+        self.difference_view.plot(self.difference_buffer, self.difference_label.text())
+        if np.isfinite(val_min) and np.isfinite(val_max):
+            limit = max(abs(float(val_min)), abs(float(val_max)), 1e-12)
+            self.difference_view.updateLimits(-limit, limit)
+
+    def onPanelLimitsChanged(self):
+        if self.scalingmode_box.currentText() == 'Custom':
+            return
+
+        # all panels share the color scale, it covers the limits of every panel
+        limits = [panel.limits for panel in self.getPanels() if panel.limits is not None]
+        if not limits:
+            return
+        val_min = min(l[0] for l in limits)
+        val_max = max(l[1] for l in limits)
+        self.minlimit_box.setText(str(val_min))
+        self.maxlimit_box.setText(str(val_max))
+        self.updateLimits(val_min, val_max)
+
+    def updateLimits(self, val_min, val_max):
+        for panel in self.panels:
+            panel.view.updateLimits(val_min, val_max)
+
+    def onCustomLimitsChanged(self):
+        if self.scalingmode_box.currentText() == 'Custom':
+            val_min = self.minlimit_box.text()
+            val_max = self.maxlimit_box.text()
+            if val_min and val_max:
+                self.updateLimits(float(val_min), float(val_max))
+
+    def onScalingmodeChanged(self, mode):
+        self.minlimit_box.setReadOnly(mode != 'Custom')
+        self.maxlimit_box.setReadOnly(mode != 'Custom')
+        self.scalingrange_box.setEnabled(mode != 'Custom')
+
+        for panel in self.panels:
+            if panel.data_interface is not None:
+                panel.data_interface.setScalingMode(mode)
+                panel.limits = None
+                if mode != 'Custom':
+                    panel.data_interface.updateLimits()
+
+        self.onCustomLimitsChanged()
+
+    def onScalingRangeChanged(self, scaling_range):
+        for panel in self.panels:
+            if panel.data_interface is not None:
+                panel.data_interface.setScalingRange(scaling_range)
+                panel.limits = None
+                if self.scalingmode_box.currentText() != 'Custom':
+                    panel.data_interface.updateLimits()
+
+    def onCbarChanged(self, cbar):
+        if cbar:
+            for panel in self.panels:
+                panel.view.setCbar(cbar)
+
+    def onAnimationDtChanged(self):
+        dt = self.animation_dt_box.text()
+        if dt and self.animation_timer.isActive():
+            self.animation_timer.stop()
+            self.animation_timer.start(float(dt) * 1000)
+
+    def onAnimationPlayPressed(self):
+        dt = self.animation_dt_box.text()
+        if dt and self.getLeader() is not None:
+            self.prefetchFrames()
+            self.animation_timer.start(float(dt) * 1000)
+
+    def onAnimationStopPressed(self):
+        self.animation_timer.stop()
+
+    def prefetchFrames(self):
+        for panel in self.getPanels():
+            panel.data_interface.prefetch(self.animation_mode_box.currentText(), prefetch_depth)
+
+        stats = frame_cache.stats()
+        self.animation_cache_label.setText('{} hits / {} waits / {} misses'.format(stats['hits'], stats['waits'], stats['misses']))
+
+    def animationStep(self):
+        leader = self.getLeader()
+        if leader is None:
+            self.animation_timer.stop()
+            return
+
+        # same restriction of the scaling modes as the layer plot, the limits do not change every frame
+        animation_mode = self.animation_mode_box.currentText()
+        scaling_mode = self.scalingmode_box.currentText()
+        if animation_mode == 'Time':
+            if scaling_mode not in ['Auto (layer)', 'Auto (all data)', 'Custom']:
+                self.scalingmode_box.setCurrentText('Auto (layer)')
+            leader.time_box.onForwardPressed()
+        else:
+            if scaling_mode not in ['Auto (timestep)', 'Auto (all data)', 'Custom']:
+                self.scalingmode_box.setCurrentText('Auto (timestep)')
+            leader.layer_box.onForwardPressed()
+
+        self.prefetchFrames()
+
+    def closeEvent(self, event):
+        self.animation_timer.stop()
+        for panel in self.panels:
+            panel.removeDataInterface()
+        super(ComparePlotWidget, self).closeEvent(event)
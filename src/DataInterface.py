@@ -0,0 +1,117 @@
+from PyQt5.QtWidgets import *
+from PyQt5.QtCore import pyqtSignal
+
+from .custom_widgets import ButtonComboBox, CustomComboBox
+from .frame_cache import frame_cache
+from .limits_worker import LimitsScanner
+from .probe_worker import ProbeLoader
+from .section_utils import section_cache
+
+class DataInterface(QWidget):
+    # selection of a wrfout folder or nc file shared by both interfaces, the subclasses add their source boxes
+    # (domain or case and model) and read the frames, sections and probes of the selection
+    limits_changed = pyqtSignal(list)
+    data_changed = pyqtSignal(tuple)
+    section_changed = pyqtSignal(tuple)
+    probe_changed = pyqtSignal(tuple)
+
+    def __init__(self, scaling_mode, parent = None):
+        super(QWidget, self).__init__(parent)
+
+        self.default_property = 'U'
+        self.stats_index = None
+        self.scaling_mode = scaling_mode
+        self.section_index = None
+        self.probe_point = None
+        self.probe_column = False
+        self.height_levels = False
+        self.load_handler = None
+        # combo boxes selecting the data source, set by the subclasses
+        self.source_boxes = []
+
+        self.limits_scanner = LimitsScanner(self)
+        self.limits_scanner.limits_changed.connect(self.limits_changed)
+        self.probe_loader = ProbeLoader(self)
+        self.probe_loader.loaded.connect(self.onProbeLoaded)
+
+        self.property_box = ButtonComboBox(self)
+        self.level_box = CustomComboBox(['Model level', 'Height AGL'])
+        self.layer_box = ButtonComboBox(self)
+        self.time_box = ButtonComboBox(self)
+
+    def setLoadHandler(self, handler):
+        # handler replaces the load at the end of a selection change, e.g. to load all panels of a comparison
+        self.load_handler = handler
+
+    def load(self):
+        if self.load_handler is not None:
+            self.load_handler()
+        else:
+            self.getData()
+
+    def currentFrameRequest(self):
+        # (key, loader) of the current frame or None if nothing is selected
+        layer = self.layer_box.combo_box.currentText()
+        if not all(box.combo_box.currentText() for box in self.source_boxes) or not self.property_box.combo_box.currentText() or not layer or self.time_box.combo_box.currentIndex() < 0:
+            return None
+        return self.frameRequest(self.time_box.combo_box.currentIndex(), int(layer))
+
+    def setProbe(self, point, column):
+        # grid point (row, column) whose values of all timesteps are shown, column selects the whole column
+        # instead of the current layer
+        self.probe_point = point
+        self.probe_column = column
+
+    def setSectionIndex(self, section_index):
+        self.section_index = section_index
+
+    def sectionRequests(self, time_index):
+        # (key, loader) of the section data that can be prefetched for a timestep
+        return [self.sectionRequest(time_index)]
+
+    def prefetch(self, animation_mode, num_frames):
+        time_index = self.time_box.combo_box.currentIndex()
+        layer_index = self.layer_box.combo_box.currentIndex()
+        num_times = self.time_box.combo_box.count()
+        num_layers = self.layer_box.combo_box.count()
+
+        if time_index < 0 or layer_index < 0 or not self.property_box.combo_box.currentText():
+            return
+
+        for step in range(1, num_frames + 1):
+            if animation_mode == 'Time':
+                time_index_step = (time_index + step) % num_times
+                layer_index_step = layer_index
+            else:
+                time_index_step = time_index
+                layer_index_step = (layer_index + step) % num_layers
+            frame_cache.prefetch([self.frameRequest(time_index_step, int(self.layer_box.combo_box.itemText(layer_index_step)))])
+
+            # the section does not depend on the layer
+            if self.section_index is not None and animation_mode == 'Time':
+                section_cache.prefetch(self.sectionRequests(time_index_step))
+
+    def applySelection(self, property = None, layer = None, time = None):
+        # select the given property, layer and time label or index, called within a selection transaction
+        if property is not None:
+            if self.property_box.combo_box.findText(property) < 0:
+                self.error_box = QMessageBox()
+                self.error_box.setWindowTitle("Invalid Property")
+                self.error_box.setText('Property ' + property + ' is not available')
+                self.error_box.setIcon(QMessageBox.Critical)
+                self.error_box.show()
+            else:
+                self.property_box.combo_box.setCurrentText(property)
+                self.updateProperty()
+
+        if layer is not None and self.layer_box.combo_box.findText(str(layer)) >= 0:
+            self.layer_box.combo_box.setCurrentText(str(layer))
+
+        if time is not None:
+            if self.time_box.combo_box.findText(time) >= 0:
+                self.time_box.combo_box.setCurrentText(time)
+            elif time.isdigit() and int(time) < self.time_box.combo_box.count():
+                self.time_box.combo_box.setCurrentIndex(int(time))
+
+        self.selection.requestLoad()
+        self.selection.requestLimits()
@@ -1,21 +1,251 @@
-import pyqtgraph as pg
+import itertools
+import math
+import os
+
 import numpy as np
+import pyqtgraph as pg
+from PyQt5 import QtCore
+
+from . import profiling
+from .cache_manager import cache_manager
+from .render_utils import downsample, get_colormap, get_lookup_table, to_float_image
+
+# smallest size of the coarsest pyramid level
+MIN_LEVEL_SIZE = 64
+
+# zoomed in views only upload the visible region of the full resolution image if it is smaller than this
+# fraction of the image, the region is extended by a margin so small pans do not need a new upload
+CROP_FRACTION = 0.5
+CROP_MARGIN = 0.5
+
+# downsampled levels of the displayed images, an evicted level is downsampled again when it is shown
+pyramid_cache = cache_manager.cache('pyramids')
+_pyramid_ids = itertools.count()
 
 class LayerImageViewWidget(pg.ImageView):
+    # end points of the section line in grid coordinates or None if the line was removed
+    section_line_changed = QtCore.pyqtSignal(object)
+    # grid point (row, column) clicked while probing
+    point_clicked = QtCore.pyqtSignal(int, int)
+
     def __init__(self, parent=None):
         super(LayerImageViewWidget, self).__init__(parent)
 
-        self.setColorMap(pg.colormap.get('jet', source='matplotlib'))
+        self.cbar = 'jet'
+        self.lut = None
+        self.slice_data = None
+        self.display_buffer = None
+
+        # the slices are shown as they are read (row 0 is the southern border) without transposing or flipping
+        self.imageItem.axisOrder = 'row-major'
+        self.view.invertY(False)
+
+        # multi-resolution pyramid of the displayed image, the levels are built on demand
+        self.pyramid_base = None
+        self.pyramid_id = None
+        self.num_pyramid_levels = 0
+        self.display_level = None
+        self.display_rect = None
+        self.lod_enabled = os.environ.get('WRFVIEWER_LOD', '1') != '0'
+
+        # line the vertical section is taken along
+        self.section_line = None
+
+        # marker of the probed grid point
+        self.probe_marker = pg.ScatterPlotItem(symbol='+', size=14, pen=pg.mkPen('w', width=2), brush=None)
+        self.probe_marker.setZValue(10)
+        self.view.addItem(self.probe_marker)
+        self.probe_enabled = False
+        self.scene.sigMouseClicked.connect(self.onMouseClicked)
+
+        self.view.sigRangeChanged.connect(self.updateLevelOfDetail)
+        self.view.sigResized.connect(self.updateLevelOfDetail)
+        self.ui.roiBtn.toggled.connect(self.updateLevelOfDetail)
+
+        self.setColorMap(get_colormap(self.cbar))
         self.show()
 
     def setCbar(self, cbar):
-        self.setColorMap(pg.colormap.get(cbar, source='matplotlib'))
+        self.cbar = cbar
+        self.lut = None
+        self.setColorMap(get_colormap(cbar))
 
     def updateLimits(self, val_min, val_max):
         self.setLevels(min=val_min, max=val_max)
 
     def plot(self, slice_data, title):
-        self.setImage(np.fliplr(slice_data.T), autoLevels=False)
+        self.slice_data = slice_data
+
+        # the view is only reset if the size of the image changes, zoom and pan are kept while animating
+        reset_view = self.image is None or self.image.shape != slice_data.shape
+
+        # float32 slices are shown as they are, everything else is converted into the reused display buffer,
+        # the data of an unmasked masked array is shown directly and must not become the buffer as it may be
+        # a cached frame
+        image = to_float_image(slice_data, out=self.display_buffer)
+        if not np.may_share_memory(image, np.ma.getdata(slice_data)):
+            self.display_buffer = image
+
+        with profiling.span('setImage'):
+            self.setImage(image, autoLevels=False, autoRange=False)
+
+        # setImage resets the transform of the image item
+        if self.display_rect is not None:
+            self.imageItem.setRect(self.display_rect)
+        if reset_view:
+            self.autoRange()
+
+        profiling.frame()
+
+    def autoRange(self):
+        if self.image is None:
+            return
+        self.view.setRange(self.getFullRect(), padding=0)
+
+    def updateImage(self, autoHistogramRange=True):
+        # called by setImage, the pyramid of the new image is rebuilt on demand
+        if self.image is None:
+            return
+
+        self.getProcessedImage()
+        # height levels below the lowest model level are NaN everywhere
+        if autoHistogramRange and math.isfinite(self.levelMin) and math.isfinite(self.levelMax):
+            self.ui.histogram.setHistogramRange(self.levelMin, self.levelMax)
+
+        self.discardPyramid()
+        self.pyramid_base = self.imageDisp
+        self.pyramid_id = next(_pyramid_ids)
+        self.display_level = None
+        self.display_rect = None
+        self.updateLevelOfDetail()
+
+    def getFullRect(self):
+        return QtCore.QRectF(0, 0, self.image.shape[1], self.image.shape[0])
+
+    def getPyramidLevel(self, level):
+        if level == 0:
+            return self.pyramid_base
+
+        self.num_pyramid_levels = max(self.num_pyramid_levels, level + 1)
+        return pyramid_cache.get((self.pyramid_id, level), lambda: downsample(self.getPyramidLevel(level - 1)))
+
+    def discardPyramid(self):
+        # the levels of the previous image are not shown anymore
+        for level in range(1, self.num_pyramid_levels):
+            pyramid_cache.discard((self.pyramid_id, level))
+        self.num_pyramid_levels = 0
+
+    def getZoomLevel(self):
+        # coarsest level with pixels that are not larger than a screen pixel
+        if not self.lod_enabled or self.ui.roiBtn.isChecked():
+            # the roi plot samples the image in the coordinates of the image item
+            return 0
+
+        view_rect = self.view.viewRect()
+        width, height = self.view.width(), self.view.height()
+        if width <= 0 or height <= 0:
+            return 0
+
+        pixel_size = min(view_rect.width() / width, view_rect.height() / height)
+        if not math.isfinite(pixel_size) or pixel_size < 2:
+            return 0
+
+        level = int(math.log2(pixel_size))
+        max_level = max(0, int(math.log2(max(1, min(self.image.shape[:2]) // MIN_LEVEL_SIZE))))
+        return min(level, max_level)
+
+    def getVisibleRegion(self):
+        # integer region of the full resolution image that needs to be loaded, None if it is the whole image
+        full_rect = self.getFullRect()
+        visible = self.view.viewRect().intersected(full_rect)
+        if visible.isEmpty() or visible.width() * visible.height() > CROP_FRACTION * full_rect.width() * full_rect.height():
+            return None
+
+        if self.display_level == 0 and self.display_rect is not None and self.display_rect.contains(visible):
+            return self.display_rect
+
+        margin_x = visible.width() * CROP_MARGIN
+        margin_y = visible.height() * CROP_MARGIN
+        x0 = max(0, int(math.floor(visible.left() - margin_x)))
+        y0 = max(0, int(math.floor(visible.top() - margin_y)))
+        x1 = min(self.image.shape[1], int(math.ceil(visible.right() + margin_x)))
+        y1 = min(self.image.shape[0], int(math.ceil(visible.bottom() + margin_y)))
+        return QtCore.QRectF(x0, y0, x1 - x0, y1 - y0)
+
+    def updateLevelOfDetail(self, *args):
+        if self.image is None or self.pyramid_base is None:
+            return
+
+        level = self.getZoomLevel()
+        if level == 0:
+            rect = self.getVisibleRegion() or self.getFullRect()
+            if level == self.display_level and rect == self.display_rect:
+                return
+
+            x0, y0 = int(rect.left()), int(rect.top())
+            image = self.pyramid_base[y0:y0 + int(rect.height()), x0:x0 + int(rect.width())]
+        else:
+            if level == self.display_level:
+                return
+
+            image = self.getPyramidLevel(level)
+            scale = 2 ** level
+            rect = QtCore.QRectF(0, 0, image.shape[1] * scale, image.shape[0] * scale)
+
+        self.display_level = level
+        self.display_rect = rect
+        self.imageItem.updateImage(image)
+        self.imageItem.setRect(rect)
+
+    def setSectionLineVisible(self, visible):
+        if visible and self.section_line is None and self.image is not None:
+            # the line starts across the middle of the domain and can be dragged by its handles
+            height, width = self.image.shape[:2]
+            self.section_line = pg.LineSegmentROI([(0.1 * width, 0.5 * height), (0.9 * width, 0.5 * height)], pen=pg.mkPen('w', width=2))
+            self.view.addItem(self.section_line)
+            self.section_line.sigRegionChangeFinished.connect(self.onSectionLineChanged)
+            self.onSectionLineChanged()
+
+        elif not visible and self.section_line is not None:
+            self.view.removeItem(self.section_line)
+            self.section_line = None
+            self.section_line_changed.emit(None)
+
+    def getSectionLine(self):
+        if self.section_line is None:
+            return None
+        points = [self.section_line.mapToParent(point) for point in self.section_line.listPoints()]
+        return [(point.x(), point.y()) for point in points]
+
+    def onSectionLineChanged(self, *args):
+        self.section_line_changed.emit(self.getSectionLine())
+
+    def setProbeEnabled(self, enabled):
+        self.probe_enabled = enabled
+        if not enabled:
+            self.probe_marker.clear()
+
+    def onMouseClicked(self, event):
+        if not self.probe_enabled or self.image is None or event.button() != QtCore.Qt.LeftButton:
+            return
+
+        point = self.view.mapSceneToView(event.scenePos())
+        row, col = int(math.floor(point.y())), int(math.floor(point.x()))
+        if 0 <= row < self.image.shape[0] and 0 <= col < self.image.shape[1]:
+            self.probe_marker.setData([col + 0.5], [row + 0.5])
+            self.point_clicked.emit(row, col)
+
+    def getExportFrame(self):
+        # the current slice with its levels and lookup table, the colors are applied by the exporter
+        if self.lut is None:
+            self.lut = get_lookup_table(self.cbar)
+        val_min, val_max = self.ui.histogram.getLevels()
+        return self.slice_data, val_min, val_max, self.lut
 
     def saveImage(self, filename):
-        self.export(filename)
+        # the full resolution image is saved independent of the displayed level
+        self.imageItem.updateImage(self.image)
+        self.imageItem.save(filename)
+        self.display_level = None
+        self.display_rect = None
+        self.updateLevelOfDetail()
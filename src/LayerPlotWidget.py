@@ -6,10 +6,16 @@ import numpy as np
 import os
 import sip
 
+from .frame_cache import frame_cache, prefetch_depth
+from .frame_export import frame_exporter
 from .NcFileInterface import NcFileInterface
 from .LayerImageViewWidget import LayerImageViewWidget
+from .ProbePlotWidget import ProbePlotWidget
+from .SectionPlotWidget import SectionPlotWidget
+from .section_utils import SectionIndex
+from .stats_index import SCALING_RANGES
 from .WrfoutFolderInterface import WrfoutFolderInterface
-from .custom_widgets import CustomComboBox, CustomLineEdit
+from .custom_widgets import CustomComboBox, CustomLineEdit, ErrorBox
 
 class LayerPlotWidget(QWidget):
     def __init__(self, parent = None):
@@ -18,13 +24,21 @@ class LayerPlotWidget(QWidget):
         self.default_property = 'U'
         self.files_dict = None
         self.folder_name = None
+        self.section_index = None
+        self.probe_point = None
 
         self.plotting_widget = LayerImageViewWidget(self)
+        self.section_widget = SectionPlotWidget(self)
+        self.probe_widget = ProbePlotWidget(self)
 
         self.cbar_box = CustomComboBox(['jet', 'viridis', 'turbo', 'rainbow', 'gray', 'ocean', 'terrain'])
+        self.section_button = QCheckBox()
+        self.probe_box = CustomComboBox(['Off', 'Point', 'Profile'])
         self.scalingmode_box = CustomComboBox(['Auto (image)', 'Auto (timestep)', 'Auto (layer)', 'Auto (all data)', 'Custom'])
+        self.scalingrange_box = CustomComboBox(list(SCALING_RANGES.keys()))
         self.minlimit_box = CustomLineEdit('0.0', True, self)
         self.maxlimit_box = CustomLineEdit('1.0', True, self)
+        self.build_index_button = QPushButton('Build index', self)
 
         self.animation_mode_box = CustomComboBox(['Time', 'Layer'])
         self.animation_dt_box = CustomLineEdit('0.1', False, self)
@@ -33,6 +47,9 @@ class LayerPlotWidget(QWidget):
         self.animation_stop_button = QPushButton()
         self.animation_stop_button.setIcon(self.style().standardIcon(QStyle.SP_MediaStop))
         self.animation_save_button = QCheckBox()
+        self.animation_cache_label = QLabel()
+        self.animation_export_label = QLabel()
+        self.export_error_shown = False
 
         # data options
         bar_layout = QVBoxLayout()
@@ -55,6 +72,8 @@ class LayerPlotWidget(QWidget):
         form_layout_animation.addRow(QLabel("Save:"), self.animation_save_button)  
         form_layout_animation.addRow(QLabel("Mode:"), self.animation_mode_box)  
         form_layout_animation.addRow(QLabel("dt [s]:"), self.animation_dt_box)  
+        form_layout_animation.addRow(QLabel("Cache:"), self.animation_cache_label)
+        form_layout_animation.addRow(QLabel("Export:"), self.animation_export_label)
         animation_box_layout.addLayout(form_layout_animation)
 
         animation_box.setLayout(animation_box_layout)
@@ -64,7 +83,11 @@ class LayerPlotWidget(QWidget):
         plot_layout = QVBoxLayout()
         plot_box = QGroupBox("Layer Plot")
         plot_box_layout = QVBoxLayout()
-        plot_box_layout.addWidget(self.plotting_widget)
+        self.plot_tabs = QTabWidget()
+        self.plot_tabs.addTab(self.plotting_widget, "Layer")
+        self.plot_tabs.addTab(self.section_widget, "Cross Section")
+        self.plot_tabs.addTab(self.probe_widget, "Time Series")
+        plot_box_layout.addWidget(self.plot_tabs)
         plot_box.setLayout(plot_box_layout)
         plot_layout.addWidget(plot_box, stretch=10)
 
@@ -74,6 +97,8 @@ class LayerPlotWidget(QWidget):
         display_box_layout = QVBoxLayout()
         form_layout_display = QFormLayout()
         form_layout_display.addRow(QLabel("C-bar:"), self.cbar_box)  
+        form_layout_display.addRow(QLabel("Section:"), self.section_button)
+        form_layout_display.addRow(QLabel("Probe:"), self.probe_box)
         display_box_layout.addLayout(form_layout_display)
         display_box.setLayout(display_box_layout)
 
@@ -83,9 +108,11 @@ class LayerPlotWidget(QWidget):
         limits_box_layout = QVBoxLayout()
         form_layout_limits = QFormLayout()
         form_layout_limits.addRow(QLabel("Mode:"), self.scalingmode_box)
+        form_layout_limits.addRow(QLabel("Range:"), self.scalingrange_box)
         form_layout_limits.addRow(QLabel("Min:"), self.minlimit_box)
         form_layout_limits.addRow(QLabel("Max:"), self.maxlimit_box)
         limits_box_layout.addLayout(form_layout_limits)
+        limits_box_layout.addWidget(self.build_index_button)
         limits_box.setLayout(limits_box_layout)
 
         display_layout.addWidget(limits_box)
@@ -103,9 +130,15 @@ class LayerPlotWidget(QWidget):
 
         # connect signals
         self.cbar_box.currentTextChanged.connect(self.onCbarChanged)
+        self.section_button.toggled.connect(self.plotting_widget.setSectionLineVisible)
+        self.plotting_widget.section_line_changed.connect(self.onSectionLineChanged)
+        self.probe_box.currentTextChanged.connect(self.onProbeModeChanged)
+        self.plotting_widget.point_clicked.connect(self.onPointClicked)
         self.scalingmode_box.currentTextChanged.connect(self.onScalingmodeChanged)
+        self.scalingrange_box.currentTextChanged.connect(self.onScalingRangeChanged)
         self.minlimit_box.editingFinished.connect(self.onCustomLimitsChanged)
         self.maxlimit_box.editingFinished.connect(self.onCustomLimitsChanged)
+        self.build_index_button.clicked.connect(self.onBuildIndexPressed)
         self.animation_play_button.clicked.connect(self.onAnimationPlayPressed)
         self.animation_stop_button.clicked.connect(self.onAnimationStopPressed)
         self.animation_dt_box.editingFinished.connect(self.onAnimationDtChanged)
@@ -120,19 +153,33 @@ class LayerPlotWidget(QWidget):
     def onAnimationPlayPressed(self):
         dt = self.animation_dt_box.text()
         if dt:
+            self.prefetchFrames()
             self.animation_timer.start(float(dt) * 1000)
 
     def onAnimationStopPressed(self):
         self.animation_timer.stop()
 
+    def prefetchFrames(self):
+        if isinstance(self.data_interface, (WrfoutFolderInterface, NcFileInterface)):
+            self.data_interface.prefetch(self.animation_mode_box.currentText(), prefetch_depth)
+
+        stats = frame_cache.stats()
+        self.animation_cache_label.setText('{} hits / {} waits / {} misses'.format(stats['hits'], stats['waits'], stats['misses']))
+
     def onAutoLimitsChanged(self, limits):
         self.minlimit_box.setText(str(limits[0]))
         self.maxlimit_box.setText(str(limits[1]))
-        self.plotting_widget.updateLimits(float(limits[0]), float(limits[1]))
+        self.updateLimits(float(limits[0]), float(limits[1]))
+
+    def onBuildIndexPressed(self):
+        if isinstance(self.data_interface, (WrfoutFolderInterface, NcFileInterface)):
+            self.data_interface.buildStatsIndex()
 
     def onCbarChanged(self, cbar):
         if cbar:
             self.plotting_widget.setCbar(cbar)
+            self.section_widget.setCbar(cbar)
+            self.probe_widget.setCbar(cbar)
 
     def onCustomLimitsChanged(self):
         mode = self.scalingmode_box.currentText()
@@ -140,10 +187,11 @@ class LayerPlotWidget(QWidget):
             val_min = self.minlimit_box.text()
             val_max = self.maxlimit_box.text()
             if val_min and val_max:
-                self.plotting_widget.updateLimits(float(val_min), float(val_max))
+                self.updateLimits(float(val_min), float(val_max))
 
     def onScalingmodeChanged(self, mode):
         self.data_interface.setScalingMode(mode)
+        self.scalingrange_box.setEnabled(mode != 'Custom')
 
         if mode == 'Custom':
             self.minlimit_box.setReadOnly(False)
@@ -152,44 +200,132 @@ class LayerPlotWidget(QWidget):
             val_min = self.minlimit_box.text()
             val_max = self.maxlimit_box.text()
             if val_min and val_max:
-                self.plotting_widget.updateLimits(float(val_min), float(val_max))
+                self.updateLimits(float(val_min), float(val_max))
 
         else:
             self.minlimit_box.setReadOnly(True)
             self.maxlimit_box.setReadOnly(True)
             self.data_interface.updateLimits()
 
+    def onScalingRangeChanged(self, scaling_range):
+        if isinstance(self.data_interface, (WrfoutFolderInterface, NcFileInterface)):
+            self.data_interface.setScalingRange(scaling_range)
+            if self.scalingmode_box.currentText() != 'Custom':
+                self.data_interface.updateLimits()
+
+    def updateLimits(self, val_min, val_max):
+        self.plotting_widget.updateLimits(val_min, val_max)
+
+        # the section spans all layers, only limits that hold for all layers are applied to it
+        if self.scalingmode_box.currentText() in ['Auto (all data)', 'Custom']:
+            self.section_widget.setLevels((val_min, val_max))
+        else:
+            self.section_widget.setLevels(None)
+
     def updatePlot(self, data_tuple):
         self.plotting_widget.plot(data_tuple[0], data_tuple[1])
 
-    def setFolderName(self, folder_name):
+        if self.section_button.isChecked():
+            # the line is placed once there is an image to place it on
+            self.plotting_widget.setSectionLineVisible(True)
+
+        # the section is emitted after the frame, a new grid size needs a new index of the columns
+        if self.section_index is not None and self.section_index.shape != tuple(data_tuple[0].shape[-2:]):
+            self.setSectionIndex(self.plotting_widget.getSectionLine())
+
+    def setSectionIndex(self, line):
+        if line is None or self.plotting_widget.image is None:
+            self.section_index = None
+        else:
+            self.section_index = SectionIndex(line[0], line[1], self.plotting_widget.image.shape)
+
+        if isinstance(self.data_interface, (WrfoutFolderInterface, NcFileInterface)):
+            self.data_interface.setSectionIndex(self.section_index)
+
+    def onSectionLineChanged(self, line):
+        self.setSectionIndex(line)
+
+        if self.section_index is None:
+            self.section_widget.clearSection()
+        elif isinstance(self.data_interface, (WrfoutFolderInterface, NcFileInterface)):
+            self.data_interface.getSection()
+
+    def onSectionChanged(self, section_tuple):
+        self.section_widget.plot(*section_tuple)
+
+    def setProbe(self):
+        # clicking a grid point shows its values of the current layer (Point) or of all layers (Profile) against time
+        mode = self.probe_box.currentText()
+        point = self.probe_point if mode != 'Off' else None
+
+        if isinstance(self.data_interface, (WrfoutFolderInterface, NcFileInterface)):
+            self.data_interface.setProbe(point, mode == 'Profile')
+            self.data_interface.getProbe()
+
+    def onProbeModeChanged(self, mode):
+        self.plotting_widget.setProbeEnabled(mode != 'Off')
+        if mode == 'Off':
+            self.probe_point = None
+        self.setProbe()
+
+    def onPointClicked(self, row, col):
+        self.probe_point = (row, col)
+        self.setProbe()
+
+    def onProbeChanged(self, probe_tuple):
+        self.probe_widget.plotProbe(*probe_tuple)
+
+    def removeDataInterface(self):
+        if isinstance(self.data_interface, (WrfoutFolderInterface, NcFileInterface)):
+            self.data_interface.limits_scanner.cancel()
+            self.data_interface.probe_loader.cancel()
+
+        self.data_selection_box_layout.removeWidget(self.data_interface)
+        sip.delete(self.data_interface)
+
+    def setFolderName(self, folder_name, selection = None):
         if not isinstance(self.data_interface, WrfoutFolderInterface):
-            self.data_selection_box_layout.removeWidget(self.data_interface)
-            sip.delete(self.data_interface)
+            self.removeDataInterface()
             scaling_mode = self.scalingmode_box.currentText()
             self.data_interface = WrfoutFolderInterface(scaling_mode, self)
+            self.data_interface.setScalingRange(self.scalingrange_box.currentText())
             self.data_selection_box_layout.addWidget(self.data_interface)
             self.data_interface.limits_changed.connect(self.onAutoLimitsChanged)
             self.data_interface.data_changed.connect(self.updatePlot)
+            self.data_interface.section_changed.connect(self.onSectionChanged)
+            self.data_interface.setSectionIndex(self.section_index)
+            self.data_interface.probe_changed.connect(self.onProbeChanged)
+            self.data_interface.setProbe(self.probe_point, self.probe_box.currentText() == 'Profile')
 
-        self.data_interface.setFolderName(folder_name)
+        self.folder_name = folder_name
+        self.data_interface.setFolderName(folder_name, selection)
 
-    def setFileName(self, folder_name):
+    def setFileName(self, folder_name, selection = None):
         if not isinstance(self.data_interface, NcFileInterface):
-            self.data_selection_box_layout.removeWidget(self.data_interface)
-            sip.delete(self.data_interface)
+            self.removeDataInterface()
             scaling_mode = self.scalingmode_box.currentText()
             self.data_interface = NcFileInterface(scaling_mode, self)
+            self.data_interface.setScalingRange(self.scalingrange_box.currentText())
             self.data_selection_box_layout.addWidget(self.data_interface)
             self.data_interface.limits_changed.connect(self.onAutoLimitsChanged)
             self.data_interface.data_changed.connect(self.updatePlot)
+            self.data_interface.section_changed.connect(self.onSectionChanged)
+            self.data_interface.setSectionIndex(self.section_index)
+            self.data_interface.probe_changed.connect(self.onProbeChanged)
+            self.data_interface.setProbe(self.probe_point, self.probe_box.currentText() == 'Profile')
 
-        self.data_interface.setFileName(folder_name)
+        self.folder_name = os.path.dirname(os.path.abspath(folder_name))
+        self.data_interface.setFileName(folder_name, selection)
 
     def animationStep(self):
         animation_mode = self.animation_mode_box.currentText()
         scaling_mode = self.scalingmode_box.currentText()
 
+        if self.animation_save_button.isChecked() and frame_exporter.isFull():
+            # hold the animation until the writers caught up instead of dropping frames
+            self.updateExportLabel()
+            return
+
         if animation_mode == 'Time':
             supported_modes = ['Auto (layer)', 'Auto (all data)', 'Custom']
             if not any([scaling_mode == mode for mode in supported_modes]):
@@ -208,7 +344,22 @@ class LayerPlotWidget(QWidget):
             self.data_interface.layer_box.onForwardPressed()
             index_animation = self.data_interface.layer_box.combo_box.currentIndex()
 
+        self.prefetchFrames()
+
         if self.animation_save_button.isChecked():
             property = self.data_interface.property_box.combo_box.currentText()
             filename = property + '_' + animation_mode + str(index_animation).zfill(6) + '.png'
-            self.plotting_widget.saveImage(os.path.join(self.folder_name, filename))
+            slice_data, val_min, val_max, lut = self.plotting_widget.getExportFrame()
+            if not (slice_data is None):
+                frame_exporter.submit(os.path.join(self.folder_name, filename), slice_data, val_min, val_max, lut)
+            self.updateExportLabel()
+
+    def updateExportLabel(self):
+        stats = frame_exporter.stats()
+        self.animation_export_label.setText('{} queued / {} written / {} dropped / {} failed'.format(stats['queued'], stats['written'], stats['dropped'], stats['failed']))
+
+        # the reason is shown once, the following failures are only counted
+        if stats['error'] is not None and not self.export_error_shown:
+            self.export_error_shown = True
+            self.error_box = ErrorBox('Export Failed', 'The frame could not be written\n' + stats['error'])
+            self.error_box.show()
@@ -1,8 +1,10 @@
 import sys
 
 from PyQt5.QtWidgets import *
-from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtCore import pyqtSignal, QTimer
 
+from . import profiling
+from .cache_manager import get_summary
 from .TabWidget import CustomTabWidget
 
 class MainWindow(QMainWindow):
@@ -17,6 +19,11 @@ class MainWindow(QMainWindow):
 
         self.createMainWidget()
 
+        self.createMemoryStatus()
+
+        if profiling.enabled:
+            self.createTimingOverlay()
+
         # self.resized.connect(self.tab_widget.draw)
 
     def resizeEvent(self, event):
@@ -26,3 +33,34 @@ class MainWindow(QMainWindow):
     def createMainWidget(self):
         self.tab_widget = CustomTabWidget(self)
         self.setCentralWidget(self.tab_widget)
+
+    def createMemoryStatus(self):
+        # memory used by the caches and the hit rates of every cache and of the open files
+        self.memory_label = QLabel()
+        self.statusBar().addPermanentWidget(self.memory_label)
+
+        self.memory_timer = QTimer(self)
+        self.memory_timer.timeout.connect(self.updateMemoryStatus)
+        self.memory_timer.start(1000)
+
+    def updateMemoryStatus(self):
+        # netCDF4 is imported after the window is shown
+        from .dataset_pool import dataset_pool
+        stats = dataset_pool.stats()
+        requests = stats['hits'] + stats['misses']
+        files = 'files {} / {}'.format(stats['size'], stats['max_size'])
+        if requests:
+            files += ' {:.0f}%'.format(100.0 * stats['hits'] / requests)
+        self.memory_label.setText(get_summary() + ' | ' + files)
+
+    def createTimingOverlay(self):
+        # rolling latencies of the timed stages and the frame rate in the status bar
+        self.timing_label = QLabel()
+        self.statusBar().addWidget(self.timing_label)
+
+        self.timing_timer = QTimer(self)
+        self.timing_timer.timeout.connect(self.updateTimingOverlay)
+        self.timing_timer.start(500)
+
+    def updateTimingOverlay(self):
+        self.timing_label.setText(profiling.get_summary())
@@ -1,30 +1,41 @@
 from PyQt5.QtWidgets import *
-from PyQt5.QtCore import pyqtSignal
 
-from datetime import datetime
 from netCDF4 import Dataset
+import functools
 import numpy as np
 import os
 
-from .custom_widgets import ButtonComboBox, ProgressWidget
-
-class NcFileInterface(QWidget):
-    limits_changed = pyqtSignal(list)
-    data_changed = pyqtSignal(tuple)
-
+from .custom_widgets import ButtonComboBox
+from .DataInterface import DataInterface
+from .frame_cache import frame_cache
+from .height_utils import AGL_HEIGHTS, HEIGHT_INPUTS, HEIGHT_SUFFIX, compute_group_height_level_stats, read_group_height_level
+from .limits_worker import run_single
+from .probe_utils import read_group_points
+from .profiling import span
+from .selection import SelectionTransaction
+from .dataset_pool import dataset_pool
+from .nc_utils import compute_group_stats, decode_time_labels, get_dims, get_time_block_size, get_variable_name, has_time_dim, read_file_layer, read_file_timestep, reduce_group_stats
+from .section_utils import read_group_section, read_group_section_height, section_cache
+from .stats_index import SCALING_RANGES, StatsIndex
+from . import worker_pool
+
+# smallest number of timesteps of a strided read of a point in the process pool, shorter series are read at once
+MIN_PROBE_TIMES = 64
+
+class NcFileInterface(DataInterface):
     def __init__(self, scaling_mode, parent = None):
-        super(QWidget, self).__init__(parent)
+        super().__init__(scaling_mode, parent)
 
-        self.default_property = 'U'
         self.nc_file = None
-        self.scaling_mode = scaling_mode
+        self.file_name = None
+        self.stats_source = None
         self.time_keys_dict = None
+        self.time_axes = {}
+        self.num_layers = None
 
         self.case_box = ButtonComboBox(self)
         self.model_box = ButtonComboBox(self)
-        self.property_box = ButtonComboBox(self)
-        self.layer_box = ButtonComboBox(self)
-        self.time_box = ButtonComboBox(self)
+        self.source_boxes = [self.case_box, self.model_box]
 
         # data options
         main_layout = QVBoxLayout()
@@ -32,16 +43,22 @@ class NcFileInterface(QWidget):
         form_layout_data.addRow(QLabel("Case:"), self.case_box)  
         form_layout_data.addRow(QLabel("Model:"), self.model_box)  
         form_layout_data.addRow(QLabel("Property:"), self.property_box)
+        form_layout_data.addRow(QLabel("Level:"), self.level_box)
         form_layout_data.addRow(QLabel("Layer:"), self.layer_box)
         form_layout_data.addRow(QLabel("Time:"), self.time_box)
         main_layout.addLayout(form_layout_data)
         self.setLayout(main_layout)
 
+        # cascaded changes of the selection result in a single load
+        self.selection = SelectionTransaction([self.case_box.combo_box, self.model_box.combo_box, self.property_box.combo_box,
+                                               self.level_box, self.layer_box.combo_box, self.time_box.combo_box], self.load, self.updateLimits)
+
         # connect signals
         self.case_box.combo_box.currentTextChanged.connect(self.onCaseChanged)
         self.model_box.combo_box.currentTextChanged.connect(self.onModelChanged)
         self.layer_box.combo_box.currentTextChanged.connect(self.onLayerChanged)
         self.property_box.combo_box.currentTextChanged.connect(self.onPropertyChanged)
+        self.level_box.currentTextChanged.connect(self.onLevelModeChanged)
         self.time_box.combo_box.currentTextChanged.connect(self.onTimeChanged)
 
     def setCases(self, cases):
@@ -90,6 +107,9 @@ class NcFileInterface(QWidget):
     def setScalingMode(self, mode):
         self.scaling_mode = mode
 
+    def setScalingRange(self, scaling_range):
+        self.limits_scanner.setPercentiles(SCALING_RANGES[scaling_range])
+
     def setTimes(self, times, keys_dict):
         previous_time = self.time_box.combo_box.currentText()
         self.time_box.combo_box.clear()
@@ -104,27 +124,65 @@ class NcFileInterface(QWidget):
                 self.time_box.combo_box.setCurrentText(times[0])
 
     def onCaseChanged(self, case):
+        with self.selection:
+            self.updateCase()
+
+    def updateCase(self):
+        case = self.case_box.combo_box.currentText()
         if case:
             models = self.getModelsFromCase(case)
             self.setModels(models)
+            self.updateModel()
 
     def onModelChanged(self, model):
+        with self.selection:
+            self.updateModel()
+
+    def updateModel(self):
         case = self.case_box.combo_box.currentText()
+        model = self.model_box.combo_box.currentText()
         if model and case:
             times, keys_dict = self.getTimesFromCase(case, model)
             properties = self.getPropertiesFromCase(case, model)
-            times.sort()
             properties.sort()
             self.setTimes(times, keys_dict)
             self.setProperties(properties)
-            self.updateLimits()
+            self.updateProperty()
+            self.selection.requestLimits()
 
     def onLayerChanged(self, layer):
         if layer:
-            self.getData()
+            with self.selection:
+                self.selection.requestLoad()
+
+                if self.scaling_mode == 'Auto (image)' or self.scaling_mode == 'Auto (layer)':
+                    self.selection.requestLimits()
+
+    def onLevelModeChanged(self, mode):
+        with self.selection:
+            if mode == 'Height AGL' and not self.nc_file is None:
+                if not self.hasHeightInputs():
+                    self.error_box = QMessageBox()
+                    self.error_box.setWindowTitle("Invalid Level")
+                    self.error_box.setText('The height above ground requires ' + ', '.join(HEIGHT_INPUTS))
+                    self.error_box.setIcon(QMessageBox.Critical)
+                    self.error_box.show()
+                    self.level_box.setCurrentText('Model level')
+
+            self.updateProperty()
+
+    def hasHeightInputs(self):
+        case = self.case_box.combo_box.currentText()
+        model = self.model_box.combo_box.currentText()
+        if not case or not model:
+            return False
+        return all(item in self.nc_file[case][model].variables for item in HEIGHT_INPUTS)
 
-            if self.scaling_mode == 'Auto (image)' or self.scaling_mode == 'Auto (layer)':
-                self.updateLimits()
+    def getLayerLabel(self, layer):
+        # layers are heights above ground in m in the height level mode
+        if self.height_levels:
+            return ' ' + layer + ' m AGL'
+        return ' L' + layer
 
     def onLimitsChanged(self):
         mode = self.scalingmode_box.currentText()
@@ -135,19 +193,23 @@ class NcFileInterface(QWidget):
                 self.plotting_widget.updateLimits(float(val_min), float(val_max))
 
     def onPropertyChanged(self, property):
+        with self.selection:
+            self.updateProperty()
+
+    def updateProperty(self):
+        property = self.property_box.combo_box.currentText()
         case = self.case_box.combo_box.currentText()
         model = self.model_box.combo_box.currentText()
         time = self.time_box.combo_box.currentText()
         if property and case and time and not self.nc_file is None:
+            if self.level_box.currentText() == 'Height AGL' and not self.hasHeightInputs():
+                # other cases and models without the geopotential only have model levels
+                self.level_box.setCurrentText('Model level')
+
             dims = self.getDims(case, model, property)
             has_time = self.propertyHasTimeDim(case, model, property)
             spatial_dims = [d for d in dims if d != 'time']
-            if property == 'S' or property == 'S_max':
-                # take the dimensions of only the u wind that is available as it was used to compute S and S_max
-                property_adj = 'U'
-            else:
-                property_adj = property
-            data_shape = self.nc_file[case][model].variables[property_adj].shape
+            data_shape = self.nc_file[case][model].variables[get_variable_name(self.nc_file[case][model], property)].shape
 
             if len(spatial_dims) == 3:
                 if has_time:
@@ -164,35 +226,35 @@ class NcFileInterface(QWidget):
                 self.error_box.setIcon(QMessageBox.Critical)
                 self.error_box.show()
 
+                # nothing can be loaded for this property
+                self.setLayers([])
+
+            # 2D properties stay on their single level
+            self.num_layers = num_layers
+            self.height_levels = bool(num_layers) and num_layers > 1 and self.level_box.currentText() == 'Height AGL'
+
             if num_layers:
-                layers = range(num_layers)
-                layers_str = [str(l) for l in layers]
+                if self.height_levels:
+                    layers_str = [str(height) for height in AGL_HEIGHTS]
+                else:
+                    layers_str = [str(l) for l in range(num_layers)]
                 self.setLayers(layers_str)
-                self.updateLimits()
+                self.selection.requestLoad()
+                self.selection.requestLimits()
 
     def onTimeChanged(self, time):
         if time:
-            try:
-                self.getData()
+            with self.selection:
+                self.selection.requestLoad()
 
                 if self.scaling_mode == 'Auto (image)' or self.scaling_mode == 'Auto (timestep)':
-                    self.updateLimits()
-            except:
-                # due to the update order in case of a model change the time gets updated before the
-                # property this causes an error here that is caught with this exception
-                pass
+                    self.selection.requestLimits()
 
     def getDims(self, case, model, property):
-        if property == 'S' or property == 'S_max':
-            # take the dimensions of only the u wind that is available as it was used to compute S and S_max
-            property_adj = 'U'
-        else:
-            property_adj = property
-        return self.nc_file[case][model].variables[property_adj].dimensions
+        return get_dims(self.nc_file[case][model], property)
 
     def propertyHasTimeDim(self, case, model, property):
-        dims = self.getDims(case, model, property)
-        return 'time' in dims
+        return has_time_dim(self.nc_file[case][model], property)
 
     def getData(self):
         case = self.case_box.combo_box.currentText()
@@ -204,75 +266,124 @@ class NcFileInterface(QWidget):
         if not case or not time or not layer or not property or not model:
             return
 
-        slice_data = self.getLayerData(case, model, property, time, int(layer))
+        key, loader = self.frameRequest(self.time_box.combo_box.currentIndex(), int(layer))
+        with span('load'):
+            slice_data = frame_cache.get(key, loader)
 
         if not (slice_data is None):
-            title = case + ' ' + model + ' ' + property + ' L' + layer + ' ' + time
+            title = case + ' ' + model + ' ' + property + self.getLayerLabel(layer) + ' ' + time
             self.data_changed.emit((slice_data, title))
 
-    def setFileName(self, file_name):
+        self.getSection()
+        self.getProbe()
+
+    def getProbe(self):
+        case = self.case_box.combo_box.currentText()
+        model = self.model_box.combo_box.currentText()
+        property = self.property_box.combo_box.currentText()
+        layer = self.layer_box.combo_box.currentText()
+
+        if self.probe_point is None or not case or not model or not property or not layer:
+            self.probe_loader.cancel()
+            return
+
+        row, col = self.probe_point
+        layer = None if self.probe_column else int(layer)
+        height = layer if self.height_levels and layer is not None else None
+        if height is not None:
+            layer = None
+        key = ('probe', self.file_name, case, model, property, layer, height, row, col)
+
+        # the point is read with strided reads over blocks of consecutive timesteps in parallel
+        num_times = len(self.time_keys_dict)
+        num_blocks = max(1, min(worker_pool.num_workers, num_times // MIN_PROBE_TIMES))
+        block_size = -(-num_times // num_blocks)
+        tasks = [(read_group_points, (self.file_name, case, model, property, start, min(start + block_size, num_times), row, col, layer, height))
+                 for start in range(0, num_times, block_size)]
+
+        # the values are read in the order of the file, the time box is sorted
+        times = [self.time_box.combo_box.itemText(i) for i in range(self.time_box.combo_box.count())]
+        order = [self.time_keys_dict[time] for time in times]
+        title = case + ' ' + model + ' ' + property + ('' if self.probe_column else self.getLayerLabel(self.layer_box.combo_box.currentText())) + ' at ({}, {})'.format(row, col)
+        self.probe_loader.load(key, tasks, (times, order, title))
+
+    def onProbeLoaded(self, values, context):
+        times, order, title = context
+        self.probe_changed.emit((times, values[order], title, self.time_box.combo_box.currentText()))
+
+    def getSection(self):
+        case = self.case_box.combo_box.currentText()
+        model = self.model_box.combo_box.currentText()
+        time = self.time_box.combo_box.currentText()
+        property = self.property_box.combo_box.currentText()
+
+        if self.section_index is None or not case or not model or not time or not property:
+            return
+
+        # only the columns below the line are read, the sections are cached like the frames
+        values, heights = None, None
+        if len([d for d in self.getDims(case, model, property) if d != 'time']) == 3:
+            with span('section'):
+                time_index = self.time_box.combo_box.currentIndex()
+                values = section_cache.get(*self.sectionRequest(time_index))
+                if values is not None:
+                    heights = section_cache.get(*self.sectionHeightRequest(time_index, values.shape[0]))
+
+        title = case + ' ' + model + ' ' + property + ' ' + time
+        self.section_changed.emit((values, heights, self.section_index.distance, title))
+
+    def sectionRequest(self, time_index):
+        case = self.case_box.combo_box.currentText()
+        model = self.model_box.combo_box.currentText()
+        property = self.property_box.combo_box.currentText()
+        time_idx = self.time_keys_dict[self.time_box.combo_box.itemText(time_index)]
+        key = ('section', self.file_name, case, model, property, time_idx, self.section_index.key)
+        return key, functools.partial(read_group_section, self.file_name, case, model, property, time_idx, self.section_index)
+
+    def sectionHeightRequest(self, time_index, num_levels):
+        case = self.case_box.combo_box.currentText()
+        model = self.model_box.combo_box.currentText()
+        time_idx = self.time_keys_dict[self.time_box.combo_box.itemText(time_index)]
+        key = ('section height', self.file_name, case, model, time_idx, num_levels, self.section_index.key)
+        return key, functools.partial(read_group_section_height, self.file_name, case, model, time_idx, num_levels, self.section_index)
+
+    def frameRequest(self, time_index, layer):
+        case = self.case_box.combo_box.currentText()
+        model = self.model_box.combo_box.currentText()
+        property = self.property_box.combo_box.currentText()
+        time_idx = self.time_keys_dict[self.time_box.combo_box.itemText(time_index)]
+        if self.height_levels:
+            key = (self.file_name, case, model, property, time_idx, HEIGHT_SUFFIX, layer)
+            return key, functools.partial(read_group_height_level, self.file_name, case, model, property, time_idx, self.num_layers, layer)
+        key = (self.file_name, case, model, property, time_idx, layer)
+        return key, functools.partial(read_file_layer, self.file_name, case, model, property, time_idx, layer)
+
+    def setFileName(self, file_name, selection = None):
         try:
             self.nc_file = Dataset(file_name, "r", format="NETCDF4")
+            self.file_name = file_name
+            self.time_axes = {}
+            self.stats_source = os.path.basename(file_name)
+            self.stats_index = StatsIndex(file_name + '.stats.json', {self.stats_source: file_name})
+            self.limits_scanner.setStatsIndex(self.stats_index)
             cases = list(self.nc_file.groups.keys())
-            self.setCases(cases)
+            with self.selection:
+                self.setCases(cases)
+                self.updateCase()
+
+                if selection:
+                    self.applySelection(**selection)
 
         except:
             self.nc_file = None
 
     def getTimeData(self, case, model, property, time):
-        has_time = self.propertyHasTimeDim(case, model, property)
-        if has_time:
-            time_idx = self.time_keys_dict[time]
-            data = self.nc_file[case][model].variables[property][time_idx]
-        else:
-            data = self.nc_file[case][model].variables[property][:]
-
-        return data
+        time_idx = self.time_keys_dict[time]
+        return read_file_timestep(self.file_name, case, model, property, time_idx)
 
     def getLayerData(self, case, model, property, time, layer):
-        dims = self.getDims(case, model, property)
-        has_time = self.propertyHasTimeDim(case, model, property)
-        
-        if has_time:
-            time_idx = self.time_keys_dict[time]
-            if len(dims) == 4:
-                if property == 'S':
-                    wind_data = None
-                    all_properties = AllItems = [self.property_box.combo_box.itemText(i) for i in range(self.property_box.combo_box.count())]
-                    for wind_prop in ['U', 'V', 'W']:
-                        if wind_prop in all_properties:
-                            if wind_data is None:
-                                wind_data = self.nc_file[case][model].variables[wind_prop][time_idx, layer] ** 2
-                            else:
-                                wind_data += self.nc_file[case][model].variables[wind_prop][time_idx, layer] ** 2
-                    
-                    data = np.sqrt(wind_data)
-                elif property == 'S_max':
-                    wind_data = None
-                    all_properties = AllItems = [self.property_box.combo_box.itemText(i) for i in range(self.property_box.combo_box.count())]
-                    for wind_prop in ['U_max', 'V_max', 'W_max']:
-                        if wind_prop in all_properties:
-                            if wind_data is None:
-                                wind_data = self.nc_file[case][model].variables[wind_prop][time_idx, layer] ** 2
-                            else:
-                                wind_data += self.nc_file[case][model].variables[wind_prop][time_idx, layer] ** 2
-                    
-                    data = np.sqrt(wind_data)
-                else:
-                    data = self.nc_file[case][model].variables[property][time_idx, layer]
-            elif len(dims) == 3:
-                data = self.nc_file[case][model].variables[property][time_idx]
-            else:
-                data = None
-        else:
-            if len(dims) == 3:
-                data = self.nc_file[case][model].variables[property][layer]
-            elif len(dims) == 2:
-                data = self.nc_file[case][model].variables[property][:]
-            else:
-                data = None
-        
-        return data
+        time_idx = self.time_keys_dict[time]
+        return read_file_layer(self.file_name, case, model, property, time_idx, layer)
 
     def getModelsFromCase(self, case):
         if not self.nc_file is None:
@@ -280,15 +391,17 @@ class NcFileInterface(QWidget):
             return models
 
     def getTimesFromCase(self, case, model):
+        # the sorted time labels and the label to index dict are decoded once per case and model
         if not self.nc_file is None:
-            times = []
-            keys_dict = {}
-
-            for i, time in enumerate(self.nc_file[case][model].variables['time'][:]):
-                time_str = datetime.utcfromtimestamp(time).strftime("%Y-%m-%d_%H:%M:%S")
-                keys_dict[time_str] = i
-                times.append(time_str)
-            return times, keys_dict
+            if not (case, model) in self.time_axes:
+                with dataset_pool.lock:
+                    time_values = self.nc_file[case][model].variables['time'][:]
+
+                labels = decode_time_labels(time_values)
+                keys_dict = dict(zip(labels.tolist(), range(len(labels))))
+                self.time_axes[(case, model)] = (np.sort(labels).tolist(), keys_dict)
+
+            return self.time_axes[(case, model)]
         else:
             return None, {}
 
@@ -303,88 +416,103 @@ class NcFileInterface(QWidget):
             if num_dim == 2 or num_dim == 3:
                 properties.append(prop)
 
-        if all(item in properties for item in ['U', 'V']):
+        # the wind speed is computed on the fly if it was not stored by the converter
+        if all(item in properties for item in ['U', 'V']) and not 'S' in properties:
             properties.append('S')
 
-        if all(item in properties for item in ['U_max', 'V_max']):
+        if all(item in properties for item in ['U_max', 'V_max']) and not 'S_max' in properties:
             properties.append('S_max')
 
         return properties
 
+    def buildStatsIndex(self):
+        case = self.case_box.combo_box.currentText()
+        model = self.model_box.combo_box.currentText()
+        property = self.property_box.combo_box.currentText()
+
+        if property and case and model:
+            # the entries of the 'Auto (all data)' scaling, a full timestep fills the entries of all model levels
+            # at once
+            keys = self.getStatsKeys(case, model, property, None, None)
+            self.limits_scanner.scan(keys, self.statsTask, False, self.updateLimits, self.statsTasks)
+
+    def getStatsKeys(self, case, model, property, time, layer):
+        # entries of the given time or of all times if time is None
+        if self.propertyHasTimeDim(case, model, property):
+            if time is None:
+                time_indices = sorted(self.time_keys_dict.values())
+            else:
+                time_indices = [self.time_keys_dict[time]]
+        else:
+            time_indices = [0]
+
+        # the full field of the model levels is a single entry while every height level is interpolated and has
+        # its own entry
+        if self.height_levels:
+            heights = AGL_HEIGHTS if layer is None else [layer]
+            return [(self.stats_source, case + '/' + model + '/' + str(i), property + HEIGHT_SUFFIX, height) for i in time_indices for height in heights]
+        return [(self.stats_source, case + '/' + model + '/' + str(i), property, layer) for i in time_indices]
+
+    def statsTask(self, key):
+        _, item, property, layer = key
+        case, model, time_index = item.split('/')
+        if property.endswith(HEIGHT_SUFFIX):
+            return compute_group_height_level_stats, (self.file_name, case, model, property[:-len(HEIGHT_SUFFIX)], int(time_index), self.num_layers, layer)
+        return compute_group_stats, (self.file_name, case, model, property, int(time_index), layer)
+
+    def statsTasks(self, missing):
+        # consecutive timesteps of a property and layer are reduced in blocks aligned to the chunking of the variable
+        groups = {}
+        for key in missing:
+            case, model, time_index = key[1].split('/')
+            groups.setdefault((case, model, key[2], key[3]), []).append((int(time_index), key))
+
+        tasks = []
+        for (case, model, property, layer), entries in groups.items():
+            if property.endswith(HEIGHT_SUFFIX):
+                # height levels are interpolated per timestep
+                tasks.extend(([key], run_single, self.statsTask(key)) for _, key in entries)
+                continue
+
+            with dataset_pool.lock:
+                block_size = get_time_block_size(self.nc_file[case][model], property, layer)
+
+            blocks = {}
+            for time_index, key in sorted(entries):
+                blocks.setdefault(time_index // block_size, []).append((time_index, key))
+
+            for block in blocks.values():
+                keys = [key for _, key in block]
+                time_indices = [time_index for time_index, _ in block]
+                tasks.append((keys, reduce_group_stats, (self.file_name, case, model, property, time_indices, layer)))
+
+        return tasks
+
     def updateLimits(self):
         case = self.case_box.combo_box.currentText()
         model = self.model_box.combo_box.currentText()
         property = self.property_box.combo_box.currentText()
         time = self.time_box.combo_box.currentText()
-        time_index = self.time_box.combo_box.currentIndex()
         layer = self.layer_box.combo_box.currentText()
 
-        val_min = val_max = None
+        keys = None
         if self.scaling_mode == 'Auto (image)':
             if property and case and layer and time:
-                slice_data = self.getLayerData(case, model, property, time, int(layer))
-
-                if not (slice_data is None):
-                    val_min = slice_data.min()
-                    val_max = slice_data.max()
+                keys = self.getStatsKeys(case, model, property, time, int(layer))
 
         elif self.scaling_mode == 'Auto (timestep)':
             if property and case and layer and time:
-                data = self.getTimeData(case, model, property, time)
-                val_max = data.max()
-                val_min = data.min()
+                keys = self.getStatsKeys(case, model, property, time, None)
 
         elif self.scaling_mode == 'Auto (layer)':
             if property and case and layer:
-                val_min = np.inf
-                val_max = -np.inf
-
-                has_time = self.propertyHasTimeDim(case, model, property)
-                all_times, _ = self.getTimesFromCase(case, model)
-                if has_time:
-                    progress_widget = ProgressWidget(len(all_times))
-
-                    for i, time in enumerate(all_times):
-                        slice_data = self.getLayerData(case, model, property, time, int(layer))
-
-                        if not (slice_data is None):
-                            val_max = max(val_max, slice_data.max())
-                            val_min = min(val_min, slice_data.min())
-
-                        progress_widget.progress_bar.setValue(i)
-                        QApplication.processEvents()
-
-                    progress_widget.close()
-                else:
-                    slice_data = self.getLayerData(case, model, property, all_times[0], int(layer))
-
-                    if not (slice_data is None):
-                        val_max = max(val_max, slice_data.max())
-                        val_min = min(val_min, slice_data.min())
+                keys = self.getStatsKeys(case, model, property, None, int(layer))
 
         elif self.scaling_mode == 'Auto (all data)':
             if property and case:
-                val_min = np.inf
-                val_max = -np.inf
-
-                has_time = self.propertyHasTimeDim(case, model, property)
-                if has_time:
-                    all_times, _ = self.getTimesFromCase(case, model)
-                    progress_widget = ProgressWidget(len(all_times))
-
-                    for i, time in enumerate(all_times):
-                        data = self.getTimeData(case, model, property, time)
-                        val_max = max(val_max, data.max())
-                        val_min = min(val_min, data.min())
+                keys = self.getStatsKeys(case, model, property, None, None)
 
-                        progress_widget.progress_bar.setValue(i)
-                        QApplication.processEvents()
-
-                    progress_widget.close()
-                else:
-                    data = self.getTimeData(case, model, property, time)
-                    val_max = max(val_max, data.max())
-                    val_min = min(val_min, data.min())
-
-        if (not (val_min is None)) and (not (val_max is None)):
-            self.limits_changed.emit([val_min, val_max])
+        if keys:
+            self.limits_scanner.scan(keys, self.statsTask, batch=self.statsTasks)
+        else:
+            self.limits_scanner.cancel()
@@ -0,0 +1,71 @@
+import datetime
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt5 import QtCore
+
+from .render_utils import get_colormap
+
+def get_timestamps(times):
+    # unix timestamps of the time labels of wrfout folders and nc dataset files
+    return np.array([datetime.datetime.strptime(time.replace('_', ' '), '%Y-%m-%d %H:%M:%S').replace(tzinfo=datetime.timezone.utc).timestamp()
+                     for time in times])
+
+class ProbePlotWidget(pg.PlotWidget):
+    def __init__(self, parent=None):
+        super(ProbePlotWidget, self).__init__(parent, axisItems={'bottom': pg.DateAxisItem(utcOffset=0)})
+
+        self.cbar = 'jet'
+        self.timestamps = None
+
+        # the values of a layer are shown as a curve, the values of a column as an image of level against time
+        self.curve = self.plot([], [], pen=pg.mkPen('w', width=2), symbol='o', symbolSize=4)
+        self.image_item = pg.ImageItem(axisOrder='row-major')
+        self.addItem(self.image_item)
+        self.color_bar = pg.ColorBarItem(colorMap=get_colormap(self.cbar), interactive=False)
+        self.color_bar.setImageItem(self.image_item, insert_in=self.getPlotItem())
+        self.color_bar.hide()
+        self.time_line = pg.InfiniteLine(angle=90, pen=pg.mkPen('y'))
+        self.addItem(self.time_line)
+        self.time_line.hide()
+
+        self.setLabel('bottom', 'Time (UTC)')
+
+    def setCbar(self, cbar):
+        self.cbar = cbar
+        self.color_bar.setColorMap(get_colormap(cbar))
+
+    def setCurrentTime(self, times, time):
+        if self.timestamps is None or not time in times:
+            self.time_line.hide()
+            return
+
+        self.time_line.setValue(self.timestamps[times.index(time)])
+        self.time_line.show()
+
+    def plotProbe(self, times, values, title, time):
+        self.timestamps = get_timestamps(times)
+
+        if values.shape[1] == 1:
+            self.image_item.clear()
+            self.color_bar.hide()
+            self.curve.setData(self.timestamps, values[:, 0])
+            self.setLabel('left', 'Value')
+        else:
+            self.curve.setData([], [])
+
+            # every timestep covers the interval up to the next one
+            step = np.diff(self.timestamps).min() if len(self.timestamps) > 1 else 0.0
+            if step <= 0.0:
+                step = 3600.0
+            width = self.timestamps[-1] - self.timestamps[0] + step
+            self.image_item.setImage(np.ascontiguousarray(values.T), autoLevels=False)
+            self.image_item.setRect(QtCore.QRectF(self.timestamps[0] - 0.5 * step, -0.5, width, values.shape[1]))
+
+            valid = values[np.isfinite(values)]
+            self.color_bar.setLevels((float(valid.min()), float(valid.max())) if valid.size else (0.0, 1.0))
+            self.color_bar.show()
+            self.setLabel('left', 'Layer')
+
+        self.setTitle(title)
+        self.setCurrentTime(times, time)
@@ -0,0 +1,59 @@
+import numpy as np
+import pyqtgraph as pg
+from PyQt5 import QtCore
+
+from . import profiling
+from .render_utils import get_colormap
+from .section_utils import resample_section
+
+class SectionPlotWidget(pg.PlotWidget):
+    def __init__(self, parent=None):
+        super(SectionPlotWidget, self).__init__(parent)
+
+        self.cbar = 'jet'
+        self.levels = None
+
+        # the sections are resampled to regular heights, points below the terrain are transparent
+        self.image_item = pg.ImageItem(axisOrder='row-major')
+        self.addItem(self.image_item)
+        self.color_bar = pg.ColorBarItem(colorMap=get_colormap(self.cbar), interactive=False)
+        self.color_bar.setImageItem(self.image_item, insert_in=self.getPlotItem())
+
+        self.setLabel('bottom', 'Distance [grid points]')
+        self.setLabel('left', 'Height [m]')
+
+    def setCbar(self, cbar):
+        self.cbar = cbar
+        self.color_bar.setColorMap(get_colormap(cbar))
+
+    def setLevels(self, levels):
+        # fixed levels, None scales every section to its own range
+        self.levels = levels
+
+    def clearSection(self, title = ''):
+        self.image_item.clear()
+        self.setTitle(title)
+
+    def plot(self, values, heights, distance, title):
+        if values is None:
+            self.clearSection('Only 3D properties have a vertical section')
+            return
+
+        with profiling.span('resample'):
+            if heights is None:
+                # without the geopotential the levels are shown as they are
+                image, bottom, top = values, -0.5, values.shape[0] - 0.5
+                self.setLabel('left', 'Layer')
+            else:
+                image, bottom, top = resample_section(values, heights)
+                self.setLabel('left', 'Height [m]')
+
+            levels = self.levels
+            if levels is None:
+                valid = image[np.isfinite(image)]
+                levels = (float(valid.min()), float(valid.max())) if valid.size else (0.0, 1.0)
+
+            self.image_item.setImage(image, autoLevels=False)
+            self.image_item.setRect(QtCore.QRectF(0.0, bottom, max(float(distance[-1]), 1.0), top - bottom))
+            self.color_bar.setLevels(levels)
+            self.setTitle(title)
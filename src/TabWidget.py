@@ -3,7 +3,6 @@ from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QIntValidator, QDoubleValidator
 
 from .WidgetLoadData import WidgetLoadData
-from .WidgetPlotData import WidgetPlotData
 
 class CustomTabWidget(QWidget):
     def __init__(self, parent):
@@ -14,14 +13,10 @@ class CustomTabWidget(QWidget):
 
         self.tab_widget = QTabWidget()
 
-        self.tabs = [self.ui_open_widget,
-                     self.plot_widget
-                     ]
-
         self.tab_names = ['Set Data', 'Plot Data']
 
         # Add tabs
-        self.tab_widget.addTab(self.tabs[0], self.tab_names[0])
+        self.tab_widget.addTab(self.ui_open_widget, self.tab_names[0])
 
         # Add tabs to widget
         self.layout.addWidget(self.tab_widget)
@@ -30,21 +25,22 @@ class CustomTabWidget(QWidget):
 
     def initUi(self):
         self.ui_open_widget = WidgetLoadData(self)
-        self.plot_widget = WidgetPlotData(self)
+        self.plot_widget = None
 
-    def onDataFolderSet(self, value):
+    def initPlotting(self):
+        # the plot widgets pull in pyqtgraph, they are only created once there is data to show
         if not self.plotting_init:
-            self.tab_widget.addTab(self.tabs[1], self.tab_names[1])
+            from .WidgetPlotData import WidgetPlotData
+            self.plot_widget = WidgetPlotData(self)
+            self.tab_widget.addTab(self.plot_widget, self.tab_names[1])
             self.tab_widget.setCurrentIndex(1)
             self.plotting_init = True
 
-        self.plot_widget.onDataFolderSet(value)
-
-    def onDataFileSet(self, value):
-        if not self.plotting_init:
-            self.tab_widget.addTab(self.tabs[1], self.tab_names[1])
-            self.tab_widget.setCurrentIndex(1)
-            self.plotting_init = True
+    def onDataFolderSet(self, value, selection):
+        self.initPlotting()
+        self.plot_widget.onDataFolderSet(value, selection)
 
-        self.plot_widget.onDataFileSet(value)
+    def onDataFileSet(self, value, selection):
+        self.initPlotting()
+        self.plot_widget.onDataFileSet(value, selection)
 
@@ -1,22 +1,48 @@
-from netCDF4 import Dataset
 import os
 import sys
+import threading
+import time
 
 import PyQt5.QtCore as QtCore
-from PyQt5.QtCore import pyqtSignal, QObject
+from PyQt5.QtCore import pyqtSignal, QObject, QTimer
 from PyQt5.QtWidgets import QApplication, QFileDialog, QMessageBox
 
 from .MainWindow import MainWindow
 from .custom_widgets import ErrorBox
+from . import profiling
+from .folder_index import get_folder_index
+from .worker_pool import shutdown_process_pool
+
+def preload_data(path):
+    # scan the wrfout folder while the window is built, the files themselves are opened in the main thread as
+    # HDF5 only silences its error stack in the thread that initialized the library
+    try:
+        if os.path.isdir(path):
+            get_folder_index(path)
+    except OSError:
+        # errors are reported once the data is opened in the window
+        pass
 
 class WRFViewerApp(QObject):
-    data_folder_set = pyqtSignal(str)
-    data_file_set = pyqtSignal(str)
+    data_folder_set = pyqtSignal(str, dict)
+    data_file_set = pyqtSignal(str, dict)
 
-    def __init__(self):
+    def __init__(self, path = None, selection = None, start_time = None):
         super().__init__()
 
+        self.start_time = time.perf_counter() if start_time is None else start_time
+        self.path = path
+        self.selection = selection or {}
+
+        # the data is opened in the background while the window is built
+        self.preload_thread = None
+        if path is not None and os.path.isdir(path):
+            self.preload_thread = threading.Thread(target=preload_data, args=(path,), daemon=True)
+            self.preload_thread.start()
+
         self.app = QApplication(sys.argv)
+        self.app.aboutToQuit.connect(shutdown_process_pool)
+        self.app.aboutToQuit.connect(profiling.dump)
 
         self.window = MainWindow()
 
@@ -25,8 +51,27 @@ class WRFViewerApp(QObject):
 
     def run(self):
         self.window.show()
+        QTimer.singleShot(0, self.onStarted)
         sys.exit(self.app.exec_())
 
+    def onStarted(self):
+        self.reportStartup('Window shown')
+
+        if self.path is not None:
+            if self.preload_thread is not None:
+                self.preload_thread.join()
+            if os.path.isdir(self.path):
+                self.openFolder(self.path, self.selection)
+            else:
+                self.openFile(self.path, self.selection)
+            self.reportStartup('First frame')
+
+    def reportStartup(self, stage):
+        message = '{} after {:.2f} s'.format(stage, time.perf_counter() - self.start_time)
+        self.window.statusBar().showMessage(message, 5000)
+        if profiling.enabled:
+            print(message)
+
     def connectActions(self):
         self.window.tab_widget.ui_open_widget.load_db_button_folder.clicked.connect(self.initDatasetFolder)
         self.window.tab_widget.ui_open_widget.load_db_button_file.clicked.connect(self.initDatasetFile)
@@ -39,24 +84,28 @@ class WRFViewerApp(QObject):
         folder_name = QFileDialog.getExistingDirectory(None, "Select data folder", '.')
 
         if folder_name:
-            files_list = os.listdir(folder_name)
-
-            wrfout_files = [f for f in files_list if 'wrfout' in f]
+            self.openFolder(folder_name)
 
-            if len(wrfout_files) > 0:
-                self.data_folder_set.emit(folder_name)
-            else:
-                self.error_box = ErrorBox('Invalid Folder', 'No wrfout files present in the selected folder')
-                self.error_box.show()
+    def openFolder(self, folder_name, selection = None):
+        if os.path.isdir(folder_name) and len(get_folder_index(folder_name).getDomains()) > 0:
+            self.data_folder_set.emit(folder_name, selection or {})
+        else:
+            self.error_box = ErrorBox('Invalid Folder', 'No wrfout files present in the selected folder')
+            self.error_box.show()
 
     def initDatasetFile(self):
         file_name, _ = QFileDialog.getOpenFileName(None, "Select dataset file", '.', "(*.nc)")
 
         if file_name:
-            try:
-                file = Dataset(file_name, "r", format="NETCDF4")
+            self.openFile(file_name)
+
+    def openFile(self, file_name, selection = None):
+        from netCDF4 import Dataset
+
+        try:
+            file = Dataset(file_name, "r", format="NETCDF4")
 
-                self.data_file_set.emit(file_name)
-            except:
-                self.error_box = ErrorBox('Invalid File', 'Could not open nc file')
-                self.error_box.show()
+            self.data_file_set.emit(file_name, selection or {})
+        except:
+            self.error_box = ErrorBox('Invalid File', 'Could not open nc file')
+            self.error_box.show()
@@ -15,14 +15,37 @@ class WidgetPlotData(QWidget):
         self.tab_widget = QTabWidget()
 
         self.layer_plot_widget = LayerPlotWidget(self)
+        self.compare_plot_widget = None
+        self.data_path = None
 
         self.tab_widget.addTab(self.layer_plot_widget, "Layer Plot")
+        # the comparison is created when its tab is opened for the first time
+        self.tab_widget.addTab(QWidget(), "Compare")
+        self.tab_widget.currentChanged.connect(self.onTabChanged)
 
         self.layout.addWidget(self.tab_widget)
 
-    def onDataFolderSet(self, folder_name):
-        self.layer_plot_widget.setFolderName(folder_name)
+    def onTabChanged(self, index):
+        if self.tab_widget.tabText(index) != "Compare" or self.compare_plot_widget is not None:
+            return
 
-    def onDataFileSet(self, folder_name):
-        self.layer_plot_widget.setFileName(folder_name)
+        from .ComparePlotWidget import ComparePlotWidget
+        self.compare_plot_widget = ComparePlotWidget(self)
 
+        self.tab_widget.blockSignals(True)
+        placeholder = self.tab_widget.widget(index)
+        self.tab_widget.removeTab(index)
+        placeholder.deleteLater()
+        self.tab_widget.insertTab(index, self.compare_plot_widget, "Compare")
+        self.tab_widget.setCurrentIndex(index)
+        self.tab_widget.blockSignals(False)
+
+        self.compare_plot_widget.setDefaultSource(self.data_path)
+
+    def onDataFolderSet(self, folder_name, selection = None):
+        self.data_path = folder_name
+        self.layer_plot_widget.setFolderName(folder_name, selection)
+
+    def onDataFileSet(self, folder_name, selection = None):
+        self.data_path = folder_name
+        self.layer_plot_widget.setFileName(folder_name, selection)
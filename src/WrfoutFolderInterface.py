@@ -1,46 +1,55 @@
 from PyQt5.QtWidgets import *
-from PyQt5.QtCore import pyqtSignal
 
 
-from netCDF4 import Dataset
+import functools
 import numpy as np
 import os
-from wrf import getvar
-
-from .data_utils import get_times_from_filenamelist, get_layer_data, get_sample_data
-from .custom_widgets import ButtonComboBox, ProgressWidget
-
-class WrfoutFolderInterface(QWidget):
-    limits_changed = pyqtSignal(list)
-    data_changed = pyqtSignal(tuple)
 
+from .data_utils import compute_file_stats, read_layer_data
+from .folder_index import get_folder_index, get_sidecar_path
+from .frame_cache import frame_cache
+from .height_utils import AGL_HEIGHTS, HEIGHT_INPUTS, HEIGHT_SUFFIX, compute_height_level_stats, read_height_level
+from .stats_index import SCALING_RANGES, StatsIndex
+from .custom_widgets import ButtonComboBox
+from .DataInterface import DataInterface
+from .probe_utils import read_file_points
+from .profiling import span
+from .selection import SelectionTransaction
+from .property_catalog import get_catalog, get_num_layers
+from . import worker_pool
+from .section_utils import read_section, read_section_height, section_cache
+
+class WrfoutFolderInterface(DataInterface):
     def __init__(self, scaling_mode, parent = None):
-        super(QWidget, self).__init__(parent)
+        super().__init__(scaling_mode, parent)
 
-        self.default_property = 'U'
         self.files_dict = None
+        self.folder_index = None
         self.folder_name = None
-        self.scaling_mode = scaling_mode
 
         self.domain_box = ButtonComboBox(self)
-        self.property_box = ButtonComboBox(self)
-        self.layer_box = ButtonComboBox(self)
-        self.time_box = ButtonComboBox(self)
+        self.source_boxes = [self.domain_box]
 
         # data options
         main_layout = QVBoxLayout()
         form_layout_data = QFormLayout()
         form_layout_data.addRow(QLabel("Domain:"), self.domain_box)  
         form_layout_data.addRow(QLabel("Property:"), self.property_box)
+        form_layout_data.addRow(QLabel("Level:"), self.level_box)
         form_layout_data.addRow(QLabel("Layer:"), self.layer_box)
         form_layout_data.addRow(QLabel("Time:"), self.time_box)
         main_layout.addLayout(form_layout_data)
         self.setLayout(main_layout)
 
+        # cascaded changes of the selection result in a single load
+        self.selection = SelectionTransaction([self.domain_box.combo_box, self.property_box.combo_box, self.level_box, self.layer_box.combo_box,
+                                               self.time_box.combo_box], self.load, self.updateLimits)
+
         # connect signals
         self.domain_box.combo_box.currentTextChanged.connect(self.onDomainChanged)
         self.layer_box.combo_box.currentTextChanged.connect(self.onLayerChanged)
         self.property_box.combo_box.currentTextChanged.connect(self.onPropertyChanged)
+        self.level_box.currentTextChanged.connect(self.onLevelModeChanged)
         self.time_box.combo_box.currentTextChanged.connect(self.onTimeChanged)
 
     def setDomains(self, domains):
@@ -78,6 +87,9 @@ class WrfoutFolderInterface(QWidget):
     def setScalingMode(self, mode):
         self.scaling_mode = mode
 
+    def setScalingRange(self, scaling_range):
+        self.limits_scanner.setPercentiles(SCALING_RANGES[scaling_range])
+
     def setTimes(self, times):
         previous_time = self.time_box.combo_box.currentText()
         self.time_box.combo_box.clear()
@@ -91,18 +103,54 @@ class WrfoutFolderInterface(QWidget):
                 self.time_box.combo_box.setCurrentText(times[0])
 
     def onDomainChanged(self, domain):
+        with self.selection:
+            self.updateDomain()
+
+    def updateDomain(self):
+        domain = self.domain_box.combo_box.currentText()
         if domain:
-            times = get_times_from_filenamelist(self.files_dict[domain])
-            times.sort()
-            self.setTimes(times)
-            self.updateLimits()
+            self.setTimes(self.folder_index.getTimes(domain))
+            self.selection.requestLoad()
+            self.selection.requestLimits()
 
     def onLayerChanged(self, layer):
         if layer:
-            self.getData()
-
-            if self.scaling_mode == 'Auto (image)' or self.scaling_mode == 'Auto (layer)':
-                self.updateLimits()
+            with self.selection:
+                self.selection.requestLoad()
+
+                if self.scaling_mode == 'Auto (image)' or self.scaling_mode == 'Auto (layer)':
+                    self.selection.requestLimits()
+
+    def onLevelModeChanged(self, mode):
+        with self.selection:
+            if mode == 'Height AGL' and self.domain_box.combo_box.currentText():
+                if not self.hasHeightInputs():
+                    self.error_box = QMessageBox()
+                    self.error_box.setWindowTitle("Invalid Level")
+                    self.error_box.setText('The height above ground requires ' + ', '.join(HEIGHT_INPUTS))
+                    self.error_box.setIcon(QMessageBox.Critical)
+                    self.error_box.show()
+                    self.level_box.setCurrentText('Model level')
+
+            self.updateProperty()
+
+    def hasHeightInputs(self):
+        catalog = get_catalog(os.path.join(self.folder_name, self.files_dict[self.domain_box.combo_box.currentText()][0]))
+        return all(item in catalog for item in HEIGHT_INPUTS)
+
+    def getLayerLabel(self, layer):
+        # layers are heights above ground in m in the height level mode
+        if self.height_levels:
+            return ' ' + layer + ' m AGL'
+        return ' L' + layer
+
+    def getStatsKeys(self, files, property, layer):
+        # entries of the files for the given layer or of all layers if layer is None, the full field of the
+        # model levels is a single entry while every height level is interpolated and has its own entry
+        if not self.height_levels:
+            return [(file, 0, property, layer) for file in files]
+        heights = AGL_HEIGHTS if layer is None else [layer]
+        return [(file, 0, property + HEIGHT_SUFFIX, height) for file in files for height in heights]
 
     def onLimitsChanged(self):
         mode = self.scalingmode_box.currentText()
@@ -113,35 +161,49 @@ class WrfoutFolderInterface(QWidget):
                 self.plotting_widget.updateLimits(float(val_min), float(val_max))
 
     def onPropertyChanged(self, property):
-        if property:
-            domain = self.domain_box.combo_box.currentText()
-            time_index = self.time_box.combo_box.currentIndex()
-            data = get_sample_data(os.path.join(self.folder_name, self.files_dict[domain][time_index]), property)
-
-            if len(data.shape) == 3:
-                num_layers = data.shape[0]
-            elif len(data.shape) == 2:
-                num_layers = 1
-            else:
-                num_layers = None
+        with self.selection:
+            self.updateProperty()
+
+    def updateProperty(self):
+        property = self.property_box.combo_box.currentText()
+        domain = self.domain_box.combo_box.currentText()
+        if property and domain:
+            catalog = get_catalog(os.path.join(self.folder_name, self.files_dict[domain][0]))
+            num_layers = get_num_layers(catalog, property) if property in catalog else None
+
+            if self.level_box.currentText() == 'Height AGL' and not self.hasHeightInputs():
+                # other domains and folders without the geopotential only have model levels
+                self.level_box.setCurrentText('Model level')
+
+            if num_layers is None:
                 self.error_box = QMessageBox()
                 self.error_box.setWindowTitle("Invalid Property")
                 self.error_box.setText(str('Only plotting 2D or 3D properties is currently supported'))
                 self.error_box.setIcon(QMessageBox.Critical)
                 self.error_box.show()
 
+                # nothing can be loaded for this property
+                self.setLayers([])
+
+            # 2D properties stay on their single level
+            self.height_levels = bool(num_layers) and num_layers > 1 and self.level_box.currentText() == 'Height AGL'
+
             if num_layers:
-                layers = range(num_layers)
-                layers_str = [str(l) for l in layers]
+                if self.height_levels:
+                    layers_str = [str(height) for height in AGL_HEIGHTS]
+                else:
+                    layers_str = [str(l) for l in range(num_layers)]
                 self.setLayers(layers_str)
-                self.updateLimits()
+                self.selection.requestLoad()
+                self.selection.requestLimits()
 
     def onTimeChanged(self, time):
         if time:
-            self.getData()
+            with self.selection:
+                self.selection.requestLoad()
 
-            if self.scaling_mode == 'Auto (image)' or self.scaling_mode == 'Auto (timestep)':
-                self.updateLimits()
+                if self.scaling_mode == 'Auto (image)' or self.scaling_mode == 'Auto (timestep)':
+                    self.selection.requestLimits()
 
     def getData(self):
         domain = self.domain_box.combo_box.currentText()
@@ -153,51 +215,138 @@ class WrfoutFolderInterface(QWidget):
         if not domain or not time or not layer or not property:
             return
 
-        slice_data = get_layer_data(os.path.join(self.folder_name, self.files_dict[domain][time_index]), property, int(layer))
+        key, loader = self.frameRequest(time_index, int(layer))
+        with span('load'):
+            slice_data = frame_cache.get(key, loader)
 
         if not (slice_data is None):
-            title = property + ' ' + domain + ' L' + layer + ' ' + time
+            title = property + ' ' + domain + self.getLayerLabel(layer) + ' ' + time
             self.data_changed.emit((slice_data, title))
+        else:
+            self.error_box = QMessageBox()
+            self.error_box.setWindowTitle("Invalid Property")
+            self.error_box.setText(str('Only plotting 2D or 3D properties is currently supported'))
+            self.error_box.setIcon(QMessageBox.Critical)
+            self.error_box.show()
 
-    def setFolderName(self, folder_name):
-        all_files = os.listdir(folder_name)
+        self.getSection()
+        self.getProbe()
 
-        wrfout_files = [f for f in all_files if 'wrfout' in f]
+    def getProbe(self):
+        domain = self.domain_box.combo_box.currentText()
+        property = self.property_box.combo_box.currentText()
+        layer = self.layer_box.combo_box.currentText()
+
+        if self.probe_point is None or not domain or not property or not layer:
+            self.probe_loader.cancel()
+            return
 
-        self.files_dict = {}
+        row, col = self.probe_point
+        layer = None if self.probe_column else int(layer)
+        height = layer if self.height_levels and layer is not None else None
+        if height is not None:
+            layer = None
+        key = ('probe', self.folder_name, domain, property, layer, height, row, col)
 
-        for file in wrfout_files:
-            splitted = file.split('_')
-            if not splitted[1] in self.files_dict.keys():
-                self.files_dict[splitted[1]] = []
+        # only the point is read from every file, the files are split into a batch per worker
+        filenames = [os.path.join(self.folder_name, file) for file in self.files_dict[domain]]
+        batch_size = -(-len(filenames) // max(worker_pool.num_workers, 1))
+        tasks = [(read_file_points, (filenames[i:i + batch_size], property, row, col, layer, height)) for i in range(0, len(filenames), batch_size)]
 
-            self.files_dict[splitted[1]].append(file)
+        title = property + ' ' + domain + ('' if self.probe_column else self.getLayerLabel(self.layer_box.combo_box.currentText())) + ' at ({}, {})'.format(row, col)
+        self.probe_loader.load(key, tasks, (self.folder_index.getTimes(domain), title))
 
-        for key in self.files_dict.keys():
-            self.files_dict[key].sort()
+    def onProbeLoaded(self, values, context):
+        times, title = context
+        self.probe_changed.emit((times, values, title, self.time_box.combo_box.currentText()))
+
+    def getSection(self):
+        domain = self.domain_box.combo_box.currentText()
+        time = self.time_box.combo_box.currentText()
+        property = self.property_box.combo_box.currentText()
+
+        if self.section_index is None or not domain or not time or not property:
+            return
 
+        # only the columns below the line are read, the sections are cached like the frames
+        values, heights = None, None
+        catalog = get_catalog(os.path.join(self.folder_name, self.files_dict[domain][0]))
+        if property in catalog and len(catalog[property]['shape']) == 3:
+            with span('section'):
+                time_index = self.time_box.combo_box.currentIndex()
+                values = section_cache.get(*self.sectionRequest(time_index))
+                heights = section_cache.get(*self.sectionHeightRequest(time_index))
+
+        title = property + ' ' + domain + ' ' + time
+        self.section_changed.emit((values, heights, self.section_index.distance, title))
+
+    def sectionRequest(self, time_index):
+        domain = self.domain_box.combo_box.currentText()
+        property = self.property_box.combo_box.currentText()
+        filename = os.path.join(self.folder_name, self.files_dict[domain][time_index])
+        key = ('section', filename, property, self.section_index.key)
+        return key, functools.partial(read_section, filename, property, self.section_index)
+
+    def sectionHeightRequest(self, time_index):
+        domain = self.domain_box.combo_box.currentText()
+        filename = os.path.join(self.folder_name, self.files_dict[domain][time_index])
+        key = ('section height', filename, self.section_index.key)
+        return key, functools.partial(read_section_height, filename, self.section_index)
+
+    def sectionRequests(self, time_index):
+        return [self.sectionRequest(time_index), self.sectionHeightRequest(time_index)]
+
+    def frameRequest(self, time_index, layer):
+        domain = self.domain_box.combo_box.currentText()
+        property = self.property_box.combo_box.currentText()
+        filename = os.path.join(self.folder_name, self.files_dict[domain][time_index])
+        if self.height_levels:
+            return (filename, property, HEIGHT_SUFFIX, layer), functools.partial(read_height_level, filename, property, layer)
+        return (filename, property, layer), functools.partial(read_layer_data, filename, property, layer)
+
+    def setFolderName(self, folder_name, selection = None):
+        self.folder_index = get_folder_index(folder_name)
+        self.files_dict = self.folder_index.files_dict
+        wrfout_files = list(self.folder_index.entries.keys())
+
+        # the caches are shared with the other panels of a comparison, their keys contain the file names and
+        # the entries of the previous folder are evicted once the space is needed
         self.folder_name = folder_name
 
-        domains = list(self.files_dict.keys())
-        domains.sort()
+        sources = {file: os.path.join(folder_name, file) for file in wrfout_files}
+        self.stats_index = StatsIndex(get_sidecar_path(folder_name, 'stats.json'), sources)
+        self.limits_scanner.setStatsIndex(self.stats_index)
 
-        ncfile = Dataset(os.path.join(folder_name, self.files_dict[domains[0]][0]))
-        all_properties = list(ncfile.variables.keys())
+        domains = self.folder_index.getDomains()
 
-        plot_properties = []
-        for prop in all_properties:
-            try:
-                data = getvar(ncfile, prop, meta=False)
-                if len(data.shape) > 1:
-                    plot_properties.append(prop)
-            except:
-                pass
+        # the properties are described by the metadata of the first file only, no data is read
+        catalog = get_catalog(os.path.join(folder_name, self.files_dict[domains[0]][0]))
+        plot_properties = list(catalog.keys())
 
-        if all(item in all_properties for item in ['U', 'V']):
-            plot_properties.append('S')
+        with self.selection:
+            self.setDomains(domains)
+            self.updateDomain()
+            self.setProperties(plot_properties)
+            self.updateProperty()
 
-        self.setDomains(domains)
-        self.setProperties(plot_properties)
+            if selection:
+                self.applySelection(**selection)
+
+    def buildStatsIndex(self):
+        domain = self.domain_box.combo_box.currentText()
+        property = self.property_box.combo_box.currentText()
+
+        if property and domain:
+            # the entries of the 'Auto (all data)' scaling, the full field of a file fills the entries of all
+            # model levels at once
+            keys = self.getStatsKeys(self.files_dict[domain], property, None)
+            self.limits_scanner.scan(keys, self.statsTask, False, self.updateLimits)
+
+    def statsTask(self, key):
+        file, _, property, layer = key
+        if property.endswith(HEIGHT_SUFFIX):
+            return compute_height_level_stats, (os.path.join(self.folder_name, file), property[:-len(HEIGHT_SUFFIX)], layer)
+        return compute_file_stats, (os.path.join(self.folder_name, file), property, layer)
 
     def updateLimits(self):
         domain = self.domain_box.combo_box.currentText()
@@ -206,55 +355,24 @@ class WrfoutFolderInterface(QWidget):
         time_index = self.time_box.combo_box.currentIndex()
         layer = self.layer_box.combo_box.currentText()
 
-        val_min = val_max = None
+        keys = None
         if self.scaling_mode == 'Auto (image)':
             if property and domain and layer and time:
-                slice_data = get_layer_data(os.path.join(self.folder_name, self.files_dict[domain][time_index]), property, int(layer))
-
-                if not (slice_data is None):
-                    val_min = slice_data.min()
-                    val_max = slice_data.max()
+                keys = self.getStatsKeys([self.files_dict[domain][time_index]], property, int(layer))
 
         elif self.scaling_mode == 'Auto (timestep)':
-            data = get_sample_data(os.path.join(self.folder_name, self.files_dict[domain][time_index]), property)
-            val_max = data.max()
-            val_min = data.min()
+            if property and domain and time:
+                keys = self.getStatsKeys([self.files_dict[domain][time_index]], property, None)
 
         elif self.scaling_mode == 'Auto (layer)':
             if property and domain and layer:
-                val_min = np.inf
-                val_max = -np.inf
-
-                progress_widget = ProgressWidget(len(self.files_dict[domain]))
-
-                for i, file in enumerate(self.files_dict[domain]):
-                    slice_data = get_layer_data(os.path.join(self.folder_name, file), property, int(layer))
-
-                    if not (slice_data is None):
-                        val_max = max(val_max, slice_data.max())
-                        val_min = min(val_min, slice_data.min())
-
-                    progress_widget.progress_bar.setValue(i)
-                    QApplication.processEvents()
-
-                progress_widget.close()
+                keys = self.getStatsKeys(self.files_dict[domain], property, int(layer))
 
         elif self.scaling_mode == 'Auto (all data)':
             if property and domain:
-                val_min = np.inf
-                val_max = -np.inf
-
-                progress_widget = ProgressWidget(len(self.files_dict[domain]))
-
-                for i, file in enumerate(self.files_dict[domain]):
-                    data = get_sample_data(os.path.join(self.folder_name, file), property)
-                    val_max = max(val_max, data.max())
-                    val_min = min(val_min, data.min())
-
-                    progress_widget.progress_bar.setValue(i)
-                    QApplication.processEvents()
-
-                progress_widget.close()
+                keys = self.getStatsKeys(self.files_dict[domain], property, None)
 
-        if (not (val_min is None)) and (not (val_max is None)):
-            self.limits_changed.emit([val_min, val_max])
+        if keys:
+            self.limits_scanner.scan(keys, self.statsTask)
+        else:
+            self.limits_scanner.cancel()
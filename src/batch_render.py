@@ -0,0 +1,160 @@
+import concurrent.futures
+import os
+
+import numpy as np
+
+from .data_utils import compute_file_stats, read_layer_data
+from .folder_index import get_folder_index, get_sidecar_path
+from .nc_utils import compute_group_stats, decode_time_labels, has_time_dim, read_file_layer
+from .dataset_pool import dataset_pool
+from .render_utils import colorize, get_lookup_table, write_png
+from .stats_index import SCALING_RANGES, StatsIndex
+from .worker_pool import POOL_ERRORS, get_process_pool
+
+SCALING_MODES = ['Auto (image)', 'Auto (timestep)', 'Auto (layer)', 'Auto (all data)', 'Custom']
+
+class WrfoutFolderSource:
+    def __init__(self, folder_name, domain = None):
+        self.folder_name = folder_name
+        self.folder_index = get_folder_index(folder_name)
+        self.domain = domain or self.folder_index.getDomains()[0]
+        self.files = self.folder_index.getFiles(self.domain)
+        self.times = self.folder_index.getTimes(self.domain)
+
+        sources = {file: os.path.join(folder_name, file) for file in self.folder_index.entries.keys()}
+        self.stats_index = StatsIndex(get_sidecar_path(folder_name, 'stats.json'), sources)
+
+    def frameTask(self, property, time_index, layer):
+        return read_layer_data, (os.path.join(self.folder_name, self.files[time_index]), property, layer)
+
+    def statsKey(self, property, time_index, layer):
+        return (self.files[time_index], 0, property, layer)
+
+    def statsTask(self, key):
+        file, _, property, layer = key
+        return compute_file_stats, (os.path.join(self.folder_name, file), property, layer)
+
+class NcFileSource:
+    def __init__(self, file_name, case = None, model = None):
+        self.file_name = file_name
+        self.stats_source = os.path.basename(file_name)
+        self.stats_index = StatsIndex(file_name + '.stats.json', {self.stats_source: file_name})
+
+        with dataset_pool.lock:
+            nc_file = dataset_pool.get(file_name)
+            self.case = case or list(nc_file.groups.keys())[0]
+            self.model = model or list(nc_file[self.case].groups.keys())[0]
+            labels = decode_time_labels(nc_file[self.case][self.model].variables['time'][:])
+
+        # frames are rendered in chronological order
+        self.time_indices = np.argsort(labels, kind='stable').tolist()
+        self.times = [labels[i] for i in self.time_indices]
+
+    def hasTime(self, property):
+        with dataset_pool.lock:
+            return has_time_dim(dataset_pool.get(self.file_name)[self.case][self.model], property)
+
+    def frameTask(self, property, time_index, layer):
+        return read_file_layer, (self.file_name, self.case, self.model, property, self.time_indices[time_index], layer)
+
+    def statsKey(self, property, time_index, layer):
+        time_idx = self.time_indices[time_index] if self.hasTime(property) else 0
+        return (self.stats_source, self.case + '/' + self.model + '/' + str(time_idx), property, layer)
+
+    def statsTask(self, key):
+        _, item, property, layer = key
+        case, model, time_index = item.split('/')
+        return compute_group_stats, (self.file_name, case, model, property, int(time_index), layer)
+
+def open_source(path, domain = None, case = None, model = None):
+    if os.path.isdir(path):
+        return WrfoutFolderSource(path, domain)
+    return NcFileSource(path, case, model)
+
+def fill_stats(source, keys, pool):
+    futures = {}
+    for key in source.stats_index.missing(keys):
+        function, args = source.statsTask(key)
+        futures[pool.submit(function, *args)] = key
+
+    try:
+        for future in concurrent.futures.as_completed(futures):
+            key = futures[future]
+            try:
+                stats = future.result()
+            except POOL_ERRORS:
+                # the pool failed, the statistics of the key are not known
+                raise
+            except Exception:
+                # do not try again to compute the statistics of data that cannot be read
+                stats = {key[3]: [None, None, 0]}
+            source.stats_index.store(key[0], key[1], key[2], stats)
+    finally:
+        source.stats_index.save()
+
+def get_frame_limits(source, property, time_indices, layer, scaling_mode, pool, val_min = None, val_max = None, percentiles = None):
+    # limits of every frame, the statistics are taken from the index of the data source, percentiles are the
+    # (low, high) percentiles used instead of the min and max
+    if scaling_mode == 'Custom':
+        return [(val_min, val_max)] * len(time_indices)
+
+    if scaling_mode == 'Auto (image)':
+        frame_keys = [[source.statsKey(property, t, layer)] for t in time_indices]
+    elif scaling_mode == 'Auto (timestep)':
+        frame_keys = [[source.statsKey(property, t, None)] for t in time_indices]
+    elif scaling_mode == 'Auto (layer)':
+        keys = [source.statsKey(property, t, layer) for t in range(len(source.times))]
+        frame_keys = [keys] * len(time_indices)
+    else:
+        keys = [source.statsKey(property, t, None) for t in range(len(source.times))]
+        frame_keys = [keys] * len(time_indices)
+
+    unique_keys = list(dict.fromkeys(key for keys in frame_keys for key in keys))
+    fill_stats(source, unique_keys, pool)
+
+    limits = []
+    for keys in frame_keys:
+        stats = source.stats_index.reduce(keys, percentiles)
+        limits.append((stats[0], stats[1]))
+    return limits
+
+def render_frame(frame_task, val_min, val_max, lut, filename):
+    function, args = frame_task
+    slice_data = function(*args)
+    if slice_data is None:
+        return None
+
+    if val_min is None or val_max is None:
+        val_min = float(np.nanmin(slice_data))
+        val_max = float(np.nanmax(slice_data))
+
+    write_png(filename, colorize(slice_data, val_min, val_max, lut))
+    return filename
+
+def render_frames(path, property, layer, output_folder, start = 0, stop = None, step = 1, cbar = 'jet',
+                  scaling_mode = 'Auto (layer)', val_min = None, val_max = None, domain = None, case = None,
+                  model = None, progress = None, scaling_range = 'Min/max'):
+    source = open_source(path, domain, case, model)
+    pool = get_process_pool()
+
+    stop = len(source.times) if stop is None else min(stop, len(source.times))
+    time_indices = list(range(start, stop, step))
+    limits = get_frame_limits(source, property, time_indices, layer, scaling_mode, pool, val_min, val_max, SCALING_RANGES[scaling_range])
+    lut = get_lookup_table(cbar)
+
+    os.makedirs(output_folder, exist_ok=True)
+
+    futures = []
+    for time_index, (frame_min, frame_max) in zip(time_indices, limits):
+        filename = os.path.join(output_folder, property + '_Time' + str(time_index).zfill(6) + '.png')
+        futures.append(pool.submit(render_frame, source.frameTask(property, time_index, layer), frame_min, frame_max, lut, filename))
+
+    written = []
+    for i, future in enumerate(concurrent.futures.as_completed(futures)):
+        filename = future.result()
+        if filename is not None:
+            written.append(filename)
+        if progress is not None:
+            progress(i + 1, len(futures))
+
+    return sorted(written)
@@ -0,0 +1,252 @@
+from collections import OrderedDict
+import concurrent.futures
+import os
+import threading
+
+def get_nbytes(data):
+    # memory held by a cached value, the mask of masked arrays and the items of tuples are counted as well
+    if isinstance(data, (tuple, list)):
+        return sum(get_nbytes(item) for item in data)
+
+    nbytes = getattr(data, 'nbytes', 0)
+    # masked arrays without masked values share a scalar mask
+    mask = getattr(data, 'mask', None)
+    if getattr(mask, 'ndim', 0) > 0:
+        nbytes += mask.nbytes
+    return nbytes
+
+def init_prefetch_thread():
+    # the loaders of the prefetch threads open netCDF files
+    from .dataset_pool import disable_hdf5_error_printing
+    disable_hdf5_error_printing()
+
+class Cache:
+    # named cache of the cache manager, the entries are counted against the memory budget shared by all caches
+    def __init__(self, manager, name):
+        self.manager = manager
+        self.name = name
+        self.num_bytes = 0
+        self.hits = 0
+        # requests that waited for a prefetch still loading the entry
+        self.waits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # all caches share the lock of the manager, an insert may evict the entries of another cache
+        self._lock = manager.lock
+        self._frames = {}
+        self._pending = {}
+        self._generation = 0
+
+    def get(self, key, loader):
+        with self._lock:
+            if key in self._frames:
+                self.hits += 1
+                self.manager._touch(self, key)
+                return self._frames[key]
+            future = self._pending.get(key)
+
+        if future is not None:
+            # the frame is already being loaded, waiting for it is faster than reading it again
+            try:
+                data = future.result()
+                with self._lock:
+                    self.waits += 1
+                return data
+            except Exception:
+                pass
+
+        with self._lock:
+            self.misses += 1
+            generation = self._generation
+
+        data = loader()
+        self._insert(key, data, generation)
+        return data
+
+    def lookup(self, key):
+        # cached data or None, used for data that is loaded asynchronously
+        with self._lock:
+            data = self._frames.get(key)
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.manager._touch(self, key)
+            return data
+
+    def insert(self, key, data):
+        with self._lock:
+            generation = self._generation
+        self._insert(key, data, generation)
+
+    def discard(self, key):
+        with self._lock:
+            self.manager._remove(self, key)
+
+    def getMany(self, requests, pool):
+        # frames of the (key, loader) requests, the frames that are neither cached nor being loaded are read in
+        # parallel by the pool if there are several of them, the loaders have to be picklable
+        results = [None] * len(requests)
+        pending = []
+        missing = []
+        with self._lock:
+            generation = self._generation
+            for i, (key, loader) in enumerate(requests):
+                if key in self._frames:
+                    self.hits += 1
+                    self.manager._touch(self, key)
+                    results[i] = self._frames[key]
+                elif key in self._pending:
+                    pending.append(i)
+                else:
+                    missing.append(i)
+
+        if len(missing) > 1:
+            with self._lock:
+                self.misses += len(missing)
+            futures = {i: pool.submit(requests[i][1]) for i in missing}
+            for i, future in futures.items():
+                try:
+                    results[i] = future.result()
+                    self._insert(requests[i][0], results[i], generation)
+                except Exception:
+                    # read again in this process, a real error of the loader is raised there
+                    pending.append(i)
+        else:
+            pending.extend(missing)
+
+        for i in pending:
+            results[i] = self.get(*requests[i])
+        return results
+
+    def prefetch(self, requests):
+        # requests are (key, loader) tuples in the order the frames will be shown
+        with self._lock:
+            generation = self._generation
+            for key, loader in requests:
+                if key in self._frames or key in self._pending:
+                    continue
+                self._pending[key] = self.manager.executor.submit(self._load, key, loader, generation)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+            for key in list(self._frames.keys()):
+                self.manager._remove(self, key)
+
+    def stats(self):
+        with self._lock:
+            return {'frames': len(self._frames),
+                    'bytes': self.num_bytes,
+                    'max_bytes': self.manager.max_bytes,
+                    'pending': len(self._pending),
+                    'hits': self.hits,
+                    'waits': self.waits,
+                    'misses': self.misses,
+                    'evictions': self.evictions}
+
+    def _load(self, key, loader, generation):
+        try:
+            data = loader()
+            self._insert(key, data, generation)
+            return data
+        finally:
+            with self._lock:
+                if generation == self._generation:
+                    self._pending.pop(key, None)
+
+    def _insert(self, key, data, generation):
+        if data is None:
+            return
+
+        with self._lock:
+            # frames of a previous selection are not inserted anymore after the cache was cleared
+            if generation != self._generation or key in self._frames:
+                return
+
+            nbytes = get_nbytes(data)
+            if not self.manager._reserve(nbytes):
+                return
+
+            self._frames[key] = data
+            self.num_bytes += nbytes
+            self.manager._add(self, key, nbytes)
+
+class CacheManager:
+    # single memory budget of all caches of the viewer, the least recently used entries of any cache are evicted
+    # once an insert would exceed it
+    def __init__(self, max_bytes, num_threads = 2):
+        self.max_bytes = max_bytes
+        self.num_bytes = 0
+        self.lock = threading.RLock()
+        self.executor = concurrent.futures.ThreadPoolExecutor(num_threads, thread_name_prefix='prefetch', initializer=init_prefetch_thread)
+
+        self._caches = {}
+        # (cache, key) -> size of all entries in the order of their last use
+        self._entries = OrderedDict()
+
+    def cache(self, name):
+        with self.lock:
+            cache = self._caches.get(name)
+            if cache is None:
+                cache = self._caches[name] = Cache(self, name)
+            return cache
+
+    def setMaxBytes(self, max_bytes):
+        with self.lock:
+            self.max_bytes = max_bytes
+            self._reserve(0)
+
+    def clear(self):
+        for cache in list(self._caches.values()):
+            cache.clear()
+
+    def stats(self):
+        with self.lock:
+            return {'bytes': self.num_bytes,
+                    'max_bytes': self.max_bytes,
+                    'caches': {name: cache.stats() for name, cache in self._caches.items()}}
+
+    def _touch(self, cache, key):
+        self._entries.move_to_end((cache, key))
+
+    def _add(self, cache, key, nbytes):
+        self._entries[(cache, key)] = nbytes
+        self.num_bytes += nbytes
+
+    def _remove(self, cache, key):
+        nbytes = self._entries.pop((cache, key), None)
+        if nbytes is None:
+            return
+        del cache._frames[key]
+        cache.num_bytes -= nbytes
+        self.num_bytes -= nbytes
+
+    def _reserve(self, nbytes):
+        # evict until nbytes fit into the budget, False if they never fit
+        if nbytes > self.max_bytes:
+            return False
+
+        while self._entries and self.num_bytes + nbytes > self.max_bytes:
+            cache, key = next(iter(self._entries))
+            self._remove(cache, key)
+            cache.evictions += 1
+        return True
+
+def get_summary():
+    # memory used by all caches and the size and hit rate of every cache that was used
+    stats = cache_manager.stats()
+    parts = ['Cache {:.0f} / {:.0f} MB'.format(stats['bytes'] / 2**20, stats['max_bytes'] / 2**20)]
+    for name, cache_stats in sorted(stats['caches'].items()):
+        requests = cache_stats['hits'] + cache_stats['waits'] + cache_stats['misses']
+        if requests:
+            parts.append('{} {:.0f} MB {:.0f}%'.format(name, cache_stats['bytes'] / 2**20, 100.0 * cache_stats['hits'] / requests))
+    return ' | '.join(parts)
+
+# the former frame cache variable is still honored
+cache_manager = CacheManager(int(float(os.environ.get('WRFVIEWER_CACHE_MB', os.environ.get('WRFVIEWER_FRAME_CACHE_MB', 1024))) * 2**20),
+                             int(os.environ.get('WRFVIEWER_PREFETCH_THREADS', 2)))
@@ -0,0 +1,143 @@
+import concurrent.futures
+import datetime
+import os
+
+import numpy as np
+from netCDF4 import Dataset
+
+from .data_utils import get_sample_data
+from .dataset_pool import dataset_pool
+from .folder_index import get_folder_index
+from .property_catalog import MASS_DIMS, get_catalog
+from .stats_index import StatsIndex, compute_stats, reduce_stats
+from .wind_utils import as_float_array, get_stagger_axis
+from . import worker_pool
+
+TIME_UNITS = 'seconds since 1970-01-01 00:00:00'
+
+def get_default_properties(catalog):
+    # the raw variables and the wind speed, the diagnostics are only converted if they are requested
+    return sorted(name for name, entry in catalog.items() if entry['kind'] != 'diagnostic')
+
+def get_timestamp(time):
+    return datetime.datetime.strptime(time, '%Y-%m-%d %H:%M:%S').replace(tzinfo=datetime.timezone.utc).timestamp()
+
+def get_converted_dims(ncfile, catalog, property):
+    # names of the spatial dimensions after destaggering, the staggered dimension of a raw variable
+    # loses its _stag suffix
+    entry = catalog[property]
+    if entry['kind'] != 'raw':
+        return MASS_DIMS[-len(entry['shape']):]
+
+    variable = ncfile.variables[property]
+    dims = list(variable.dimensions[1:])
+    axis = get_stagger_axis(variable)
+    if axis is not None:
+        dims[axis] = dims[axis][:-len('_stag')]
+    return dims
+
+def read_converted(filename, property):
+    # destaggered float32 field of a wrfout file with the statistics of all its layers
+    data = get_sample_data(filename, property)
+    if np.ma.isMaskedArray(data):
+        data = as_float_array(data)
+    data = np.asarray(data, dtype=np.float32)
+    return data, compute_stats(data)
+
+def create_group(nc_file, case, model, times, properties, dims_dict, shapes_dict, complevel):
+    group = nc_file.createGroup(case).createGroup(model)
+
+    group.createDimension('time', len(times))
+    time_variable = group.createVariable('time', 'f8', ('time',))
+    time_variable.units = TIME_UNITS
+    time_variable[:] = [get_timestamp(time) for time in times]
+
+    variables = {}
+    for property in properties:
+        for dim, size in zip(dims_dict[property], shapes_dict[property]):
+            if dim not in group.dimensions:
+                group.createDimension(dim, size)
+
+        # a chunk holds a single layer of a single timestep
+        chunksizes = [1] * (len(shapes_dict[property]) - 2) + list(shapes_dict[property][-2:])
+        variables[property] = group.createVariable(property, 'f4', ['time'] + list(dims_dict[property]),
+                                                   zlib=complevel > 0, complevel=max(complevel, 1), shuffle=complevel > 0,
+                                                   chunksizes=[1] + chunksizes)
+    return variables
+
+def convert_domain(nc_file, folder_name, domain, case, properties, complevel, pool, progress = None):
+    folder_index = get_folder_index(folder_name)
+    files = [os.path.join(folder_index.folder_name, file) for file in folder_index.getFiles(domain)]
+    times = folder_index.getTimes(domain)
+
+    catalog = get_catalog(files[0])
+    properties = get_default_properties(catalog) if properties is None else [p for p in properties if p in catalog]
+    with dataset_pool.lock:
+        ncfile = dataset_pool.get(files[0])
+        dims_dict = {property: get_converted_dims(ncfile, catalog, property) for property in properties}
+    shapes_dict = {property: catalog[property]['shape'] for property in properties}
+
+    variables = create_group(nc_file, case, domain, times, properties, dims_dict, shapes_dict, complevel)
+
+    # the fields are read in the worker processes and written by this process only, the number of fields
+    # in flight is bounded to limit the memory usage
+    tasks = [(time_index, property) for property in properties for time_index in range(len(files))]
+    max_pending = 2 * max(worker_pool.num_workers, 1)
+    pending = {}
+    stats = {}
+    done = 0
+
+    while done < len(tasks):
+        while done + len(pending) < len(tasks) and len(pending) < max_pending:
+            time_index, property = tasks[done + len(pending)]
+            pending[pool.submit(read_converted, files[time_index], property)] = (time_index, property)
+
+        finished, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in finished:
+            time_index, property = pending.pop(future)
+            data, field_stats = future.result()
+            variables[property][time_index] = data
+            stats[(time_index, property)] = field_stats
+
+            done += 1
+            if progress is not None:
+                progress(done, len(tasks))
+
+    for property in properties:
+        val_min, val_max, _ = reduce_stats(stats[(t, property)][None] for t in range(len(files)))
+        if val_min is not None:
+            variables[property].actual_range = np.array([val_min, val_max], dtype=np.float32)
+
+    return stats
+
+def convert_folder(folder_name, output_file, domains = None, case = None, properties = None, complevel = 4, progress = None):
+    folder_index = get_folder_index(folder_name)
+    available = folder_index.getDomains()
+    domains = available if domains is None else domains
+
+    # the domains are checked before the output file is created, an unknown domain has no files to convert
+    if not available:
+        raise ValueError('no wrfout files in ' + folder_name)
+    unknown = [domain for domain in domains if domain not in available]
+    if unknown:
+        raise ValueError('unknown domains ' + ', '.join(unknown) + ', the folder has ' + ', '.join(available))
+
+    case = case or os.path.basename(os.path.normpath(folder_name))
+    pool = worker_pool.get_process_pool()
+
+    stats_dict = {}
+    with Dataset(output_file, 'w', format='NETCDF4') as nc_file:
+        nc_file.source = os.path.abspath(folder_name)
+        for domain in domains:
+            stats_dict[domain] = convert_domain(nc_file, folder_name, domain, case, properties, complevel, pool, progress)
+
+    # the statistics are already known, store them in the index of the new file so the auto scaling
+    # modes do not need to scan it again
+    stats_source = os.path.basename(output_file)
+    stats_index = StatsIndex(output_file + '.stats.json', {stats_source: output_file})
+    for domain, stats in stats_dict.items():
+        for (time_index, property), field_stats in stats.items():
+            stats_index.store(stats_source, case + '/' + domain + '/' + str(time_index), property, field_stats)
+    stats_index.save()
+
+    return output_file
@@ -42,9 +42,11 @@ class ProgressWidget(QWidget):
         self.setWindowTitle(' ')
         self.progress_bar = QProgressBar(self)
         self.progress_bar.setMaximum(maximum)
+        self.cancel_button = QPushButton('Cancel', self)
         self.progress_widget_layout = QVBoxLayout(self)
         self.progress_widget_layout.addWidget(QLabel('Computing limits ...'))
         self.progress_widget_layout.addWidget(self.progress_bar)
+        self.progress_widget_layout.addWidget(self.cancel_button)
         self.show()
 
 class ErrorBox(QMessageBox):
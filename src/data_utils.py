@@ -1,77 +1,139 @@
-import datetime
-from netCDF4 import Dataset
 import numpy as np
-from wrf import getvar, destagger
 
 from PyQt5.QtWidgets import QMessageBox
 
-def destagger_data(variable_data):
-    # destagger the data that is available on a different grid
-    if variable_data.attrs['stagger'] == 'X':
-        data = destagger(variable_data, -1)
-    elif variable_data.attrs['stagger'] == 'Y':
-        data = destagger(variable_data, -2)
-    elif variable_data.attrs['stagger'] == 'Z':
-        data = destagger(variable_data, -3)
-    elif variable_data.attrs['stagger'] == 'U':
-        data = destagger(variable_data, -1)
-    elif variable_data.attrs['stagger'] == 'V':
-        data = destagger(variable_data, -2)
-    elif variable_data.attrs['stagger'] == 'W':
-        data = destagger(variable_data, -3)
-    else:
-        data = variable_data.data
-    return data
+from .cache_manager import cache_manager
+from .dataset_pool import dataset_pool
+from .profiling import span
+from .stats_index import compute_stats
+from .wind_utils import get_destaggered_shape, get_stagger_axis, wind_speed
+
+# full fields of the diagnostics, all layers of a diagnostic are taken from a single computation
+field_cache = cache_manager.cache('fields')
+
+def destagger_array(data, axis):
+    # average the two staggered grid points enclosing each mass point
+    lower = [slice(None)] * data.ndim
+    upper = [slice(None)] * data.ndim
+    lower[axis] = slice(0, -1)
+    upper[axis] = slice(1, None)
+    return 0.5 * (data[tuple(lower)] + data[tuple(upper)])
 
-def get_datetime_from_filename(filename):
-    splitted_filename = filename.split('_')
-    datestring = splitted_filename[-2] + '_' + splitted_filename[-1]
-    return datetime.datetime.strptime(datestring, '%Y-%m-%d_%H:%M:%S')
+def is_raw_variable(ncfile, property):
+    return property in ncfile.variables and ncfile.variables[property].dimensions[:1] == ('Time',)
 
-def get_timestring_from_datetime(datetime):
-    return datetime.strftime("%Y-%m-%d %H:%M:%S")
+def read_staggered(ncfile, property, layer = None):
+    # read a raw variable of the first timestep, if a layer or a slice of layers is given only the hyperslab
+    # required for them is read, returns the data, the staggered axis and the shape of the data on the mass grid
+    variable = ncfile.variables[property]
+    axis = get_stagger_axis(variable)
 
-def get_times_from_filenamelist(files_list):
-    times = []
-    for file in files_list:
-        times.append(get_timestring_from_datetime(get_datetime_from_filename(file)))
+    with span('read'):
+        if layer is None or variable.ndim != 4:
+            data = variable[0]
+            shape = get_destaggered_shape(data.shape, axis)
+        elif isinstance(layer, slice):
+            # the upper mass level lies below the staggered level above the range
+            data = variable[0, layer.start:layer.stop + (1 if axis == -3 else 0)]
+            shape = get_destaggered_shape(data.shape, axis)
+        elif axis == -3:
+            # a mass level lies between two adjacent staggered levels
+            data = variable[0, layer:layer + 2]
+            shape = data.shape[1:]
+        else:
+            data = variable[0, layer]
+            shape = get_destaggered_shape(data.shape, axis)
 
-    return times
+    return data, axis, shape
+
+def read_variable(ncfile, property, layer = None):
+    # read a raw variable of the first timestep on the mass grid
+    data, axis, shape = read_staggered(ncfile, property, layer)
+
+    if axis is not None:
+        with span('destagger'):
+            data = destagger_array(data, axis).reshape(shape)
+
+    return data
+
+def read_wind_speed(ncfile, layer = None):
+    wind_props = [wind_prop for wind_prop in ['U', 'V', 'W'] if wind_prop in ncfile.variables]
+
+    def components():
+        for wind_prop in wind_props:
+            data, axis, _ = read_staggered(ncfile, wind_prop, layer)
+            yield data, axis
+
+    with span('S'):
+        return wind_speed(components())
 
 def get_sample_data(filename, property):
-    ncfile = Dataset(filename)
+    with dataset_pool.lock:
+        return _get_sample_data(dataset_pool.get(filename), property)
+
+def _get_sample_data(ncfile, property):
     if property == 'S':
-        wind_data = None
-        for wind_prop in ['U', 'V', 'W']:
-            try:
-                if wind_data is None:
-                    wind_data = destagger_data(getvar(ncfile, wind_prop, meta=True))**2
-                else:
-                    wind_data += destagger_data(getvar(ncfile, wind_prop, meta=True))**2
-            except:
-                if wind_data is None:
-                    wind_data = destagger_data(getvar(ncfile, wind_prop, meta=True))**2
-                else:
-                    wind_data += destagger_data(getvar(ncfile, wind_prop, meta=True))**2
-                print('exception')
-                pass
-        data = np.sqrt(wind_data)
+        data = read_wind_speed(ncfile)
+    elif is_raw_variable(ncfile, property):
+        data = read_variable(ncfile, property)
     else:
-        data = getvar(ncfile, property, meta=False)
+        data = field_cache.get((ncfile.filepath(), property), lambda: compute_diagnostic(ncfile, property))
     return data
 
-def get_layer_data(filename, property, layer):
-    data = get_sample_data(filename, property)
+def compute_diagnostic(ncfile, property):
+    # wrf-python takes long to import and is only needed for the diagnostics
+    from wrf import getvar
+    with span('getvar'):
+        return getvar(ncfile, property, meta=False)
+
+def _get_layer_data(ncfile, property, layer):
+    if property == 'S':
+        return read_wind_speed(ncfile, layer)
+    elif is_raw_variable(ncfile, property):
+        return read_variable(ncfile, property, layer)
+
+    # diagnostics need the full column to be computed
+    return _get_sample_data(ncfile, property)
+
+def read_layer_data(filename, property, layer):
+    with dataset_pool.lock:
+        data = _get_layer_data(dataset_pool.get(filename), property, int(layer))
 
     if len(data.shape) == 3:
-        slice_data = data[int(layer)]
+        # a copy, the cached field is not kept alive by the frame
+        return data[int(layer)].copy()
     elif len(data.shape) == 2:
-        slice_data = data
-    else:
+        return data
+    return None
+
+def read_level_data(filename, property, start, stop):
+    # mass levels start to stop of a 3D property, None for 2D properties
+    with dataset_pool.lock:
+        data = _get_layer_data(dataset_pool.get(filename), property, slice(start, stop))
+
+    if data is None or data.ndim != 3:
+        return None
+    if data.shape[0] != stop - start:
+        # diagnostics are computed for the full column
+        data = data[start:stop].copy()
+    return data
+
+def get_layer_data(filename, property, layer):
+    slice_data = read_layer_data(filename, property, layer)
+
+    if slice_data is None:
         error_box = QMessageBox()
         error_box.setWindowTitle("Invalid Property")
         error_box.setText(str('Only plotting 2D or 3D properties is currently supported'))
         error_box.setIcon(QMessageBox.Critical)
         error_box.show()
-        slice_data = None
-    return slice_data
\ No newline at end of file
+    return slice_data
+
+def compute_file_stats(filename, property, layer):
+    if layer is None:
+        return compute_stats(get_sample_data(filename, property))
+
+    slice_data = read_layer_data(filename, property, layer)
+    if slice_data is None:
+        return {layer: [None, None, 0]}
+    return compute_stats(slice_data, layer)
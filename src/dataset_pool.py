@@ -0,0 +1,99 @@
+from collections import OrderedDict
+import ctypes
+import os
+import threading
+
+from netCDF4 import Dataset
+
+from .profiling import span
+
+class DatasetPool:
+    def __init__(self, max_size = 32):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # netCDF/HDF5 are not thread safe, every access to a pooled handle has to hold this lock
+        self.lock = threading.RLock()
+        self._handles = OrderedDict()
+
+    def get(self, filename):
+        path = os.path.abspath(filename)
+        mtime = os.stat(path).st_mtime_ns
+
+        with self.lock:
+            entry = self._handles.get(path)
+            if entry is not None:
+                if entry[0] == mtime:
+                    self._handles.move_to_end(path)
+                    self.hits += 1
+                    return entry[1]
+
+                # the file was rewritten since it was opened, the cached header is stale
+                self._close(path)
+
+            self.misses += 1
+            with span('open'):
+                ncfile = Dataset(path)
+            self._handles[path] = (mtime, ncfile)
+
+            while len(self._handles) > self.max_size:
+                oldest = next(iter(self._handles))
+                self._close(oldest)
+                self.evictions += 1
+
+            return ncfile
+
+    def close(self, filename):
+        with self.lock:
+            self._close(os.path.abspath(filename))
+
+    def clear(self):
+        with self.lock:
+            for path in list(self._handles.keys()):
+                self._close(path)
+
+    def setMaxSize(self, max_size):
+        with self.lock:
+            self.max_size = max_size
+            while len(self._handles) > self.max_size:
+                self._close(next(iter(self._handles)))
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            return {'size': len(self._handles),
+                    'max_size': self.max_size,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions}
+
+    def _close(self, path):
+        entry = self._handles.pop(path, None)
+        if entry is not None:
+            try:
+                entry[1].close()
+            except RuntimeError:
+                # already closed
+                pass
+
+def get_hdf5_library():
+    # the HDF5 library loaded by netCDF4, None if it cannot be found in the mappings of the process
+    try:
+        with open('/proc/self/maps') as f:
+            paths = {line.split()[-1] for line in f if 'libhdf5' in line and 'libhdf5_hl' not in line}
+        return ctypes.CDLL(sorted(paths)[0]) if paths else None
+    except OSError:
+        return None
+
+def disable_hdf5_error_printing():
+    # netCDF4 only turns off the printing of the HDF5 error stack for the thread it was imported in, threads
+    # opening files print a stack for every expected error otherwise, a no-op if the library is not found
+    library = get_hdf5_library()
+    if library is not None and hasattr(library, 'H5Eset_auto2'):
+        library.H5Eset_auto2.argtypes = [ctypes.c_int64, ctypes.c_void_p, ctypes.c_void_p]
+        # H5E_DEFAULT
+        library.H5Eset_auto2(0, None, None)
+
+dataset_pool = DatasetPool(int(os.environ.get('WRFVIEWER_MAX_OPEN_FILES', 32)))
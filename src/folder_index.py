@@ -0,0 +1,126 @@
+import datetime
+import json
+import os
+
+MANIFEST_VERSION = 1
+
+# index files are kept in a subfolder so writing them does not change the mtime of the data folder
+SIDECAR_FOLDER = '.wrfviewer'
+
+_indices = {}
+
+def get_sidecar_path(folder_name, name):
+    # the sidecar folder is created by the first index written to it
+    return os.path.join(folder_name, SIDECAR_FOLDER, name)
+
+def parse_wrfout_filename(filename):
+    # wrfout_<domain>_<%Y-%m-%d>_<%H:%M:%S>, returns None for files not following this pattern
+    name = filename[:-3] if filename.endswith('.nc') else filename
+    splitted = name.split('_')
+    if len(splitted) < 4:
+        return None
+
+    try:
+        time = datetime.datetime.strptime(splitted[-2] + '_' + splitted[-1], '%Y-%m-%d_%H:%M:%S')
+    except ValueError:
+        return None
+
+    return splitted[1], time.strftime("%Y-%m-%d %H:%M:%S")
+
+class FolderIndex:
+    def __init__(self, folder_name):
+        self.folder_name = folder_name
+        self.manifest_path = get_sidecar_path(folder_name, 'manifest.json')
+        self.folder_mtime = None
+        self.entries = {}
+        self.files_dict = {}
+        self.times_dict = {}
+        self._lookup = {}
+
+        self.load()
+        self.refresh()
+
+    def load(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                content = json.load(f)
+            if content.get('version') == MANIFEST_VERSION:
+                self.folder_mtime = content['mtime']
+                self.entries = {file: tuple(entry) for file, entry in content['entries'].items()}
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def save(self):
+        # folders without wrfout files do not get a sidecar folder
+        if not self.entries and not os.path.isdir(os.path.dirname(self.manifest_path)):
+            return
+
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+            tmp_path = self.manifest_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': MANIFEST_VERSION, 'mtime': self.folder_mtime, 'entries': self.entries}, f)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError:
+            # read only data location, the index is kept in memory only
+            pass
+
+    def refresh(self):
+        # the folder is only listed again if its mtime changed, only new filenames are parsed
+        folder_mtime = os.stat(self.folder_name).st_mtime_ns
+        if folder_mtime != self.folder_mtime:
+            self.scan()
+            self.folder_mtime = folder_mtime
+            self.save()
+            self._lookup = {}
+
+        if not self._lookup:
+            self.build()
+
+    def scan(self):
+        entries = {}
+        with os.scandir(self.folder_name) as it:
+            for entry in it:
+                if not 'wrfout' in entry.name:
+                    continue
+
+                if entry.name in self.entries:
+                    entries[entry.name] = self.entries[entry.name]
+                else:
+                    parsed = parse_wrfout_filename(entry.name)
+                    if parsed is not None and entry.is_file():
+                        entries[entry.name] = parsed
+
+        self.entries = entries
+
+    def build(self):
+        self.files_dict = {}
+        self.times_dict = {}
+        self._lookup = {}
+
+        for file, (domain, time) in sorted(self.entries.items(), key=lambda item: item[1]):
+            self.files_dict.setdefault(domain, []).append(file)
+            self.times_dict.setdefault(domain, []).append(time)
+            self._lookup[(domain, time)] = file
+
+    def getDomains(self):
+        return sorted(self.files_dict.keys())
+
+    def getFiles(self, domain):
+        return self.files_dict.get(domain, [])
+
+    def getTimes(self, domain):
+        return self.times_dict.get(domain, [])
+
+    def getFile(self, domain, time):
+        return self._lookup.get((domain, time))
+
+def get_folder_index(folder_name):
+    folder_name = os.path.abspath(folder_name)
+    index = _indices.get(folder_name)
+    if index is None:
+        index = FolderIndex(folder_name)
+        _indices[folder_name] = index
+    else:
+        index.refresh()
+    return index
@@ -0,0 +1,7 @@
+import os
+
+from .cache_manager import cache_manager
+
+# slices of the layer plots and the comparison, the frames are loaded ahead of the animation
+frame_cache = cache_manager.cache('frames')
+prefetch_depth = int(os.environ.get('WRFVIEWER_PREFETCH_FRAMES', 8))
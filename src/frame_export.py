@@ -0,0 +1,59 @@
+import concurrent.futures
+import os
+import threading
+
+from .render_utils import colorize, write_png
+
+class FrameExporter:
+    def __init__(self, max_queued = 32, num_threads = 2):
+        self.max_queued = max_queued
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        # message of the first failed write
+        self.error = None
+
+        self._lock = threading.Lock()
+        # zlib releases the GIL, the frames are encoded in parallel to the GUI thread
+        self._executor = concurrent.futures.ThreadPoolExecutor(num_threads, thread_name_prefix='export')
+
+    def isFull(self):
+        with self._lock:
+            return self.queued >= self.max_queued
+
+    def submit(self, filename, slice_data, val_min, val_max, lut):
+        # the frame is dropped if the writers are too far behind, callers check isFull to apply backpressure
+        with self._lock:
+            if self.queued >= self.max_queued:
+                self.dropped += 1
+                return False
+            self.queued += 1
+
+        self._executor.submit(self._write, filename, slice_data, val_min, val_max, lut)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {'queued': self.queued,
+                    'written': self.written,
+                    'dropped': self.dropped,
+                    'failed': self.failed,
+                    'error': self.error}
+
+    def _write(self, filename, slice_data, val_min, val_max, lut):
+        try:
+            write_png(filename, colorize(slice_data, val_min, val_max, lut))
+            with self._lock:
+                self.written += 1
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+                if self.error is None:
+                    self.error = '{}: {}'.format(filename, e)
+        finally:
+            with self._lock:
+                self.queued -= 1
+
+frame_exporter = FrameExporter(int(os.environ.get('WRFVIEWER_EXPORT_QUEUE', 32)),
+                               int(os.environ.get('WRFVIEWER_EXPORT_THREADS', 2)))
@@ -0,0 +1,133 @@
+import numpy as np
+
+from .data_utils import destagger_array, read_level_data
+from .dataset_pool import dataset_pool
+from .cache_manager import cache_manager
+from .nc_utils import has_time_dim, read_file_levels
+from .profiling import span
+from .section_utils import GRAVITY
+from .stats_index import compute_stats
+from .wind_utils import as_float_array
+
+# heights above ground in m offered in the height level mode
+AGL_HEIGHTS = [10, 20, 40, 60, 80, 100, 120, 150, 200, 300, 500, 1000, 2000, 5000]
+
+# variables the height above ground is computed from
+HEIGHT_INPUTS = ['PH', 'PHB', 'HGT']
+
+# height fields and interpolation weights of the files and timesteps
+height_cache = cache_manager.cache('heights')
+
+# suffix of the property of the statistics of height levels, they do not share the entries of the model levels
+HEIGHT_SUFFIX = '@agl'
+
+class LevelWeights:
+    # the model levels enclosing a height above ground in every column, the levels are read in a single
+    # hyperslab from start to stop and blended with the weight of the upper level
+    __slots__ = ['lower', 'weight', 'start', 'stop']
+
+    def __init__(self, lower, weight):
+        self.lower = lower
+        self.weight = weight
+        self.start = int(lower.min())
+        self.stop = int(lower.max()) + 2
+
+    @property
+    def nbytes(self):
+        return self.lower.nbytes + self.weight.nbytes
+
+    def blend(self, levels):
+        # interpolate the levels start to stop, points outside of the column are NaN
+        levels = as_float_array(levels)
+        lower = (self.lower - self.start)[np.newaxis]
+        value_lower = np.take_along_axis(levels, lower, axis=0)[0]
+        value_upper = np.take_along_axis(levels, lower + 1, axis=0)[0]
+        return (value_lower + self.weight * (value_upper - value_lower)).astype(np.float32)
+
+def height_agl(geopotential, terrain, num_levels):
+    # height above ground of the mass levels from the (staggered) geopotential and the terrain height
+    geopotential = as_float_array(geopotential)
+    if geopotential.shape[0] == num_levels + 1:
+        geopotential = destagger_array(geopotential, 0)
+    return (geopotential / GRAVITY - as_float_array(terrain)).astype(np.float32)
+
+def compute_level_weights(height, target):
+    # lower enclosing level and the weight of the upper level of every column, the heights increase upwards
+    if height is None or height.shape[0] < 2:
+        return None
+
+    with span('weights'):
+        num_below = np.count_nonzero(height <= target, axis=0)
+        lower = np.clip(num_below - 1, 0, height.shape[0] - 2)
+        height_lower = np.take_along_axis(height, lower[np.newaxis], axis=0)[0]
+        height_upper = np.take_along_axis(height, lower[np.newaxis] + 1, axis=0)[0]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weight = ((target - height_lower) / (height_upper - height_lower)).astype(np.float32)
+        weight[(num_below == 0) | (num_below == height.shape[0])] = np.nan
+
+    return LevelWeights(lower.astype(np.int16), weight)
+
+def get_height_level(source, height_loader, levels_loader, target):
+    # property at a height above ground, the height field of the source (a file or a timestep) is computed
+    # once and the weights once per target height, afterwards only the enclosing levels are read
+    def load_weights():
+        return compute_level_weights(height_cache.get(('height agl',) + source, height_loader), target)
+
+    weights = height_cache.get(('level weights',) + source + (target,), load_weights)
+    if weights is None:
+        return None
+
+    levels = levels_loader(weights.start, weights.stop)
+    if levels is None:
+        return None
+
+    with span('blend'):
+        return weights.blend(levels)
+
+def read_height_agl(filename):
+    with dataset_pool.lock:
+        ncfile = dataset_pool.get(filename)
+        if not all(item in ncfile.variables for item in HEIGHT_INPUTS):
+            return None
+
+        with span('read'):
+            geopotential = as_float_array(ncfile.variables['PH'][0]) + as_float_array(ncfile.variables['PHB'][0])
+            terrain = ncfile.variables['HGT'][0]
+        num_levels = len(ncfile.dimensions['bottom_top']) if 'bottom_top' in ncfile.dimensions else geopotential.shape[0] - 1
+
+    return height_agl(geopotential, terrain, num_levels)
+
+def read_height_level(filename, property, target):
+    return get_height_level((filename,), lambda: read_height_agl(filename), lambda start, stop: read_level_data(filename, property, start, stop), target)
+
+def read_group_height_agl(file_name, case, model, time_index, num_levels):
+    with dataset_pool.lock:
+        group = dataset_pool.get(file_name)[case][model]
+        if not all(item in group.variables for item in HEIGHT_INPUTS):
+            return None
+
+        fields = []
+        with span('read'):
+            for name in HEIGHT_INPUTS:
+                fields.append(as_float_array(group.variables[name][time_index] if has_time_dim(group, name) else group.variables[name][:]))
+
+    if fields[0].shape[0] not in [num_levels, num_levels + 1]:
+        return None
+    return height_agl(fields[0] + fields[1], fields[2], num_levels)
+
+def read_group_height_level(file_name, case, model, property, time_index, num_levels, target):
+    return get_height_level((file_name, case, model, time_index), lambda: read_group_height_agl(file_name, case, model, time_index, num_levels),
+                            lambda start, stop: read_file_levels(file_name, case, model, property, time_index, start, stop), target)
+
+def compute_height_level_stats(filename, property, target):
+    data = read_height_level(filename, property, target)
+    if data is None:
+        return {target: [None, None, 0]}
+    return compute_stats(data, target)
+
+def compute_group_height_level_stats(file_name, case, model, property, time_index, num_levels, target):
+    data = read_group_height_level(file_name, case, model, property, time_index, num_levels, target)
+    if data is None:
+        return {target: [None, None, 0]}
+    return compute_stats(data, target)
@@ -0,0 +1,176 @@
+import concurrent.futures
+import threading
+import time
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from .custom_widgets import ProgressWidget
+from .profiling import start_span
+from .worker_pool import POOL_ERRORS, get_process_pool
+
+def run_single(function, args):
+    return [function(*args)]
+
+class LimitsWorkerSignals(QObject):
+    result = pyqtSignal(object, object)
+    finished = pyqtSignal()
+
+class LimitsWorker(QRunnable):
+    def __init__(self, tasks):
+        super().__init__()
+
+        # tasks are (keys, function, arguments) tuples, the functions run in the process pool and return
+        # the statistics of each of their keys
+        self.tasks = tasks
+        self.signals = LimitsWorkerSignals()
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        pool = get_process_pool()
+        futures = {pool.submit(function, *args): keys for keys, function, args in self.tasks}
+        pending = set(futures.keys())
+
+        try:
+            while pending and not self.cancelled.is_set():
+                done, pending = concurrent.futures.wait(pending, timeout=0.1, return_when=concurrent.futures.FIRST_COMPLETED)
+                # the futures cancelled by a shutdown of the pool are never reported as done by wait
+                cancelled = {future for future in pending if future.cancelled()}
+                done |= cancelled
+                pending -= cancelled
+
+                for future in done:
+                    keys = futures[future]
+                    try:
+                        stats_list = future.result()
+                    except POOL_ERRORS:
+                        # the keys stay missing and are scanned again by the next scan
+                        continue
+                    except Exception:
+                        # do not try again to compute the statistics of data that cannot be read
+                        stats_list = [{key[3]: [None, None, 0]} for key in keys]
+
+                    for key, stats in zip(keys, stats_list):
+                        self.signals.result.emit(key, stats)
+        finally:
+            for future in pending:
+                future.cancel()
+            self.signals.finished.emit()
+
+class LimitsScanner(QObject):
+    limits_changed = pyqtSignal(list)
+
+    def __init__(self, parent = None):
+        super().__init__(parent)
+
+        self.stats_index = None
+        self.worker = None
+        self.keys = None
+        self.progress_widget = None
+        self.report_limits = True
+        self.on_finished = None
+        self.percentiles = None
+        self.last_report = 0.0
+        self.num_done = 0
+        # time from the dispatch of a scan until it is finished
+        self.span = None
+
+    def setStatsIndex(self, stats_index):
+        self.cancel()
+        self.stats_index = stats_index
+
+    def setPercentiles(self, percentiles):
+        # the limits are the given (low, high) percentiles of the values instead of their min and max
+        self.percentiles = percentiles
+
+    def cancel(self):
+        self.span = None
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+
+        if self.progress_widget is not None:
+            self.progress_widget.close()
+            self.progress_widget = None
+
+    def scan(self, keys, task, report_limits = True, on_finished = None, batch = None):
+        # task maps a (source, item, property, layer) key to the function and arguments computing its statistics,
+        # batch optionally splits the missing keys into (keys, function, arguments) tasks handling several keys
+        self.cancel()
+        self.keys = keys
+        self.report_limits = report_limits
+        self.on_finished = on_finished
+        self.span = start_span('limits')
+
+        missing = self.stats_index.missing(keys)
+
+        if len(missing) <= 1:
+            # a single read is faster than the round trip through the process pool
+            for key in missing:
+                function, args = task(key)
+                self.stats_index.store(key[0], key[1], key[2], function(*args))
+            self.finish()
+            return
+
+        self.num_done = 0
+        self.progress_widget = ProgressWidget(len(missing))
+        self.progress_widget.cancel_button.clicked.connect(self.cancel)
+
+        if batch is not None:
+            tasks = batch(missing)
+        else:
+            tasks = [([key], run_single, task(key)) for key in missing]
+
+        self.worker = LimitsWorker(tasks)
+        self.worker.signals.result.connect(lambda key, stats, worker=self.worker, stats_index=self.stats_index: self.onResult(worker, stats_index, key, stats))
+        self.worker.signals.finished.connect(lambda worker=self.worker, stats_index=self.stats_index: self.onWorkerFinished(worker, stats_index))
+        QThreadPool.globalInstance().start(self.worker)
+
+    def onResult(self, worker, stats_index, key, stats):
+        # results of cancelled scans are still valid statistics
+        stats_index.store(key[0], key[1], key[2], stats)
+
+        if worker is not self.worker:
+            return
+
+        self.num_done += 1
+        if self.progress_widget is not None:
+            self.progress_widget.progress_bar.setValue(self.num_done)
+
+        # show the limits of the data scanned so far
+        now = time.monotonic()
+        if self.report_limits and now - self.last_report > 0.2:
+            self.last_report = now
+            self.reportLimits()
+
+    def onWorkerFinished(self, worker, stats_index):
+        if worker is not self.worker:
+            stats_index.save()
+            return
+
+        self.worker = None
+        if self.progress_widget is not None:
+            self.progress_widget.close()
+            self.progress_widget = None
+        self.finish()
+
+    def reportLimits(self):
+        # the statistics of the keys are merged from the index, entries that are still missing are skipped
+        stats = self.stats_index.reduce(self.keys, self.percentiles)
+        if stats[2] > 0:
+            self.limits_changed.emit([stats[0], stats[1]])
+
+    def finish(self):
+        if self.span is not None:
+            self.span.stop()
+            self.span = None
+
+        self.stats_index.save()
+
+        if self.report_limits:
+            self.reportLimits()
+
+        if self.on_finished is not None:
+            self.on_finished()
@@ -0,0 +1,175 @@
+import numpy as np
+
+from .dataset_pool import dataset_pool
+from .profiling import span
+from .stats_index import compute_stats, quantile_sketch, reduce_stats
+from .wind_utils import as_float_array, wind_speed
+
+# memory budget for a single block read by the streaming reductions
+BLOCK_BYTES = 64 * 1024 * 1024
+
+# wind components the speed properties are computed from
+WIND_COMPONENTS = {'S': ['U', 'V', 'W'], 'S_max': ['U_max', 'V_max', 'W_max']}
+
+def decode_time_labels(time_values):
+    # convert the unix timestamps to labels in a single vectorized step
+    microseconds = np.round(np.asarray(time_values, dtype=np.float64) * 1e6).astype(np.int64)
+    labels = np.datetime_as_string(microseconds.astype('datetime64[us]'), unit='s')
+    return np.char.replace(labels, 'T', '_')
+
+def get_variable_name(group, property):
+    # S and S_max are computed from the u wind if they are not stored in the file, it has their dimensions
+    if property in WIND_COMPONENTS and not property in group.variables:
+        return WIND_COMPONENTS[property][0]
+    return property
+
+def get_dims(group, property):
+    return group.variables[get_variable_name(group, property)].dimensions
+
+def has_time_dim(group, property):
+    return 'time' in get_dims(group, property)
+
+def get_wind_speed(group, property, index):
+    wind_props = [wind_prop for wind_prop in WIND_COMPONENTS[property] if wind_prop in group.variables]
+    return wind_speed((group.variables[wind_prop][index], None) for wind_prop in wind_props)
+
+def read_index(group, property, index):
+    if property in WIND_COMPONENTS and not property in group.variables:
+        with span('S'):
+            return get_wind_speed(group, property, index)
+    with span('read'):
+        return group.variables[property][index]
+
+def read_timestep(group, property, time_index):
+    if has_time_dim(group, property):
+        return read_index(group, property, time_index)
+    return read_index(group, property, slice(None))
+
+def read_layer(group, property, time_index, layer):
+    dims = get_dims(group, property)
+
+    if has_time_dim(group, property):
+        if len(dims) == 4:
+            index = (time_index, layer)
+        elif len(dims) == 3:
+            index = time_index
+        else:
+            return None
+    else:
+        if len(dims) == 3:
+            index = layer
+        elif len(dims) == 2:
+            index = slice(None)
+        else:
+            return None
+
+    return read_index(group, property, index)
+
+def read_levels(group, property, time_index, start, stop):
+    # mass levels start to stop of a 3D property, None for 2D properties
+    dims = get_dims(group, property)
+    if len([d for d in dims if d != 'time']) != 3:
+        return None
+
+    if has_time_dim(group, property):
+        return read_index(group, property, (time_index, slice(start, stop)))
+    return read_index(group, property, slice(start, stop))
+
+def read_file_levels(file_name, case, model, property, time_index, start, stop):
+    with dataset_pool.lock:
+        return read_levels(dataset_pool.get(file_name)[case][model], property, time_index, start, stop)
+
+def read_file_layer(file_name, case, model, property, time_index, layer):
+    with dataset_pool.lock:
+        return read_layer(dataset_pool.get(file_name)[case][model], property, time_index, layer)
+
+def read_file_timestep(file_name, case, model, property, time_index):
+    with dataset_pool.lock:
+        return read_timestep(dataset_pool.get(file_name)[case][model], property, time_index)
+
+def compute_group_stats(file_name, case, model, property, time_index, layer):
+    if layer is None:
+        data = read_file_timestep(file_name, case, model, property, time_index)
+    else:
+        data = read_file_layer(file_name, case, model, property, time_index, layer)
+
+    if data is None:
+        return {layer: [None, None, 0]}
+    return compute_stats(data, layer)
+
+def get_time_block_size(group, property, layer):
+    # number of timesteps read at once, a multiple of the chunk size along time so every chunk is
+    # decompressed only once
+    variable = group.variables[get_variable_name(group, property)]
+
+    shape = list(variable.shape[1:])
+    if layer is not None and len(shape) == 3:
+        shape = shape[1:]
+    timestep_bytes = max(int(np.prod(shape)) * variable.dtype.itemsize, 1)
+
+    chunking = variable.chunking()
+    time_chunk = 1 if chunking == 'contiguous' else chunking[0]
+    num_chunks = max(BLOCK_BYTES // (time_chunk * timestep_bytes), 1)
+    return time_chunk * num_chunks
+
+def compute_block_stats(block, layer = None):
+    # min, max, count and quantiles of every layer of every timestep of a block of consecutive timesteps
+    data = as_float_array(block)
+    num_times = data.shape[0]
+    num_layers = data.shape[1] if data.ndim == 4 else 1
+    data = data.reshape(num_times, num_layers, -1)
+
+    if np.issubdtype(data.dtype, np.floating):
+        # fmin/fmax ignore NaN, slices without valid values end up as NaN
+        mins = np.fmin.reduce(data, axis=2)
+        maxs = np.fmax.reduce(data, axis=2)
+        counts = data.shape[2] - np.count_nonzero(np.isnan(data), axis=2)
+    else:
+        mins = data.min(axis=2)
+        maxs = data.max(axis=2)
+        counts = np.full(mins.shape, data.shape[2])
+
+    quantiles = quantile_sketch(data.reshape(num_times * num_layers, -1))
+    if layer is None:
+        timestep_quantiles = quantile_sketch(data.reshape(num_times, -1)) if num_layers > 1 else quantiles
+
+    stats_list = []
+    for t in range(num_times):
+        layer_stats = {}
+        for l in range(num_layers):
+            if counts[t, l] > 0:
+                layer_stats[l] = [float(mins[t, l]), float(maxs[t, l]), int(counts[t, l]), quantiles[t * num_layers + l]]
+            else:
+                layer_stats[l] = [None, None, 0]
+
+        if layer is not None:
+            stats_list.append({int(layer): layer_stats[0]})
+        else:
+            layer_stats[None] = reduce_stats(layer_stats.values())
+            if layer_stats[None][2] > 0:
+                layer_stats[None].append(timestep_quantiles[t])
+            stats_list.append(layer_stats)
+
+    return stats_list
+
+def reduce_group_stats(file_name, case, model, property, time_indices, layer):
+    # statistics of the given timesteps, read as a single block that covers all of them
+    time_start = min(time_indices)
+    time_stop = max(time_indices) + 1
+
+    with dataset_pool.lock:
+        group = dataset_pool.get(file_name)[case][model]
+        has_time = has_time_dim(group, property)
+        if not has_time:
+            data = read_timestep(group, property, 0) if layer is None else read_layer(group, property, 0, layer)
+            block = None if data is None else data[np.newaxis]
+        elif len(get_dims(group, property)) == 4 and layer is not None:
+            block = read_index(group, property, (slice(time_start, time_stop), layer))
+        else:
+            block = read_index(group, property, slice(time_start, time_stop))
+
+    if block is None:
+        return [{layer: [None, None, 0]} for _ in time_indices]
+
+    stats_list = compute_block_stats(block, layer)
+    return [stats_list[i - time_start] if has_time else stats_list[0] for i in time_indices]
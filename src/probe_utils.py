@@ -0,0 +1,106 @@
+import numpy as np
+
+from .data_utils import _get_sample_data, destagger_array, is_raw_variable
+from .dataset_pool import dataset_pool
+from .height_utils import HEIGHT_INPUTS, height_agl
+from .nc_utils import WIND_COMPONENTS, has_time_dim
+from .wind_utils import as_float_array, get_stagger_axis
+
+def read_point(variable, prefix, row, col, layer = None, axis = None):
+    # values of a grid point from a (z, y, x) or (y, x) variable, prefix indexes the leading dimensions, only the
+    # given layer or the whole column is read, the staggered neighbours are read along and averaged
+    index = tuple(prefix)
+    if variable.ndim - len(prefix) == 3:
+        index += (slice(None) if layer is None else slice(layer, layer + (2 if axis == -3 else 1)),)
+    index += (slice(row, row + (2 if axis == -2 else 1)), slice(col, col + (2 if axis == -1 else 1)))
+
+    data = as_float_array(variable[index])
+    if axis is not None:
+        data = destagger_array(data, axis)
+
+    # leading dimensions indexed by a slice are kept, e.g. the time of strided reads
+    num_leading = sum(isinstance(i, slice) for i in prefix)
+    return data.reshape(data.shape[:num_leading] + (-1,))
+
+def _read_file_point(ncfile, property, row, col, layer):
+    if property == 'S':
+        wind_props = [wind_prop for wind_prop in ['U', 'V', 'W'] if wind_prop in ncfile.variables]
+        speed = None
+        for wind_prop in wind_props:
+            variable = ncfile.variables[wind_prop]
+            data = read_point(variable, (0,), row, col, layer, get_stagger_axis(variable))
+            speed = data * data if speed is None else speed + data * data
+        return np.sqrt(speed)
+
+    if is_raw_variable(ncfile, property):
+        variable = ncfile.variables[property]
+        return read_point(variable, (0,), row, col, layer, get_stagger_axis(variable))
+
+    # diagnostics need the full field to be computed
+    data = as_float_array(_get_sample_data(ncfile, property))
+    if data.ndim == 3:
+        return data[:, row, col] if layer is None else data[layer:layer + 1, row, col]
+    return data[row:row + 1, col]
+
+def interpolate_height(values, height, target):
+    # value of a column at a height above ground, NaN outside of the column
+    return np.array([np.interp(target, height, values, left=np.nan, right=np.nan)])
+
+def _read_file_point_height(ncfile, property, row, col, target):
+    values = _read_file_point(ncfile, property, row, col, None)
+    if not all(item in ncfile.variables for item in HEIGHT_INPUTS) or len(values) < 2:
+        return np.full(1, np.nan)
+
+    geopotential = read_point(ncfile.variables['PH'], (0,), row, col) + read_point(ncfile.variables['PHB'], (0,), row, col)
+    return interpolate_height(values, height_agl(geopotential, read_point(ncfile.variables['HGT'], (0,), row, col), len(values)), target)
+
+def read_file_points(filenames, property, row, col, layer = None, height = None):
+    # values of a grid point in every file (files, levels), only the layer or the column of the point is read,
+    # a height above ground interpolates the column of the point
+    values = []
+    for filename in filenames:
+        with dataset_pool.lock:
+            if height is None:
+                values.append(_read_file_point(dataset_pool.get(filename), property, row, col, layer))
+            else:
+                values.append(_read_file_point_height(dataset_pool.get(filename), property, row, col, height))
+    return np.stack(values).astype(np.float32)
+
+def read_group_points(file_name, case, model, property, time_start, time_stop, row, col, layer = None, height = None):
+    # values of a grid point in a range of timesteps (times, levels) from a single strided read per variable,
+    # a height above ground interpolates the column of the point
+    if height is not None:
+        values = read_group_points(file_name, case, model, property, time_start, time_stop, row, col)
+        with dataset_pool.lock:
+            group = dataset_pool.get(file_name)[case][model]
+            if not all(item in group.variables for item in HEIGHT_INPUTS) or values.shape[1] < 2:
+                return np.full((time_stop - time_start, 1), np.nan, dtype=np.float32)
+
+        inputs = [read_group_points(file_name, case, model, name, time_start, time_stop, row, col) for name in HEIGHT_INPUTS]
+        heights = [height_agl(inputs[0][t] + inputs[1][t], inputs[2][t], values.shape[1]) for t in range(len(values))]
+        return np.stack([interpolate_height(values[t], heights[t], height) for t in range(len(values))]).astype(np.float32)
+
+    with dataset_pool.lock:
+        group = dataset_pool.get(file_name)[case][model]
+        num_times = time_stop - time_start
+
+        if property in WIND_COMPONENTS and not property in group.variables:
+            names = [wind_prop for wind_prop in WIND_COMPONENTS[property] if wind_prop in group.variables]
+        else:
+            names = [property]
+
+        values = None
+        for name in names:
+            if has_time_dim(group, name):
+                data = read_point(group.variables[name], (slice(time_start, time_stop),), row, col, layer)
+            else:
+                # constant in time
+                data = np.repeat(read_point(group.variables[name], (), row, col, layer)[np.newaxis], num_times, axis=0)
+
+            if len(names) > 1:
+                data = data * data
+            values = data if values is None else values + data
+
+    if len(names) > 1:
+        values = np.sqrt(values)
+    return values.astype(np.float32)
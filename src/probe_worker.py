@@ -0,0 +1,94 @@
+import concurrent.futures
+import threading
+
+import numpy as np
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from .cache_manager import cache_manager
+from .worker_pool import get_process_pool
+
+# time series of the probed points
+probe_cache = cache_manager.cache('probes')
+
+class ProbeWorkerSignals(QObject):
+    finished = pyqtSignal(object)
+
+class ProbeWorker(QRunnable):
+    def __init__(self, tasks):
+        super().__init__()
+
+        # tasks are (function, arguments) tuples, the functions run in the process pool and return the values
+        # of consecutive timesteps, the results are concatenated in the order of the tasks
+        self.tasks = tasks
+        self.signals = ProbeWorkerSignals()
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        pool = get_process_pool()
+        futures = [pool.submit(function, *args) for function, args in self.tasks]
+        values = None
+
+        try:
+            pending = set(futures)
+            while pending and not self.cancelled.is_set():
+                _, pending = concurrent.futures.wait(pending, timeout=0.1)
+
+            if not self.cancelled.is_set():
+                values = np.concatenate([future.result() for future in futures])
+        except Exception:
+            # points that cannot be read are not shown
+            values = None
+        finally:
+            for future in futures:
+                future.cancel()
+            self.signals.finished.emit(values)
+
+class ProbeLoader(QObject):
+    # values of a grid point of all timesteps, loaded in the background and cached per point
+    loaded = pyqtSignal(object, object)
+
+    def __init__(self, parent = None):
+        super().__init__(parent)
+        self.worker = None
+        self.key = None
+        self.context = None
+
+    def cancel(self):
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+            self.key = None
+
+    def load(self, key, tasks, context):
+        # context is passed along with the values to loaded, the context of the latest request is used
+        self.context = context
+        if self.worker is not None and key == self.key:
+            # the point is requested again on every timestep, the running worker already loads it
+            return
+        self.cancel()
+
+        values = probe_cache.lookup(key)
+        if values is not None:
+            self.loaded.emit(values, context)
+            return
+
+        # even a single read runs in the pool, it reads every timestep and must not block the GUI thread
+        self.worker = ProbeWorker(tasks)
+        self.key = key
+        self.worker.signals.finished.connect(lambda values, worker=self.worker: self.onWorkerFinished(worker, key, values))
+        QThreadPool.globalInstance().start(self.worker)
+
+    def onWorkerFinished(self, worker, key, values):
+        if values is not None:
+            probe_cache.insert(key, values)
+
+        if worker is not self.worker:
+            return
+
+        self.worker = None
+        self.key = None
+        if values is not None:
+            self.loaded.emit(values, self.context)
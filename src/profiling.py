@@ -0,0 +1,106 @@
+import collections
+import contextlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+# number of samples of every stage the rolling latencies are computed from
+WINDOW = 50
+
+enabled = False
+_trace_file = None
+_trace_events = []
+_profile_file = None
+_profiler = None
+_latencies = {}
+_frame_times = collections.deque(maxlen=WINDOW)
+_null_span = contextlib.nullcontext()
+
+class Span:
+    __slots__ = ['name', 'start']
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *args):
+        end = time.perf_counter_ns()
+        latencies = _latencies.get(self.name)
+        if latencies is None:
+            latencies = _latencies.setdefault(self.name, collections.deque(maxlen=WINDOW))
+        latencies.append(end - self.start)
+
+        if _trace_file is not None:
+            _trace_events.append({'name': self.name, 'ph': 'X', 'ts': self.start / 1e3, 'dur': (end - self.start) / 1e3,
+                                  'pid': os.getpid(), 'tid': threading.get_ident()})
+        return False
+
+    def stop(self):
+        self.__exit__(None, None, None)
+
+def span(name):
+    # time the enclosed block, a shared no-op context is returned if the timing is disabled
+    if not enabled:
+        return _null_span
+    return Span(name)
+
+def start_span(name):
+    # span of an asynchronous operation that is stopped with its stop method, None if the timing is disabled
+    if not enabled:
+        return None
+    return Span(name).__enter__()
+
+def frame():
+    # mark a displayed frame for the frame rate
+    if enabled:
+        _frame_times.append(time.perf_counter())
+
+def enable(trace_file = None, profile_file = None):
+    global enabled, _trace_file, _profile_file, _profiler
+    enabled = True
+    _trace_file = trace_file or _trace_file
+    _profile_file = profile_file or _profile_file
+
+    if _profile_file is not None and _profiler is None:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+def get_latencies():
+    # mean of the rolling window of every stage in ms
+    return {name: sum(latencies) / len(latencies) / 1e6 for name, latencies in list(_latencies.items()) if latencies}
+
+def get_frame_rate():
+    frame_times = list(_frame_times)
+    if len(frame_times) < 2 or frame_times[-1] == frame_times[0]:
+        return None
+    return (len(frame_times) - 1) / (frame_times[-1] - frame_times[0])
+
+def get_summary():
+    parts = ['{} {:.1f} ms'.format(name, latency) for name, latency in sorted(get_latencies().items())]
+    frame_rate = get_frame_rate()
+    if frame_rate is not None:
+        parts.append('{:.1f} fps'.format(frame_rate))
+    return ' | '.join(parts)
+
+def dump():
+    # write the chrome trace (chrome://tracing or ui.perfetto.dev) and the cProfile statistics of the session
+    global _profiler
+    if _trace_file is not None:
+        with open(_trace_file, 'w') as f:
+            json.dump({'traceEvents': list(_trace_events), 'displayTimeUnit': 'ms'}, f)
+
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_profile_file)
+        _profiler = None
+
+# the timing can be enabled for a whole session through the environment, the spawned worker processes
+# inherit it but never dump their timings
+if multiprocessing.parent_process() is None and (os.environ.get('WRFVIEWER_TIMING', '0') != '0' or os.environ.get('WRFVIEWER_TRACE') or os.environ.get('WRFVIEWER_PROFILE')):
+    enable(os.environ.get('WRFVIEWER_TRACE') or None, os.environ.get('WRFVIEWER_PROFILE') or None)
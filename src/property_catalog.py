@@ -0,0 +1,130 @@
+import json
+import os
+
+from .dataset_pool import dataset_pool
+from .folder_index import get_sidecar_path
+from .stats_index import get_signature
+from .wind_utils import get_stagger_axis
+
+CATALOG_VERSION = 1
+
+# wrf-python diagnostics with the raw variables they are computed from and their number of spatial dimensions
+DIAGNOSTICS = {
+    'avo': (['U', 'V', 'MAPFAC_U', 'MAPFAC_V', 'MAPFAC_M', 'F'], 3),
+    'ctt': (['T', 'P', 'PB', 'PH', 'PHB', 'HGT', 'QVAPOR', 'QCLOUD'], 2),
+    'dbz': (['T', 'P', 'PB', 'QVAPOR', 'QRAIN'], 3),
+    'eth': (['T', 'P', 'PB', 'QVAPOR'], 3),
+    'geopt': (['PH', 'PHB'], 3),
+    'height_agl': (['PH', 'PHB', 'HGT'], 3),
+    'helicity': (['U', 'V', 'PH', 'PHB', 'HGT'], 2),
+    'lat': (['XLAT'], 2),
+    'lon': (['XLONG'], 2),
+    'mdbz': (['T', 'P', 'PB', 'QVAPOR', 'QRAIN'], 2),
+    'omg': (['T', 'P', 'W', 'PB', 'QVAPOR'], 3),
+    'pressure': (['P', 'PB'], 3),
+    'pvo': (['U', 'V', 'T', 'P', 'PB', 'MAPFAC_U', 'MAPFAC_V', 'MAPFAC_M', 'F'], 3),
+    'pw': (['T', 'P', 'PB', 'PH', 'PHB', 'QVAPOR'], 2),
+    'rh': (['T', 'P', 'PB', 'QVAPOR'], 3),
+    'rh2': (['T2', 'PSFC', 'Q2'], 2),
+    'slp': (['T', 'P', 'PB', 'QVAPOR', 'PH', 'PHB'], 2),
+    'tc': (['T', 'P', 'PB'], 3),
+    'td': (['P', 'PB', 'QVAPOR'], 3),
+    'td2': (['PSFC', 'Q2'], 2),
+    'ter': (['HGT'], 2),
+    'th': (['T'], 3),
+    'tk': (['T', 'P', 'PB'], 3),
+    'tv': (['T', 'P', 'PB', 'QVAPOR'], 3),
+    'twb': (['T', 'P', 'PB', 'QVAPOR'], 3),
+    'ua': (['U'], 3),
+    'updraft_helicity': (['U', 'V', 'W', 'PH', 'PHB', 'MAPFAC_M'], 2),
+    'va': (['V'], 3),
+    'wa': (['W'], 3),
+    'z': (['PH', 'PHB'], 3),
+}
+
+# dimensions of the mass grid in wrfout files
+MASS_DIMS = ['bottom_top', 'south_north', 'west_east']
+
+# in memory cache of the catalogs, the key is the file path and its signature
+_catalogs = {}
+
+def build_catalog(ncfile):
+    # describe the plottable properties using only the metadata of the file
+    catalog = {}
+
+    for name, variable in ncfile.variables.items():
+        dims = variable.dimensions
+        if dims[:1] != ('Time',) or len(dims) - 1 < 2 or len(dims) - 1 > 3:
+            continue
+
+        shape = [len(ncfile.dimensions[d]) for d in dims[1:]]
+        axis = get_stagger_axis(variable)
+        if axis is not None:
+            shape[axis] -= 1
+
+        catalog[name] = {'kind': 'raw', 'shape': shape, 'inputs': [name]}
+
+    if all(item in catalog for item in ['U', 'V']):
+        inputs = [wind_prop for wind_prop in ['U', 'V', 'W'] if wind_prop in catalog]
+        catalog['S'] = {'kind': 'derived', 'shape': catalog['U']['shape'], 'inputs': inputs}
+
+    if all(d in ncfile.dimensions for d in MASS_DIMS):
+        mass_shape = [len(ncfile.dimensions[d]) for d in MASS_DIMS]
+        for name, (inputs, num_dims) in DIAGNOSTICS.items():
+            if name in catalog or not all(item in ncfile.variables for item in inputs):
+                continue
+            catalog[name] = {'kind': 'diagnostic', 'shape': mass_shape[-num_dims:], 'inputs': inputs}
+
+    return catalog
+
+def load_catalogs(sidecar_path):
+    try:
+        with open(sidecar_path, 'r') as f:
+            content = json.load(f)
+        if content.get('version') == CATALOG_VERSION:
+            return content.get('files', {})
+    except (OSError, ValueError):
+        pass
+    return {}
+
+def save_catalogs(sidecar_path, catalogs):
+    try:
+        os.makedirs(os.path.dirname(sidecar_path), exist_ok=True)
+        tmp_path = sidecar_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': CATALOG_VERSION, 'files': catalogs}, f)
+        os.replace(tmp_path, sidecar_path)
+    except OSError:
+        # read only data location, the catalog is kept in memory only
+        pass
+
+def get_catalog(filename):
+    filename = os.path.abspath(filename)
+    signature = get_signature(filename)
+    key = (filename, tuple(signature))
+
+    if key in _catalogs:
+        return _catalogs[key]
+
+    folder_name, file = os.path.split(filename)
+    sidecar_path = get_sidecar_path(folder_name, 'catalog.json')
+    stored = load_catalogs(sidecar_path)
+
+    if file in stored and stored[file]['signature'] == signature:
+        catalog = stored[file]['catalog']
+    else:
+        with dataset_pool.lock:
+            catalog = build_catalog(dataset_pool.get(filename))
+        stored[file] = {'signature': signature, 'catalog': catalog}
+        save_catalogs(sidecar_path, stored)
+
+    _catalogs[key] = catalog
+    return catalog
+
+def get_num_layers(catalog, property):
+    shape = catalog[property]['shape']
+    if len(shape) == 3:
+        return shape[0]
+    elif len(shape) == 2:
+        return 1
+    return None
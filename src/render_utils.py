@@ -0,0 +1,100 @@
+import functools
+import struct
+import zlib
+
+import numpy as np
+
+@functools.lru_cache(maxsize=None)
+def get_colormap(cbar, num_points = 256):
+    # built from the matplotlib registry directly, pg.colormap.get imports pyplot which doubles the startup time
+    import matplotlib
+    import pyqtgraph as pg
+    colors = matplotlib.colormaps[cbar](np.linspace(0.0, 1.0, num_points))
+    return pg.ColorMap(np.linspace(0.0, 1.0, num_points), (colors * 255).round().astype(np.uint8), name=cbar)
+
+def get_lookup_table(cbar, num_points = 256):
+    return get_colormap(cbar).getLookupTable(nPts=num_points, alpha=True)
+
+def to_float_image(data, out = None):
+    # float32 copy of the slice with masked values as NaN without temporaries, out is reused if it fits
+    mask = np.ma.getmaskarray(data) if np.ma.is_masked(data) else None
+    data = np.ma.getdata(data)
+    if mask is None and data.dtype == np.float32 and data.flags.c_contiguous:
+        # already in display format, no copy needed
+        return data
+
+    if out is None or out.shape != data.shape:
+        out = np.empty(data.shape, dtype=np.float32)
+    np.copyto(out, data, casting='unsafe')
+    if mask is not None:
+        np.copyto(out, np.nan, where=mask)
+    return out
+
+def colorize(slice_data, val_min, val_max, lut):
+    # map the slice to RGBA like the image view does, north is on top and invalid values are transparent
+    image = to_float_image(slice_data)
+    scale = len(lut) / max(val_max - val_min, np.finfo(np.float32).tiny)
+
+    # the float image of masked or converted slices is already a copy and is scaled in place
+    if np.may_share_memory(image, np.ma.getdata(slice_data)):
+        index = image[::-1] - np.float32(val_min)
+    else:
+        index = image[::-1]
+        index -= val_min
+    index *= scale
+
+    invalid = np.isnan(index)
+    np.clip(index, 0, len(lut) - 1, out=index)
+    index[invalid] = 0
+
+    # the lookup with small integer indices does not need an intp copy of the image
+    rgba = lut[index.astype(np.uint8 if len(lut) <= 256 else np.intp)]
+    rgba[invalid] = 0
+    return rgba
+
+def encode_png(rgba, compression = 6):
+    height, width = rgba.shape[:2]
+
+    # every row starts with the filter type byte, 0 means no filter
+    raw = np.empty((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 0] = 0
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(chunk_type, data):
+        return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw.tobytes(), compression)) + chunk(b'IEND', b'')
+
+def write_png(filename, rgba, compression = 6):
+    with open(filename, 'wb') as f:
+        f.write(encode_png(rgba, compression))
+
+def downsample(image):
+    # mean of 2x2 blocks ignoring NaN, odd sizes are padded with NaN so the border is kept
+    if np.ma.isMaskedArray(image):
+        image = np.ma.filled(image.astype(np.float32), np.nan)
+    image = np.asarray(image, dtype=np.float32)
+
+    height, width = image.shape
+    if height % 2 or width % 2:
+        image = np.pad(image, ((0, height % 2), (0, width % 2)), constant_values=np.nan)
+
+    corners = [image[0::2, 0::2], image[0::2, 1::2], image[1::2, 0::2], image[1::2, 1::2]]
+    total = corners[0] + corners[1]
+    total += corners[2]
+    total += corners[3]
+    if not np.isnan(total).any():
+        total *= 0.25
+        return total
+
+    # blocks with invalid values are averaged over their valid values only
+    total.fill(0.0)
+    count = np.zeros(total.shape, dtype=np.float32)
+    for corner in corners:
+        valid = ~np.isnan(corner)
+        np.add(total, corner, out=total, where=valid)
+        count += valid
+    with np.errstate(invalid='ignore', divide='ignore'):
+        total /= count
+    return total
@@ -0,0 +1,236 @@
+import math
+
+import numpy as np
+
+from .cache_manager import cache_manager
+from .data_utils import _get_sample_data, destagger_array, is_raw_variable
+from .dataset_pool import dataset_pool
+from .nc_utils import WIND_COMPONENTS, has_time_dim
+from .profiling import span
+from .wind_utils import as_float_array, get_stagger_axis, wind_speed
+
+# gravitational acceleration used to convert the geopotential to height
+GRAVITY = 9.81
+
+# fixed cost of a hyperslab read in columns, adjacent runs of columns are read as a single block as long as
+# the columns the block reads in addition cost less than a single read
+READ_OVERHEAD_COLUMNS = 2048
+
+# values and heights of the sections
+section_cache = cache_manager.cache('sections')
+
+class SectionIndex:
+    # grid columns below a line in grid coordinates (x along west_east, y along south_north), every column is
+    # read once and the columns are read in blocks of adjacent runs along the major axis of the line
+    def __init__(self, start, end, shape):
+        self.start = (float(start[0]), float(start[1]))
+        self.end = (float(end[0]), float(end[1]))
+        self.shape = tuple(shape[-2:])
+        self.key = (round(self.start[0], 2), round(self.start[1], 2), round(self.end[0], 2), round(self.end[1], 2), self.shape)
+
+        dx = self.end[0] - self.start[0]
+        dy = self.end[1] - self.start[1]
+        length = math.hypot(dx, dy)
+        num_samples = max(int(math.ceil(length)) + 1, 2)
+
+        # distance of the samples from the start of the line in grid points
+        self.distance = np.linspace(0.0, length, num_samples)
+        fraction = np.linspace(0.0, 1.0, num_samples)
+        x = np.clip(np.floor(self.start[0] + fraction * dx).astype(np.int64), 0, self.shape[1] - 1)
+        y = np.clip(np.floor(self.start[1] + fraction * dy).astype(np.int64), 0, self.shape[0] - 1)
+
+        # unique columns in the order of the line, inverse maps the samples to the columns
+        flat, first, inverse = np.unique(y * self.shape[1] + x, return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        self.inverse = rank[inverse]
+        self.rows = flat[order] // self.shape[1]
+        self.cols = flat[order] % self.shape[1]
+
+        self.axis = -1 if abs(dx) >= abs(dy) else -2
+        self.blocks = {}
+
+    def getRuns(self):
+        # runs of adjacent columns along the major axis as (first row, first column, last row, last column, positions)
+        if self.axis == -1:
+            order = np.lexsort((self.cols, self.rows))
+        else:
+            order = np.lexsort((self.rows, self.cols))
+
+        runs = []
+        for position in order.tolist():
+            row, col = int(self.rows[position]), int(self.cols[position])
+            if runs:
+                row0, col0, row1, col1, positions = runs[-1]
+                if (self.axis == -1 and row == row1 and col == col1 + 1) or (self.axis == -2 and col == col1 and row == row1 + 1):
+                    runs[-1] = (row0, col0, row, col, positions + [position])
+                    continue
+            runs.append((row, col, row, col, [position]))
+        return runs
+
+    def getBlocks(self, tile = None):
+        # (row slice, column slice, positions of the columns) of the hyperslabs the section is read from, tile
+        # is the horizontal chunk size of chunked variables
+        if tile not in self.blocks:
+            self.blocks[tile] = self.getTileBlocks(tile) if tile is not None else self.getRunBlocks()
+        return self.blocks[tile]
+
+    def getTileBlocks(self, tile):
+        # every chunk is decompressed as a whole, the columns in a chunk are read as a single block
+        tiles = {}
+        for position, (row, col) in enumerate(zip(self.rows.tolist(), self.cols.tolist())):
+            tiles.setdefault((row // tile[0], col // tile[1]), []).append(position)
+
+        blocks = []
+        for positions in tiles.values():
+            rows = self.rows[positions]
+            cols = self.cols[positions]
+            blocks.append((slice(int(rows.min()), int(rows.max()) + 1), slice(int(cols.min()), int(cols.max()) + 1), positions))
+        return blocks
+
+    def getRunBlocks(self):
+        # adjacent runs are merged as long as the columns a block reads in addition stay below the cost of a
+        # single read, the bounding box of a diagonal grows with every run so the limit is not per merge
+        blocks = []
+        for row0, col0, row1, col1, positions in self.getRuns():
+            if blocks:
+                block = blocks[-1]
+                merged = (min(block[0], row0), min(block[1], col0), max(block[2], row1), max(block[3], col1))
+                merged_columns = (merged[2] - merged[0] + 1) * (merged[3] - merged[1] + 1)
+                if merged_columns - len(block[4]) - len(positions) <= READ_OVERHEAD_COLUMNS:
+                    blocks[-1] = merged + (block[4] + positions,)
+                    continue
+            blocks.append((row0, col0, row1, col1, positions))
+
+        return [(slice(row0, row1 + 1), slice(col0, col1 + 1), positions) for row0, col0, row1, col1, positions in blocks]
+
+    def numColumns(self):
+        return len(self.rows)
+
+def gather_columns(variable, section_index, prefix = (), axis = None):
+    # read the columns of the section from a (z, y, x) variable, prefix indexes the leading dimensions and
+    # axis is the staggered axis, the blocks are read as hyperslabs and destaggered on the fly
+    # chunking is 'contiguous' or None for contiguous and classic format variables
+    chunking = variable.chunking()
+    tile = tuple(chunking[-2:]) if isinstance(chunking, list) else None
+
+    out = None
+    for rows, cols, positions in section_index.getBlocks(tile):
+        stop_row = rows.stop + 1 if axis == -2 else rows.stop
+        stop_col = cols.stop + 1 if axis == -1 else cols.stop
+
+        with span('read'):
+            data = as_float_array(variable[tuple(prefix) + (slice(None), slice(rows.start, stop_row), slice(cols.start, stop_col))])
+        if axis is not None:
+            data = destagger_array(data, axis)
+
+        if out is None:
+            out = np.empty((data.shape[0], section_index.numColumns()), dtype=np.float32)
+        out[:, positions] = data[:, section_index.rows[positions] - rows.start, section_index.cols[positions] - cols.start]
+
+    return out
+
+def geopotential_height(geopotential, num_levels):
+    # height of the mass levels from the (staggered) geopotential columns
+    if geopotential.shape[0] == num_levels + 1:
+        geopotential = destagger_array(geopotential, 0)
+    return geopotential / GRAVITY
+
+def _read_section(ncfile, property, section_index):
+    if property == 'S':
+        wind_props = [wind_prop for wind_prop in ['U', 'V', 'W'] if wind_prop in ncfile.variables]
+        if ncfile.variables[wind_props[0]].ndim != 4:
+            return None
+        with span('S'):
+            return wind_speed((gather_columns(ncfile.variables[wind_prop], section_index, (0,), get_stagger_axis(ncfile.variables[wind_prop])), None)
+                              for wind_prop in wind_props)
+
+    if is_raw_variable(ncfile, property):
+        variable = ncfile.variables[property]
+        if variable.ndim != 4:
+            return None
+        return gather_columns(variable, section_index, (0,), get_stagger_axis(variable))
+
+    # diagnostics need the full field to be computed, the columns are taken from it
+    data = _get_sample_data(ncfile, property)
+    if data is None or data.ndim != 3:
+        return None
+    return as_float_array(data[:, section_index.rows, section_index.cols]).astype(np.float32)
+
+def read_section(filename, property, section_index):
+    # values of a 3D property of a wrfout file in the columns of the section, (levels, samples)
+    with dataset_pool.lock:
+        data = _read_section(dataset_pool.get(filename), property, section_index)
+
+    if data is None:
+        return None
+    return data[:, section_index.inverse]
+
+def read_section_height(filename, section_index):
+    # height of the mass levels in the columns of the section, None if the geopotential is not present
+    with dataset_pool.lock:
+        ncfile = dataset_pool.get(filename)
+        if not all(item in ncfile.variables for item in ['PH', 'PHB']):
+            return None
+
+        num_levels = len(ncfile.dimensions['bottom_top']) if 'bottom_top' in ncfile.dimensions else ncfile.variables['PH'].shape[1] - 1
+        geopotential = gather_columns(ncfile.variables['PH'], section_index, (0,))
+        geopotential += gather_columns(ncfile.variables['PHB'], section_index, (0,))
+
+    return geopotential_height(geopotential, num_levels)[:, section_index.inverse]
+
+def _read_group_section(group, property, time_index, section_index):
+    prefix = (time_index,) if has_time_dim(group, property) else ()
+
+    if property in WIND_COMPONENTS and not property in group.variables:
+        wind_props = [wind_prop for wind_prop in WIND_COMPONENTS[property] if wind_prop in group.variables]
+        if group.variables[wind_props[0]].ndim != len(prefix) + 3:
+            return None
+        with span('S'):
+            return wind_speed((gather_columns(group.variables[wind_prop], section_index, prefix), None) for wind_prop in wind_props)
+
+    variable = group.variables[property]
+    if variable.ndim != len(prefix) + 3:
+        return None
+    return gather_columns(variable, section_index, prefix)
+
+def read_group_section(file_name, case, model, property, time_index, section_index):
+    # values of a 3D property of a case and model of an nc dataset file in the columns of the section
+    with dataset_pool.lock:
+        data = _read_group_section(dataset_pool.get(file_name)[case][model], property, time_index, section_index)
+
+    if data is None:
+        return None
+    return data[:, section_index.inverse]
+
+def read_group_section_height(file_name, case, model, time_index, num_levels, section_index):
+    # height of the mass levels from the geopotential of the group, None if it is not present
+    with dataset_pool.lock:
+        group = dataset_pool.get(file_name)[case][model]
+        if not all(item in group.variables for item in ['PH', 'PHB']):
+            return None
+
+        geopotential = None
+        for name in ['PH', 'PHB']:
+            prefix = (time_index,) if has_time_dim(group, name) else ()
+            if group.variables[name].ndim != len(prefix) + 3:
+                return None
+            data = gather_columns(group.variables[name], section_index, prefix)
+            geopotential = data if geopotential is None else geopotential + data
+
+    if geopotential.shape[0] not in [num_levels, num_levels + 1]:
+        return None
+    return geopotential_height(geopotential, num_levels)[:, section_index.inverse]
+
+def resample_section(values, heights, num_levels = 200):
+    # interpolate the terrain following columns to regular heights, points below the terrain or above the
+    # top of a column are NaN, returns the image (levels, samples) and the height range
+    bottom = float(np.nanmin(heights[0]))
+    top = float(np.nanmax(heights[-1]))
+    levels = np.linspace(bottom, top, num_levels)
+
+    image = np.full((num_levels, values.shape[1]), np.nan, dtype=np.float32)
+    for i in range(values.shape[1]):
+        image[:, i] = np.interp(levels, heights[:, i], values[:, i], left=np.nan, right=np.nan)
+    return image, bottom, top
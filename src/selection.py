@@ -0,0 +1,41 @@
+class SelectionTransaction:
+    # holds back the signals of the selection combo boxes while the selection is updated, the data is loaded
+    # and the limits are updated at most once when the outermost transaction ends
+    def __init__(self, combo_boxes, load, update_limits):
+        self.combo_boxes = combo_boxes
+        self.load = load
+        self.update_limits = update_limits
+        self.depth = 0
+        self.blocked = []
+        self.load_requested = False
+        self.limits_requested = False
+
+    def __enter__(self):
+        if self.depth == 0:
+            self.blocked = [combo_box.blockSignals(True) for combo_box in self.combo_boxes]
+        self.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.depth -= 1
+        if self.depth > 0:
+            return False
+
+        for combo_box, blocked in zip(self.combo_boxes, self.blocked):
+            combo_box.blockSignals(blocked)
+
+        load, update_limits = self.load_requested, self.limits_requested
+        self.load_requested = self.limits_requested = False
+
+        if exc_type is None:
+            if load:
+                self.load()
+            if update_limits:
+                self.update_limits()
+        return False
+
+    def requestLoad(self):
+        self.load_requested = True
+
+    def requestLimits(self):
+        self.limits_requested = True
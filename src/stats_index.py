@@ -0,0 +1,218 @@
+import functools
+import json
+import os
+
+import numpy as np
+
+INDEX_VERSION = 2
+
+# probabilities of the quantiles stored with the statistics of every field, dense at both ends for the
+# percentile limits
+QUANTILE_PROBS = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.98, 0.99, 0.995, 0.998, 0.999]
+
+# number of values of a field its quantiles are estimated from
+SKETCH_SIZE = 16384
+
+# percentiles of the limits of the scaling ranges, None uses the min and max
+SCALING_RANGES = {'Min/max': None, 'p1-p99': (0.01, 0.99), 'p2-p98': (0.02, 0.98), 'p5-p95': (0.05, 0.95)}
+
+def get_signature(filename):
+    stat = os.stat(filename)
+    return [stat.st_mtime_ns, stat.st_size]
+
+@functools.lru_cache(maxsize=16)
+def get_sample_positions(size):
+    # the same random positions are sampled from all fields of a size, sorted for a sequential gather
+    if size <= SKETCH_SIZE:
+        return None
+    return np.sort(np.random.default_rng(size).choice(size, SKETCH_SIZE, replace=False))
+
+def quantile_sketch(rows):
+    # quantiles of every row of a (fields, values) array from a sample of its values, masked values and NaN
+    # are ignored, rows without valid values get None
+    positions = get_sample_positions(rows.shape[1])
+    sample = rows if positions is None else rows[:, positions]
+    sample = np.sort(np.ma.filled(sample.astype(np.float32), np.nan), axis=1)
+    counts = sample.shape[1] - np.count_nonzero(np.isnan(sample), axis=1)
+
+    # linear interpolation between the order statistics of the valid values, NaN are sorted to the end
+    position = np.asarray(QUANTILE_PROBS)[np.newaxis] * np.maximum(counts - 1, 0)[:, np.newaxis]
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, np.maximum(counts - 1, 0)[:, np.newaxis])
+    fraction = position - lower
+    values = np.take_along_axis(sample, lower, axis=1) * (1.0 - fraction) + np.take_along_axis(sample, upper, axis=1) * fraction
+
+    return [[float('%.7g' % value) for value in row] if count > 0 else None for row, count in zip(values.tolist(), counts.tolist())]
+
+def field_stats(data, quantiles = None):
+    count = int(data.count())
+    if count == 0:
+        return [None, None, 0]
+    if quantiles is None:
+        quantiles = quantile_sketch(data.reshape(1, -1))[0]
+    return [float(data.min()), float(data.max()), count, quantiles]
+
+def compute_stats(data, layer = None):
+    # min, max, number of valid values and quantiles per layer and for the whole field if it is complete
+    data = np.ma.masked_invalid(data)
+
+    if layer is not None:
+        return {int(layer): field_stats(data)}
+
+    if data.ndim == 3:
+        # the quantiles of the layers are estimated in a single pass over all of them
+        quantiles = quantile_sketch(data.reshape(data.shape[0], -1))
+        stats = {l: field_stats(data[l], quantiles[l]) for l in range(data.shape[0])}
+        stats[None] = reduce_stats(stats.values())
+        if stats[None][2] > 0:
+            stats[None].append(quantile_sketch(data.reshape(1, -1))[0])
+    else:
+        stats = {0: field_stats(data)}
+        stats[None] = stats[0]
+    return stats
+
+def reduce_stats(stats_list):
+    val_min = val_max = None
+    count = 0
+    for stats in stats_list:
+        if stats is None or stats[2] == 0:
+            continue
+        val_min = stats[0] if val_min is None else min(val_min, stats[0])
+        val_max = stats[1] if val_max is None else max(val_max, stats[1])
+        count += stats[2]
+    return [val_min, val_max, count]
+
+def reduce_percentiles(stats_list, percentiles):
+    # percentiles of the union of the fields, the distribution of every field is interpolated linearly between
+    # its min, quantiles and max, the distribution of the union weighted by the number of values is piecewise
+    # linear between the knots of all fields and is inverted exactly by a bisection over the knots
+    stats_list = [stats for stats in stats_list if stats is not None and stats[2] > 0 and len(stats) > 3]
+    if not stats_list:
+        return [None, None, 0]
+
+    knots = np.array([[stats[0]] + stats[3] + [stats[1]] for stats in stats_list])
+    probs = np.array([0.0] + QUANTILE_PROBS + [1.0])
+    counts = np.array([stats[2] for stats in stats_list], dtype=np.float64)
+    weights = counts / counts.sum()
+
+    def cdf(value):
+        upper = np.clip(np.count_nonzero(knots <= value, axis=1), 1, knots.shape[1] - 1)[:, np.newaxis]
+        knot_lower = np.take_along_axis(knots, upper - 1, axis=1)[:, 0]
+        knot_upper = np.take_along_axis(knots, upper, axis=1)[:, 0]
+        width = knot_upper - knot_lower
+        fraction = np.clip(np.divide(value - knot_lower, width, out=np.ones_like(width), where=width > 0), 0.0, 1.0)
+        return float(np.dot(weights, probs[upper[:, 0] - 1] + fraction * (probs[upper[:, 0]] - probs[upper[:, 0] - 1])))
+
+    grid = np.unique(knots)
+    limits = []
+    for percentile in percentiles:
+        low, high = 0, len(grid) - 1
+        while high - low > 1:
+            middle = (low + high) // 2
+            if cdf(grid[middle]) < percentile:
+                low = middle
+            else:
+                high = middle
+
+        cdf_low, cdf_high = cdf(grid[low]), cdf(grid[high])
+        fraction = (percentile - cdf_low) / (cdf_high - cdf_low) if cdf_high > cdf_low else 1.0
+        limits.append(float(grid[low] + min(max(fraction, 0.0), 1.0) * (grid[high] - grid[low])))
+    return [limits[0], limits[1], int(counts.sum())]
+
+def entry_key(item, property, layer):
+    return str(item) + '|' + property + '|' + ('*' if layer is None else str(int(layer)))
+
+class StatsIndex:
+    def __init__(self, sidecar_path, sources):
+        # sources maps the source keys to the files whose signature guards their entries
+        self.sidecar_path = sidecar_path
+        self.sources = sources
+        self.modified = False
+        self._entries = {}
+        self._signatures = {}
+
+        self.load()
+
+    def load(self):
+        stored = {}
+        try:
+            with open(self.sidecar_path, 'r') as f:
+                content = json.load(f)
+            if content.get('version') == INDEX_VERSION:
+                stored = content.get('sources', {})
+        except (OSError, ValueError):
+            pass
+
+        for source, filename in self.sources.items():
+            try:
+                signature = get_signature(filename)
+            except OSError:
+                continue
+
+            self._signatures[source] = signature
+            if source in stored and stored[source]['signature'] == signature:
+                self._entries[source] = stored[source]['entries']
+            else:
+                self._entries[source] = {}
+
+    def save(self):
+        if not self.modified:
+            return
+
+        content = {'version': INDEX_VERSION, 'sources': {}}
+        for source, entries in self._entries.items():
+            content['sources'][source] = {'signature': self._signatures[source], 'entries': entries}
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.sidecar_path)), exist_ok=True)
+            tmp_path = self.sidecar_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(content, f)
+            os.replace(tmp_path, self.sidecar_path)
+            self.modified = False
+        except OSError:
+            # read only data location, the index is kept in memory only
+            pass
+
+    def lookup(self, source, item, property, layer):
+        entries = self._entries.get(source)
+        if entries is None:
+            return None
+        return entries.get(entry_key(item, property, layer))
+
+    def store(self, source, item, property, stats):
+        entries = self._entries.get(source)
+        if entries is None:
+            return
+
+        for layer, layer_stats in stats.items():
+            entries[entry_key(item, property, layer)] = layer_stats
+        self.modified = True
+
+    def missing(self, keys):
+        return [key for key in keys if self.lookup(*key) is None]
+
+    def reduce(self, keys, percentiles = None):
+        # min and max of the entries or the given percentiles of their values
+        if percentiles is not None:
+            return reduce_percentiles([self.lookup(*key) for key in keys], percentiles)
+        return reduce_stats(self.lookup(*key) for key in keys)
+
+    def limits(self, keys, compute, progress = None, percentiles = None):
+        # fill the missing (source, item, property, layer) entries and reduce all of them to the limits
+        missing = self.missing(keys)
+        for i, key in enumerate(missing):
+            source, item, property, layer = key
+            # an earlier full field read could have filled this entry already
+            if self.lookup(*key) is None:
+                self.store(source, item, property, compute(key))
+
+            if progress is not None:
+                progress(i + 1, len(missing))
+
+        self.save()
+
+        stats = self.reduce(keys, percentiles)
+        if stats[2] == 0:
+            return None, None
+        return stats[0], stats[1]
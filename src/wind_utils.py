@@ -0,0 +1,70 @@
+import numpy as np
+
+# axis of the staggered dimension for the values of the wrfout stagger attribute
+STAGGER_AXES = {'X': -1, 'U': -1, 'Y': -2, 'V': -2, 'Z': -3, 'W': -3}
+
+# dimensions of the staggered grids, other dimensions with a stagger attribute (soil_layers_stag) are not
+# staggered relative to the mass grid
+STAGGER_DIMS = {'west_east_stag': -1, 'south_north_stag': -2, 'bottom_top_stag': -3}
+
+def get_stagger_axis(variable):
+    # axis of a wrfout variable that has to be destaggered or None
+    axis = STAGGER_AXES.get(getattr(variable, 'stagger', ''))
+    dims = variable.dimensions
+    if axis is None or len(dims) - 1 < -axis or STAGGER_DIMS.get(dims[axis]) != axis:
+        return None
+    return axis
+
+def get_destaggered_shape(shape, axis):
+    if axis is None:
+        return tuple(shape)
+    shape = list(shape)
+    shape[axis] -= 1
+    return tuple(shape)
+
+def as_float_array(data):
+    # masked values become NaN, the data is only copied if it contains masked values
+    if np.ma.isMaskedArray(data):
+        if np.ma.is_masked(data):
+            return np.ma.filled(data.astype(np.float32), np.nan)
+        return np.ma.getdata(data)
+    return np.asarray(data)
+
+def accumulate_square(out, data, axis, scratch):
+    # add the square of the (destaggered) component to out without allocating temporaries
+    data = as_float_array(data)
+
+    if axis is None:
+        np.multiply(data, data, out=scratch)
+    else:
+        lower = [slice(None)] * data.ndim
+        upper = [slice(None)] * data.ndim
+        lower[axis] = slice(0, -1)
+        upper[axis] = slice(1, None)
+        destaggered = scratch.reshape(get_destaggered_shape(data.shape, axis))
+        np.add(data[tuple(lower)], data[tuple(upper)], out=destaggered)
+        np.multiply(scratch, 0.5, out=scratch)
+        np.multiply(scratch, scratch, out=scratch)
+
+    np.add(out, scratch, out=out)
+
+def wind_speed(components, shape = None, out = None):
+    # magnitude of the wind from (data, stagger axis) tuples, the components are consumed one after the
+    # other so only a single raw component is in memory at a time
+    scratch = None
+    for data, axis in components:
+        if scratch is None:
+            if shape is None:
+                shape = get_destaggered_shape(data.shape, axis)
+            if out is None or out.shape != tuple(shape) or out.dtype != np.float32:
+                out = np.empty(shape, dtype=np.float32)
+            out.fill(0.0)
+            scratch = np.empty(shape, dtype=np.float32)
+
+        accumulate_square(out, data, axis, scratch)
+
+    if scratch is None:
+        return None
+
+    np.sqrt(out, out=out)
+    return out
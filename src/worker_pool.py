@@ -0,0 +1,51 @@
+import concurrent.futures
+import multiprocessing
+import os
+
+num_workers = int(os.environ.get('WRFVIEWER_NUM_WORKERS', os.cpu_count() or 1))
+io_workers = int(os.environ.get('WRFVIEWER_IO_WORKERS', min(4, num_workers)))
+# memory budget of the caches of every worker process, the results are cached by the GUI process
+worker_cache_bytes = int(float(os.environ.get('WRFVIEWER_WORKER_CACHE_MB', 128)) * 2**20)
+_process_pool = None
+_io_pool = None
+
+# failures of the pool rather than of a task, cancelled tasks of a pool that was shut down and tasks of a
+# pool whose worker died did not read the data
+POOL_ERRORS = (concurrent.futures.CancelledError, concurrent.futures.BrokenExecutor)
+
+def init_worker(max_bytes):
+    from .cache_manager import cache_manager
+    cache_manager.setMaxBytes(max_bytes)
+
+def create_pool(workers):
+    return concurrent.futures.ProcessPoolExecutor(max(workers, 1), mp_context=multiprocessing.get_context('spawn'),
+                                                  initializer=init_worker, initargs=(worker_cache_bytes,))
+
+def get_process_pool():
+    # worker processes are spawned instead of forked as the GUI process holds open HDF5 handles and Qt state
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = create_pool(num_workers)
+    return _process_pool
+
+def get_io_pool():
+    # interactive reads such as the panels of a comparison have their own small pool, so they never queue
+    # behind the tasks of a statistics scan
+    global _io_pool
+    if _io_pool is None:
+        _io_pool = create_pool(io_workers)
+    return _io_pool
+
+def set_num_workers(workers):
+    global num_workers
+    num_workers = workers
+    shutdown_process_pool()
+
+def shutdown_process_pool():
+    global _process_pool, _io_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+    if _io_pool is not None:
+        _io_pool.shutdown(wait=False, cancel_futures=True)
+        _io_pool = None
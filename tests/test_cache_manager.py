@@ -0,0 +1,26 @@
+import threading
+
+import numpy as np
+
+from src.cache_manager import CacheManager
+
+def test_waiting_for_a_prefetch_is_not_a_hit():
+    manager = CacheManager(2**20)
+    cache = manager.cache('frames')
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_loader():
+        started.set()
+        release.wait()
+        return np.zeros(10)
+
+    cache.prefetch([('a', slow_loader)])
+    started.wait()
+    threading.Timer(0.05, release.set).start()
+
+    assert cache.get('a', slow_loader) is not None
+    assert cache.get('a', slow_loader) is not None
+    stats = cache.stats()
+    assert (stats['hits'], stats['waits'], stats['misses']) == (1, 1, 0)
+    manager.executor.shutdown()
@@ -0,0 +1,15 @@
+import os
+
+import pytest
+
+from src.converter import convert_folder
+
+def test_unknown_domains_are_reported_before_the_output_is_written(tmp_path):
+    folder = tmp_path / 'case'
+    folder.mkdir()
+    (folder / 'wrfout_d01_2020-01-01_00:00:00').write_bytes(b'')
+    output = tmp_path / 'case.nc'
+
+    with pytest.raises(ValueError, match='d02'):
+        convert_folder(str(folder), str(output), ['d02'])
+    assert not os.path.exists(output)
@@ -0,0 +1,33 @@
+import numpy as np
+from netCDF4 import Dataset
+
+from src.data_utils import read_variable
+from src.property_catalog import build_catalog
+
+def make_wrfout(file_name):
+    with Dataset(file_name, 'w') as ncfile:
+        for name, size in [('Time', None), ('bottom_top', 3), ('bottom_top_stag', 4), ('soil_layers_stag', 4),
+                           ('south_north', 5), ('west_east', 6)]:
+            ncfile.createDimension(name, size)
+
+        w = ncfile.createVariable('W', 'f4', ('Time', 'bottom_top_stag', 'south_north', 'west_east'))
+        w.stagger = 'Z'
+        w[0] = np.arange(4, dtype=np.float32)[:, None, None] * np.ones((5, 6))
+
+        # the soil layers are staggered in the wrfout files but there is no mass grid to destagger them to
+        tslb = ncfile.createVariable('TSLB', 'f4', ('Time', 'soil_layers_stag', 'south_north', 'west_east'))
+        tslb.stagger = 'Z'
+        tslb[0] = np.arange(4, dtype=np.float32)[:, None, None] * np.ones((5, 6))
+
+def test_only_the_staggered_grid_dimensions_are_destaggered(tmp_path):
+    file_name = str(tmp_path / 'wrfout_d01_2000-01-01_00:00:00')
+    make_wrfout(file_name)
+
+    with Dataset(file_name) as ncfile:
+        catalog = build_catalog(ncfile)
+        assert catalog['W']['shape'] == [3, 5, 6]
+        assert catalog['TSLB']['shape'] == [4, 5, 6]
+
+        np.testing.assert_array_equal(read_variable(ncfile, 'W')[:, 0, 0], [0.5, 1.5, 2.5])
+        np.testing.assert_array_equal(read_variable(ncfile, 'TSLB')[:, 0, 0], [0, 1, 2, 3])
+        np.testing.assert_array_equal(read_variable(ncfile, 'TSLB', 3)[0, 0], 3)
@@ -0,0 +1,13 @@
+import os
+
+from src.folder_index import SIDECAR_FOLDER, get_folder_index
+
+def test_folders_without_wrfout_files_get_no_sidecar_folder(tmp_path):
+    (tmp_path / 'notes.txt').write_text('')
+    assert get_folder_index(str(tmp_path)).getDomains() == []
+    assert not os.path.exists(tmp_path / SIDECAR_FOLDER)
+
+def test_the_manifest_of_a_wrfout_folder_is_written(tmp_path):
+    (tmp_path / 'wrfout_d01_2020-01-01_00:00:00').write_bytes(b'')
+    assert get_folder_index(str(tmp_path)).getDomains() == ['d01']
+    assert os.path.isfile(tmp_path / SIDECAR_FOLDER / 'manifest.json')
@@ -0,0 +1,16 @@
+import numpy as np
+
+from src.frame_export import FrameExporter
+
+def test_failed_writes_are_counted_with_their_reason(tmp_path):
+    exporter = FrameExporter(num_threads=1)
+    lut = np.zeros((256, 4), dtype=np.uint8)
+    data = np.zeros((4, 5), dtype=np.float32)
+
+    exporter.submit(str(tmp_path / 'frame.png'), data, 0.0, 1.0, lut)
+    exporter.submit(str(tmp_path / 'missing' / 'frame.png'), data, 0.0, 1.0, lut)
+    exporter._executor.shutdown(wait=True)
+
+    stats = exporter.stats()
+    assert (stats['written'], stats['failed'], stats['queued']) == (1, 1, 0)
+    assert 'missing' in stats['error']
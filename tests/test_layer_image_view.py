@@ -0,0 +1,27 @@
+import functools
+
+import numpy as np
+
+from benchmarks.synthetic import make_wrfout_folder
+from src.data_utils import read_layer_data
+from src.frame_cache import frame_cache
+
+def plot_cached(widget, app, file_name, property, layer):
+    widget.plot(frame_cache.get((file_name, property, layer), functools.partial(read_layer_data, file_name, property, layer)), '')
+    app.processEvents()
+
+def test_plotting_the_next_frame_keeps_the_cached_frame(qapp, tmp_path):
+    from src.LayerImageViewWidget import LayerImageViewWidget
+
+    files = make_wrfout_folder(str(tmp_path), nx=30, ny=20, nz=4, nt=2)
+    widget = LayerImageViewWidget()
+
+    # the masked frame is converted into the display buffer, which must not be the unmasked frame before it
+    plot_cached(widget, qapp, files[0], 'T', 1)
+    cached = frame_cache.lookup((files[0], 'T', 1))
+    expected = np.ma.getdata(cached).copy()
+    plot_cached(widget, qapp, files[0], 'QRAIN', 1)
+    plot_cached(widget, qapp, files[1], 'T', 1)
+
+    np.testing.assert_array_equal(np.ma.getdata(frame_cache.lookup((files[0], 'T', 1))), expected)
+    np.testing.assert_array_equal(expected, np.ma.getdata(read_layer_data(files[0], 'T', 1)))
@@ -0,0 +1,28 @@
+import concurrent.futures
+
+from src import limits_worker
+from src.limits_worker import LimitsWorker
+
+def fail_read():
+    raise OSError('cannot read')
+
+class CancelledPool:
+    # pool that was shut down with cancel_futures, the first task is cancelled and the second fails
+    def submit(self, function, *args):
+        future = concurrent.futures.Future()
+        if function is fail_read:
+            future.set_exception(OSError('cannot read'))
+        else:
+            future.cancel()
+        return future
+
+def test_cancelled_tasks_are_not_stored_as_empty(monkeypatch):
+    monkeypatch.setattr(limits_worker, 'get_process_pool', CancelledPool)
+    keys = [('source', 'a', 'T', 0), ('source', 'b', 'T', 0)]
+    worker = LimitsWorker([([keys[0]], sum, ([],)), ([keys[1]], fail_read, ())])
+
+    results = []
+    worker.signals.result.connect(lambda key, stats: results.append((key, stats)))
+    worker.run()
+
+    assert results == [(keys[1], {0: [None, None, 0]})]
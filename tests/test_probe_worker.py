@@ -0,0 +1,30 @@
+from src import probe_worker
+from src.probe_worker import ProbeLoader
+
+class RecordingThreadPool:
+    # thread pool that only records the started workers
+    workers = []
+
+    @classmethod
+    def globalInstance(cls):
+        return cls
+
+    @classmethod
+    def start(cls, worker):
+        cls.workers.append(worker)
+
+def test_a_point_that_is_loading_is_not_loaded_again(monkeypatch):
+    monkeypatch.setattr(probe_worker, 'QThreadPool', RecordingThreadPool)
+    monkeypatch.setattr(RecordingThreadPool, 'workers', [])
+    loader = ProbeLoader()
+    tasks = [(sum, ([1, 2],))]
+
+    loader.load(('probe', 'a'), tasks, 'first')
+    loader.load(('probe', 'a'), tasks, 'second')
+    assert len(RecordingThreadPool.workers) == 1
+    assert not RecordingThreadPool.workers[0].cancelled.is_set()
+    assert loader.context == 'second'
+
+    loader.load(('probe', 'b'), tasks, 'third')
+    assert len(RecordingThreadPool.workers) == 2
+    assert RecordingThreadPool.workers[0].cancelled.is_set()
@@ -0,0 +1,39 @@
+import numpy as np
+
+from src.section_utils import READ_OVERHEAD_COLUMNS, SectionIndex, gather_columns
+
+class ArrayVariable:
+    # contiguous (z, y, x) variable backed by an array that counts the values read
+    def __init__(self, data):
+        self.data = data
+        self.num_read = 0
+
+    def chunking(self):
+        return 'contiguous'
+
+    def __getitem__(self, index):
+        values = self.data[index]
+        self.num_read += values.size
+        return values
+
+def test_diagonal_section_reads_only_its_columns():
+    shape = (4, 800, 1000)
+    variable = ArrayVariable(np.arange(np.prod(shape), dtype=np.float32).reshape(shape))
+    section_index = SectionIndex((0.5, 0.5), (999.5, 799.5), shape)
+
+    values = gather_columns(variable, section_index)
+
+    np.testing.assert_array_equal(values, variable.data[:, section_index.rows, section_index.cols])
+    # every block reads at most a single read overhead of columns in addition to its own columns
+    num_blocks = len(section_index.getBlocks(None))
+    assert variable.num_read <= shape[0] * (section_index.numColumns() + READ_OVERHEAD_COLUMNS * num_blocks)
+    assert variable.num_read < 0.1 * variable.data.size
+
+def test_straight_sections_are_read_as_a_single_block():
+    shape = (4, 800, 1000)
+    for start, end in [((0.5, 10.5), (999.5, 10.5)), ((10.5, 0.5), (10.5, 799.5))]:
+        section_index = SectionIndex(start, end, shape)
+        blocks = section_index.getBlocks(None)
+        assert len(blocks) == 1
+        rows, cols, _ = blocks[0]
+        assert (rows.stop - rows.start) * (cols.stop - cols.start) == section_index.numColumns()